@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+# =====================================================================
+# BUKU TAMU API (DATA BROKER YANG SUDAH DIBAYAR HARI INI)
+# Lapisan memori LRU + TTL per proses, read-through ke tabel 'api_registry' di Supabase
+# sehingga status "sudah ditarik" bertahan lintas restart, deploy, dan replika.
+# =====================================================================
+MAX_ENTRIES = 5000          # Batas memori lapisan lokal (LRU)
+TTL_SECONDS = 3 * 86400     # Kunci {symbol}_{tanggal} tidak relevan lagi setelah beberapa hari
+NEGATIVE_TTL_SECONDS = 60   # "Belum ada di tabel" diingat sebentar: rerun berulang tidak membayar 1 round trip per cek
+
+class ApiRegistry:
+    def __init__(self, client, table='api_registry', max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, negative_ttl=NEGATIVE_TTL_SECONDS):
+        self.client = client
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._local = OrderedDict() # key -> waktu kedaluwarsa (epoch)
+        self._missing = OrderedDict() # key -> sampai kapan "tidak ada" dipercaya (epoch)
+        self._lock = threading.Lock()
+
+    def _remember(self, key, expires_at):
+        with self._lock:
+            self._missing.pop(key, None)
+            self._local[key] = expires_at
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries: self._local.popitem(last=False)
+
+    def __contains__(self, key):
+        now = time.time()
+        with self._lock:
+            expires_at = self._local.get(key)
+            if expires_at is not None:
+                if expires_at > now:
+                    self._local.move_to_end(key)
+                    return True
+                del self._local[key]
+            missing_until = self._missing.get(key)
+            if missing_until is not None:
+                if missing_until > now: return False
+                del self._missing[key]
+
+        # Read-through: mungkin sudah ditarik oleh proses/replika lain
+        try:
+            res = self.client.table(self.table).select('expires_at').eq('key', key) \
+                .gt('expires_at', datetime.now(timezone.utc).isoformat()).limit(1).execute()
+            if res.data:
+                self._remember(key, datetime.fromisoformat(res.data[0]['expires_at']).timestamp())
+                return True
+        except: return False # Gangguan database tidak di-cache sebagai "tidak ada"
+        with self._lock:
+            self._missing[key] = now + self.negative_ttl
+            while len(self._missing) > self.max_entries: self._missing.popitem(last=False)
+        return False
+
+    def add(self, key):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        self._remember(key, expires_at.timestamp())
+        try: self.client.table(self.table).upsert({"key": key, "expires_at": expires_at.isoformat()}).execute()
+        except: pass
+
+    def clear(self):
+        """Kosongkan lapisan memori lokal saja (tabel tetap menjadi sumber kebenaran)."""
+        with self._lock:
+            self._local.clear()
+            self._missing.clear()
+
+    def prune(self):
+        """Hapus baris kedaluwarsa dari tabel (dipanggil job malam)."""
+        self.client.table(self.table).delete().lt('expires_at', datetime.now(timezone.utc).isoformat()).execute()
@@ -16,51 +16,63 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
 # --- 5. MODUL DATA PIHAK KETIGA ---
-import yfinance as yf
-import feedparser # Untuk Radar Sentimen Berita
-import re # Untuk Regex/Pembersihan Teks
-import requests # Biarkan jika dipakai untuk API lain, hapus jika tidak
-
-# --- 6. MODUL DATABASE & CLOUD ---
-from supabase import create_client, Client
-
-# --- IMPORT MACHINE LEARNING ---
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler
+import json # Untuk kunci cache hasil backtest
+
+# --- 5b. MESIN ANALISIS INTERNAL (DIPAKAI BERSAMA fetcher.py) ---
+from seasonality import compute_seasonality_table, table_to_frames, MONTH_NAMES, HIJRI_EVENTS, hijri_event_dates, event_study
+from sentiment import SentimentScorer, sentiment_label
+from news_dedup import cluster_near_duplicates, group_clusters
+from price_snapshot import PriceSnapshot
+from api_registry import ApiRegistry
+from audit_logger import AuditLogger
+import perf
+from perf import timed, timer
+from portfolio_risk import returns_matrix, short_history_columns, portfolio_risk, monte_carlo
+from dividends import scan_dividends, scan_dividend_histories, dividend_metrics, yield_on_cost, MAX_YIELD, CONSISTENCY_YEARS
+from providers import load_config, get_storage, get_price_provider, get_broker_provider, get_feed_parser
+from technicals import fix_dataframe, calculate_metrics, advanced_analysis, score_analysis, knn_probability_up, compute_backtest
 
 # --- 1. KONFIGURASI HALAMAN ---
 st.set_page_config(page_title="Ultimate Smart Money Analyst", layout="wide", page_icon="🏦")
 
-# --- 2. INISIALISASI SUPABASE (VERSI REVISI) ---
+# --- 2. INISIALISASI SUPABASE & PENYEDIA DATA (VERSI REVISI) ---
 @st.cache_resource
-def init_supabase() -> Client:
+def init_supabase():
     """
-    Inisialisasi koneksi Supabase yang lebih fleksibel.
+    Inisialisasi koneksi database yang lebih fleksibel.
     Mendukung Streamlit Secrets (Cloud) dan Environment Variables (Local/GitHub).
+    STORAGE_BACKEND=sqlite memakai database lokal (offline) dengan API yang sama.
     """
     try:
         # Mengambil URL dan Key dengan fallback ke Environment Variables
         # Ini penting agar kode yang sama bisa jalan di GitHub Actions
-        url = st.secrets.get("supabase", {}).get("url") or os.getenv("SUPABASE_URL")
-        key = st.secrets.get("supabase", {}).get("key") or os.getenv("SUPABASE_KEY")
+        config = load_config(st.secrets)
         
-        if not url or not key:
+        if config["STORAGE_BACKEND"] == "supabase" and (not config.get("SUPABASE_URL") or not config.get("SUPABASE_KEY")):
             st.error("⚠️ Konfigurasi Supabase tidak ditemukan. Pastikan 'supabase' url dan key sudah diatur di Secrets.")
             st.info("Buka Settings -> Secrets di Streamlit Cloud untuk menambahkan konfigurasi.")
             st.stop()
             
-        return create_client(url, key)
+        return get_storage(config)
     except Exception as e:
         st.error(f"🔥 Gagal menghubungkan ke database: {e}")
         st.stop()
 
+@st.cache_resource
+def init_providers():
+    """Penyedia harga/fundamental, broker summary & parser RSS (PRICE_PROVIDER / BROKER_PROVIDER / CASSETTE_MODE di Secrets atau env)."""
+    config = load_config(st.secrets)
+    return get_price_provider(config), get_broker_provider(config), get_feed_parser(config)
+
 # Inisialisasi global yang akan di-cache selama aplikasi berjalan
 supabase = init_supabase()
+price_provider, broker_provider, parse_feed = init_providers() # Radar Sentimen Berita memakai parse_feed
 
 # =====================================================================
 # MESIN DATABASE PINTAR (LAZY LOADING)
 # =====================================================================
 @st.cache_data(ttl=3600, show_spinner=False)
+@timed("history_store")
 def get_lazy_historical_data(symbol, period="10y"):
     """
     Mengambil data dari Supabase (Cepat). Jika kosong/kurang, 
@@ -90,10 +102,10 @@ def get_lazy_historical_data(symbol, period="10y"):
 
         # 2. JIKA KOSONG / KURANG, TARIK DARI YFINANCE
         if latest_db_date is None:
-            yf_df = yf.download(symbol, period=period, auto_adjust=True, progress=False)
+            yf_df = price_provider.download(symbol, period=period, auto_adjust=True, progress=False)
         else:
             start_date = (latest_db_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
-            yf_df = yf.download(symbol, start=start_date, auto_adjust=True, progress=False)
+            yf_df = price_provider.download(symbol, start=start_date, auto_adjust=True, progress=False)
 
         if yf_df.empty:
             return db_df if not db_df.empty else pd.DataFrame()
@@ -132,16 +144,24 @@ def get_lazy_historical_data(symbol, period="10y"):
     except Exception as e:
         # FALLBACK: Jika Supabase mati, langsung bypass ke yfinance agar aplikasi tidak crash
         print(f"Bypass yfinance karena error DB: {e}")
-        return yf.download(symbol, period=period, auto_adjust=True, progress=False)
+        return price_provider.download(symbol, period=period, auto_adjust=True, progress=False)
 # =====================================================================
 
 # --- 3. BUKU TAMU GLOBAL ---
 @st.cache_resource
 def get_api_registry():
-    return set()
+    # LRU + TTL di memori, read-through ke tabel api_registry (bertahan lintas restart & replika)
+    return ApiRegistry(supabase)
 
 api_registry = get_api_registry()
 
+@st.cache_resource
+def get_audit_logger():
+    # Antrian + thread latar belakang: insert audit_logs dikirim batch, tidak menahan render halaman
+    return AuditLogger(supabase)
+
+audit_logger = get_audit_logger()
+
 # --- 4. SISTEM LOGIN SAAS DENGAN TOS & AUDIT LOG ---
 def login_ui():
     st.markdown("<h1 style='text-align: center;'>🔒 Portal Login Member</h1>", unsafe_allow_html=True)
@@ -175,11 +195,7 @@ def login_ui():
                     if profile.data:
                         st.session_state['user'] = profile.data[0]
                         st.session_state['logged_in'] = True
-                        try:
-                            supabase.table('audit_logs').insert({
-                                "user_email": email, "action": "LOGIN_TOS_ACCEPTED", "details": "User sukses login dan setuju ToS."
-                            }).execute()
-                        except: pass
+                        audit_logger.log(email, "LOGIN_TOS_ACCEPTED", "User sukses login dan setuju ToS.")
                         st.rerun()
                     else: st.error("Profil tidak ditemukan di database!")
                 # ... kode try Anda sebelumnya ...
@@ -201,21 +217,32 @@ user_email = user_data['email']
 is_admin = (user_role == 'admin')
 
 # --- 5. AUTO-RESET & LOGIKA KUOTA API ---
-try:
+# Profil disimpan di session_state['user'] (cache per sesi). Database hanya disentuh:
+# 1) sekali per sesi per hari WIB untuk cek reset harian, 2) saat kuota dipotong (write-through).
+def update_profile_cache(**fields):
+    st.session_state['user'] = {**st.session_state['user'], **fields}
+
+def ensure_daily_reset():
     wib_today = (datetime.utcnow() + timedelta(hours=7)).strftime('%Y-%m-%d')
-    user_profile = supabase.table('profiles').select('daily_quota, used_quota, last_reset_date').eq('id', user_id).execute().data[0]
-    if user_profile.get('last_reset_date') != wib_today:
-        supabase.table('profiles').update({'used_quota': 0, 'last_reset_date': wib_today}).eq('id', user_id).execute()
-except: pass
+    if st.session_state.get('quota_reset_checked') == wib_today: return
+    try:
+        user_profile = supabase.table('profiles').select('daily_quota, used_quota, last_reset_date').eq('id', user_id).execute().data[0]
+        if user_profile.get('last_reset_date') != wib_today:
+            supabase.table('profiles').update({'used_quota': 0, 'last_reset_date': wib_today}).eq('id', user_id).execute()
+            user_profile.update({'used_quota': 0, 'last_reset_date': wib_today})
+        update_profile_cache(**user_profile)
+        st.session_state['quota_reset_checked'] = wib_today
+    except: pass
+
+ensure_daily_reset()
 
 def check_and_deduct_quota(cache_key):
-    if cache_key in api_registry or is_admin: return True
+    if is_admin or cache_key in api_registry: return True # Admin tidak perlu cek buku tamu (hemat 1 round trip)
     try:
-        fresh_db = supabase.table('profiles').select('daily_quota, used_quota').eq('id', user_id).execute().data[0]
-        if fresh_db['used_quota'] < fresh_db['daily_quota']:
-            supabase.table('profiles').update({'used_quota': fresh_db['used_quota'] + 1}).eq('id', user_id).execute()
-            return True
-        return False
+        # Cek + potong kuota dalam 1 RPC atomik (tidak ada selisih baca-tulis antar tab)
+        res = supabase.rpc('consume_quota', {'p_user_id': user_id}).execute().data
+        update_profile_cache(daily_quota=res['daily_quota'], used_quota=res['used_quota'])
+        return bool(res['allowed'])
     except: return False
 
 # --- 6. CSS FIX UNTUK LAYAR HP ---
@@ -243,18 +270,8 @@ st.markdown("""
 SHARIA_STOCKS = ["ADRO", "AKRA", "ANTM", "BRIS", "BRPT", "CPIN", "EXCL", "HRUM", "ICBP", "INCO", "INDF", "INKP", "INTP", "ITMG", "KLBF", "MAPI", "MBMA", "MDKA", "MEDC", "PGAS", "PGEO", "PTBA", "SMGR", "TLKM", "UNTR", "UNVR", "ACES", "AMRT", "ASII", "TPIA"]
 SHARIA_MIDCAP_STOCKS = ["BRMS", "ELSA", "ENRG", "PTRO", "SIDO", "MYOR", "ESSA", "CTRA", "BSDE", "SMRA", "PWON", "ARTO", "BTPS", "MIKA", "HEAL", "SILO", "MAPA", "AUTO", "SMSM", "TAPG", "DSNG", "LSIP", "AALI", "WIKA", "PTPP", "TOTL", "NRCA", "SCMA", "MNCN", "ERAA"]
 US_STOCKS = ["PGEO", "MSFT", "NVDA", "AMZN", "META", "GOOGL", "TSLA", "AVGO", "LLY", "JPM", "V", "MA", "UNH", "HD", "PG", "COST", "JNJ", "NFLX", "AMD", "CRM"]
-IDX_API_KEY = st.secrets.get("IDX_API_KEY", "")
 
 # --- 8. HELPER FUNCTIONS ---
-def fix_dataframe(df):
-    if df.empty: return df
-    if isinstance(df.columns, pd.MultiIndex):
-        try: df.columns = df.columns.get_level_values(0)
-        except: pass
-    df.columns = [str(c).capitalize() for c in df.columns]
-    df = df.loc[:, ~df.columns.duplicated()]
-    return df
-
 def format_rupiah(angka):
     if angka == 0: return "Rp 0"
     is_negative = angka < 0
@@ -276,144 +293,87 @@ def get_idx_target_date(df):
     return df.index[-1].strftime('%Y-%m-%d')
 
 @st.cache_data(ttl=3600)
+@timed()
 def get_ihsg_data(ticker="^JKSE"):
     try:
-        ihsg = yf.download(ticker, period="1y", auto_adjust=True, progress=False)
+        ihsg = price_provider.download(ticker, period="1y", auto_adjust=True, progress=False)
         ihsg = fix_dataframe(ihsg)
         return ihsg[['Close']].rename(columns={'Close': 'IHSG_Close'})
     except: return pd.DataFrame()
 
 @st.cache_data(ttl=43200)
+@timed("goapi.foreign_flow")
 def fetch_idx_foreign_flow(symbol, target_date):
-    headers = {'accept': 'application/json', 'X-API-KEY': IDX_API_KEY, 'User-Agent': 'Mozilla/5.0'}
     net_foreign, avg_buy_price = 0, 0
     fetch_time = (datetime.utcnow() + timedelta(hours=7)).strftime("%d %b %Y, %H:%M WIB")
     try:
-        url_broker = f"https://api.goapi.io/stock/idx/{symbol}/broker_summary?date={target_date}&investor=FOREIGN"
-        res_broker = requests.get(url_broker, headers=headers, timeout=10)
-        if res_broker.status_code == 200:
-            res_broker_json = res_broker.json()
-            if res_broker_json.get('status') == 'success':
-                buy_val = sum(b['value'] for b in res_broker_json['data']['results'] if b['side'] == 'BUY')
-                buy_lot = sum(b['lot'] for b in res_broker_json['data']['results'] if b['side'] == 'BUY')
-                sell_val = sum(b['value'] for b in res_broker_json['data']['results'] if b['side'] == 'SELL')
-                net_foreign = buy_val - sell_val
-                if buy_lot > 0: avg_buy_price = buy_val / (buy_lot * 100)
+        results = broker_provider.broker_summary(symbol, target_date, investor="FOREIGN")
+        buy_val = sum(b['value'] for b in results if b['side'] == 'BUY')
+        buy_lot = sum(b['lot'] for b in results if b['side'] == 'BUY')
+        sell_val = sum(b['value'] for b in results if b['side'] == 'SELL')
+        net_foreign = buy_val - sell_val
+        if buy_lot > 0: avg_buy_price = buy_val / (buy_lot * 100)
     except: pass
     return net_foreign, avg_buy_price, fetch_time
 
 @st.cache_data(ttl=3600)
+@timed()
 def get_fundamental_info(symbol):
     try:
-        info = yf.Ticker(symbol).info
+        info = price_provider.info(symbol)
         return {"PBV": info.get('priceToBook', None), "EPS_Growth": info.get('earningsQuarterlyGrowth', None)}
     except: return None
 
 # --- 9. FUNGSI TEKNIKAL ANTI-CRASH & AI ---
-def check_candlestick_patterns(curr, prev):
-    score = 0; patterns = []
-    try:
-        body = abs(curr['Close'] - curr['Open'])
-        upper = curr['High'] - max(curr['Close'], curr['Open'])
-        lower = min(curr['Close'], curr['Open']) - curr['Low']
-        rsi = curr.get('Rsi', 50)
-        lower_bb = curr.get('BBL_20_2.0', 0)
-        is_valid_support = (rsi < 40) or (curr['Low'] <= lower_bb * 1.01)
-
-        if (lower > 2 * body) and (upper < body):
-            if is_valid_support: score += 1; patterns.append("🔨 Hammer")
-        if (prev['Close'] < prev['Open']) and (curr['Close'] > curr['Open']):
-            if (curr['Open'] < prev['Close']) and (curr['Close'] > prev['Open']):
-                if is_valid_support: score += 1.5; patterns.append("🦁 Engulfing")
-    except: pass
-    return score, patterns
-
-def calculate_metrics(df, ihsg_df=None):
-    df = fix_dataframe(df)
-    for col in ['SMA20', 'SMA50', 'SMA100', 'EMA200', 'ATR', 'CMF', 'Rsi']:
-        if col not in df.columns:
-            df[col] = np.nan
+# (Pola candlestick, indikator, skor & prediktor KNN ada di technicals.py)
 
+# --- 10. FITUR DIVIDEND HUNTER DENGAN HISTORICAL CHART (BULK SCANNER) ---
+@st.cache_data(ttl=3600, show_spinner=False)
+@timed("supabase.dividend_calendar")
+def get_dividend_calendar(symbols, market):
+    """Kalender dividen pra-hitung (tabel dividend_calendar dari fetcher.py), difilter & diurutkan di server."""
     try:
-        df['Rsi'] = df.ta.rsi(length=14)
-        df = pd.concat([df, df.ta.macd(fast=12, slow=26, signal=9), df.ta.bbands(length=20, std=2)], axis=1)
-        df['SMA20'] = df.ta.sma(length=20)
-        df['SMA50'] = df.ta.sma(length=50)
-        df['SMA100'] = df.ta.sma(length=100)
-        df['EMA200'] = df.ta.ema(length=200)
-        df['ATR'] = df.ta.atr(length=14)
-
-        donchian = df.ta.donchian(lower_length=20, upper_length=20)
-        if donchian is not None: df = pd.concat([df, donchian], axis=1)
-        df['Ret_1'] = df['Close'].pct_change()
-
-        high_low_diff = df['High'] - df['Low']
-        high_low_diff = high_low_diff.replace(0, 0.0001)
-        ad = ((2 * df['Close'] - df['High'] - df['Low']) / high_low_diff) * df['Volume']
-        df['CMF'] = ad.fillna(0).rolling(window=20).sum() / df['Volume'].rolling(window=20).sum()
-
-        if ihsg_df is not None and not ihsg_df.empty:
-            df = df.join(ihsg_df, how='left')
-            df['IHSG_Close'] = df['IHSG_Close'].ffill()
-            df['Stock_Ret_20'] = (df['Close'] - df['Close'].shift(20)) / df['Close'].shift(20)
-            df['IHSG_Ret_20'] = (df['IHSG_Close'] - df['IHSG_Close'].shift(20)) / df['IHSG_Close'].shift(20)
-    except: pass
-    return df
-
-def advanced_analysis(df):
-    if len(df) < 15: return "N/A", "-"
-    curr = df.iloc[-1]
-
-    close = curr.get('Close', 0)
-    ma20 = curr.get('SMA20', close) if pd.notna(curr.get('SMA20')) else close
-    ma50 = curr.get('SMA50', close) if pd.notna(curr.get('SMA50')) else close
-
-    phase = "Sideways"
-    if close > ma50: phase = "🔵 Markup" if close > ma20 else "🔴 Distribution"
-    else: phase = "🟠 Markdown" if close < ma20 else "🟢 Accumulation"
-
-    divergence = "-"
-    if len(df) > 10 and 'CMF' in df.columns:
-        try:
-            if (curr['Close'] - df['Close'].iloc[-10] < 0) and (curr['CMF'] - df['CMF'].iloc[-10] > 0.15):
-                divergence = "🟢 BULLISH DIV"
-        except: pass
-    return phase, divergence
-
-def score_analysis(df, fund_data):
-    if df.empty or len(df)<2: return 0, 0, 0, 0, ["Data Kurang"], df.iloc[-1]
-    curr, prev = df.iloc[-1], df.iloc[-2]
-    score_tech, score_fund, score_bandar, score_candle = 0, 0, 0, 0; reasons = []
-
-    if not pd.isna(curr.get('SMA100')) and not pd.isna(curr.get('EMA200')):
-        if curr['Close'] > curr['SMA20'] and curr['Close'] > curr['SMA50'] and curr['Close'] > curr['SMA100'] and curr['Close'] > curr['EMA200']:
-            score_tech += 2; reasons.append("🔥 MA")
-        elif not pd.isna(curr.get('EMA200')) and curr['Close'] > curr['EMA200']:
-            score_tech += 1; reasons.append("📈 Uptrend")
-
-    dcu = curr.get('DCU_20_20', 0)
-    if pd.notna(dcu) and dcu > 0 and curr['Close'] >= (dcu * 0.99):
-        score_tech += 1.5; reasons.append("🚀 Breakout DC")
-
-    if 'Stock_Ret_20' in df.columns and 'IHSG_Ret_20' in df.columns:
-        if not pd.isna(curr['Stock_Ret_20']) and curr['Stock_Ret_20'] > curr['IHSG_Ret_20'] and curr['Stock_Ret_20'] > 0:
-            score_tech += 1.5; reasons.append("🌟 Market Beat")
-
-    cmf = curr.get('CMF', 0)
-    if pd.notna(cmf) and cmf > 0.1: score_bandar = 2; reasons.append("🐳 CMF")
+        res = supabase.table('dividend_calendar').select('symbol, price, low_52w, yield_pct, ex_date') \
+            .eq('market', market).in_('symbol', list(symbols)).gt('yield_pct', 0).lte('yield_pct', MAX_YIELD) \
+            .order('yield_pct', desc=True).execute()
+        return res.data
+    except: return []
+
+@st.cache_data(ttl=600, show_spinner=False)
+def get_dividend_history_version(symbols, market):
+    """Versi histori dividen = waktu baris terbaru masuk. Berubah hanya jika fetcher menambah dividen baru."""
+    try:
+        res = supabase.table('dividend_history_latest').select('last_created_at').eq('market', market).in_('symbol', list(symbols)).execute()
+        return max((r['last_created_at'] for r in res.data), default="")
+    except: return ""
 
-    rsi = curr.get('Rsi', 50)
-    if pd.notna(rsi) and rsi < 35: score_tech += 2; reasons.append("💎 RSI")
+@st.cache_data(max_entries=50, show_spinner=False)
+def get_dividend_analytics(symbols, market, version):
+    """
+    Trailing dividen, streak kenaikan & konsistensi per saham. Dihitung ulang hanya saat 'version' berubah.
+    Error database sengaja tidak ditangkap di sini: st.cache_data tidak menyimpan exception, jadi hasil kosong
+    akibat gangguan sesaat tidak ikut ter-cache sampai versi berikutnya.
+    """
+    since = (datetime.utcnow() - timedelta(days=366 * (CONSISTENCY_YEARS + 1))).strftime('%Y-%m-%d')
+    res = supabase.table('dividend_history').select('symbol, ex_date, amount').eq('market', market) \
+        .in_('symbol', list(symbols)).gte('ex_date', since).execute()
+    return dividend_metrics(pd.DataFrame(res.data))
 
-    if fund_data and fund_data.get('EPS_Growth') and fund_data.get('EPS_Growth') > 0.10:
-        score_fund += 2; reasons.append("🚀 EPS")
+def load_dividend_metrics(symbols, market):
+    symbols = tuple(sorted(set(symbols)))
+    try: return get_dividend_analytics(symbols, market, get_dividend_history_version(symbols, market))
+    except: return dividend_metrics(None)
 
-    s_candle, patterns = check_candlestick_patterns(curr, prev)
-    score_candle += s_candle
-    if patterns: reasons.append("🕯️ Pola")
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_upcoming_dividends(symbols, market="IDX"):
+    """Jadwal ex-date mendatang untuk sekumpulan saham, 1 query ke dividend_calendar."""
+    try:
+        today = (datetime.utcnow() + timedelta(hours=7)).strftime('%Y-%m-%d')
+        res = supabase.table('dividend_calendar').select('symbol, ex_date').eq('market', market) \
+            .in_('symbol', list(symbols)).gte('ex_date', today).order('ex_date').execute()
+        return res.data
+    except: return []
 
-    return score_tech, score_fund, score_bandar, score_candle, reasons, curr
-# --- 10. FITUR DIVIDEND HUNTER DENGAN HISTORICAL CHART (BULK SCANNER) ---
 def show_dividend_hunter(stock_list, category_name, market_choice):
     st.header(f"📅 Dividend Hunter ({category_name})")
 
@@ -441,44 +401,29 @@ def show_dividend_hunter(stock_list, category_name, market_choice):
         return
 
     if st.button("Pindai Kalender Dividen Massal 🔍"):
-        progress = st.progress(0); status = st.empty(); results = []
-        
         # Penyesuaian Ticker untuk Wall Street / Indonesia
-        tickers = [f"{s}.JK" if "Indonesia" in market_choice else s for s in stock_list]
-        is_us = "US" in market_choice
-
-        for i, t in enumerate(tickers):
-            status.text(f"Memeriksa data dividen: {t} ...")
-            progress.progress((i+1)/len(tickers))
-            try:
-                info = yf.Ticker(t).info
-                div_rate = info.get('dividendRate', 0)
-                price = info.get('previousClose', 1)
-                div_yield_raw = info.get('dividendYield', 0)
-                ex_date_ts = info.get('exDividendDate', None)
-                low_52w = info.get('fiftyTwoWeekLow', 0)
-
-                if pd.notna(div_rate) and div_rate > 0 and pd.notna(price) and price > 0:
-                    calculated_yield = (div_rate / price) * 100
-                elif pd.notna(div_yield_raw) and div_yield_raw > 0:
-                    calculated_yield = (div_yield_raw * 100) if div_yield_raw < 1 else div_yield_raw
-                else: calculated_yield = 0
-
-                if calculated_yield > 0 and calculated_yield <= 40:
-                    ex_date_str = "Belum Diumumkan"
-                    if ex_date_ts: ex_date_str = datetime.utcfromtimestamp(ex_date_ts).strftime('%Y-%m-%d')
-                    
-                    kode_bersih = t.replace(".JK", "")
-                    results.append({
-                        "Kode": kode_bersih, "Harga": price, "Support 1Y": low_52w,
-                        "Yield (%)": round(calculated_yield, 2), "Ex-Date": ex_date_str
-                    })
-            except: continue
-
-        progress.empty(); status.empty()
+        market = "IDX" if "Indonesia" in market_choice else "US"
+        with st.spinner("Membaca kalender dividen..."):
+            rows = get_dividend_calendar(tuple(stock_list), market)
+            if not rows:
+                # Fallback: tabel belum terisi job malam -> tarik live secara paralel
+                tickers = [f"{s}.JK" if market == "IDX" else s for s in stock_list]
+                rows = scan_dividends(tickers, market, with_history=False, prices=price_provider)
+
+        results = [{
+            "Kode": r['symbol'], "Harga": r['price'], "Support 1Y": r['low_52w'],
+            "Yield (%)": r['yield_pct'], "Ex-Date": r['ex_date'] or "Belum Diumumkan"
+        } for r in rows]
 
         if results:
             df_div = pd.DataFrame(results).sort_values(by="Yield (%)", ascending=False)
+            # Lengkapi dengan analitik histori dividen (trailing yield, streak kenaikan, konsistensi)
+            metrics = load_dividend_metrics(df_div['Kode'].tolist(), market)
+            if not metrics.empty:
+                m = metrics.reindex(df_div['Kode'])
+                df_div['Yield TTM (%)'] = (m['ttm_dividend'].to_numpy() / df_div['Harga'].to_numpy() * 100).round(2)
+                df_div['Streak Naik (Th)'] = m['growth_streak'].to_numpy()
+                df_div['Konsistensi (%)'] = m['consistency'].round(0).to_numpy()
             st.session_state['div_results'] = df_div
             st.success(f"✅ Selesai! Menemukan {len(results)} saham dengan data dividen valid.")
         else:
@@ -503,7 +448,9 @@ def show_dividend_hunter(stock_list, category_name, market_choice):
                     "Harga": st.column_config.NumberColumn(format="Rp %d"),
                     "Support 1Y": st.column_config.NumberColumn(format="Rp %d"),
                     "Yield (%)": st.column_config.NumberColumn(format="%.2f %%"),
-                    "Ex-Date": st.column_config.TextColumn(width="medium")
+                    "Ex-Date": st.column_config.TextColumn(width="medium"),
+                    "Yield TTM (%)": st.column_config.NumberColumn(format="%.2f %%"),
+                    "Konsistensi (%)": st.column_config.NumberColumn(format="%d %%", help=f"Persentase tahun membagi dividen dalam {CONSISTENCY_YEARS} tahun terakhir")
                 })
 
         st.divider()
@@ -515,7 +462,7 @@ def show_dividend_hunter(stock_list, category_name, market_choice):
         if selected_div_stock:
             with st.spinner("Menggambar grafik..."):
                 symbol_chart = f"{selected_div_stock}.JK" if "Indonesia" in market_choice else selected_div_stock
-                df_hist = yf.download(symbol_chart, period="1y", auto_adjust=True, progress=False)
+                df_hist = price_provider.download(symbol_chart, period="1y", auto_adjust=True, progress=False)
                 
                 if not df_hist.empty:
                     df_hist = fix_dataframe(df_hist)
@@ -653,7 +600,8 @@ def run_screener(use_idx_data, stock_list, category_name, market_choice):
 
             status.text("Mengambil Data IHSG...")
             ihsg_df = get_ihsg_data()
-            price_data = yf.download(tickers, period="1y", group_by='ticker', auto_adjust=True, progress=False, threads=True)
+            with timer("yf.download_screener"):
+                price_data = price_provider.download(tickers, period="1y", group_by='ticker', auto_adjust=True, progress=False, threads=True)
 
             for i, t in enumerate(tickers):
                 status.text(f"Menganalisa Teknikal: {t} ...")
@@ -830,14 +778,14 @@ def show_chart(use_idx_data, market_choice):
         symbol = f"{ticker}.JK" if "Indonesia" in market_choice and not ticker.endswith(".JK") else ticker
         ticker_only = ticker.replace(".JK", "")
 
-        try: supabase.table('audit_logs').insert({"user_email": user_email, "action": "SEARCH_CHART", "details": f"Mencari chart: {ticker_only}"}).execute()
-        except: pass
+        audit_logger.log(user_email, "SEARCH_CHART", f"Mencari chart: {ticker_only}")
 
         benchmark = "^JKSE" if "Indonesia" in market_choice else "^GSPC"
         ihsg_df = get_ihsg_data(benchmark)
 
         with st.spinner(f"Menganalisis {ticker_only}..."):
-            df = yf.download(symbol, period="2y", auto_adjust=True, progress=False)
+            with timer("yf.download_chart"):
+                df = price_provider.download(symbol, period="2y", auto_adjust=True, progress=False)
             if df.empty:
                 st.error("❌ Saham tidak ditemukan! Pastikan kode benar.")
                 return
@@ -848,23 +796,7 @@ def show_chart(use_idx_data, market_choice):
             fund = get_fundamental_info(symbol)
 
             # --- MESIN KECERDASAN BUATAN (LIVE KNN PREDICTOR) ---
-            prob_up = 0.5
-            try:
-                df['Target_Besok'] = (df['Close'].shift(-1) > df['Close']).astype(int)
-                ml_df = df[['Rsi', 'CMF', 'Ret_1', 'Target_Besok']].dropna()
-
-                if len(ml_df) > 100:
-                    X = ml_df[['Rsi', 'CMF', 'Ret_1']]
-                    y = ml_df['Target_Besok']
-                    scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
-                    knn = KNeighborsClassifier(n_neighbors=5)
-                    knn.fit(X_scaled, y)
-
-                    today_features = pd.DataFrame({'Rsi': [df['Rsi'].iloc[-1]], 'CMF': [df['CMF'].iloc[-1]], 'Ret_1': [df['Ret_1'].iloc[-1]]})
-                    today_scaled = scaler.transform(today_features)
-                    prob_up = knn.predict_proba(today_scaled)[0][1]
-            except Exception as e: pass
+            prob_up = knn_probability_up(df)
 
             s_tech, s_fund, s_bandar, s_candle, reasons, last = score_analysis(df, fund)
             wyckoff_phase, divergence = advanced_analysis(df)
@@ -897,17 +829,18 @@ def show_chart(use_idx_data, market_choice):
 
             close, volume, atr = last['Close'], last['Volume'], last.get('ATR', 0)
             daily_turnover = close * volume
-            stop_loss = close - (1.5 * atr) if atr > 0 else close
-            target_profit = close + (3.0 * atr) if atr > 0 else close
+            live_close = get_price_snapshot().get([symbol]).get(symbol, close) # Harga terakhir dari snapshot bersama
+            stop_loss = live_close - (1.5 * atr) if atr > 0 else live_close
+            target_profit = live_close + (3.0 * atr) if atr > 0 else live_close
 
             c1, c2, c3, c4 = st.columns(4)
 
             fase_color = "normal"
             fase_text = f"-{wyckoff_phase}" if "Markdown" in wyckoff_phase or "Distribution" in wyckoff_phase else wyckoff_phase
-            c1.metric("Harga Saat Ini & Fase", format_currency(close, is_us), fase_text, delta_color=fase_color)
+            c1.metric("Harga Saat Ini & Fase", format_currency(live_close, is_us), fase_text, delta_color=fase_color)
 
-            tp_pct = ((target_profit - close) / close) * 100 if close > 0 else 0
-            sl_pct = ((close - stop_loss) / close) * 100 if close > 0 else 0
+            tp_pct = ((target_profit - live_close) / live_close) * 100 if live_close > 0 else 0
+            sl_pct = ((live_close - stop_loss) / live_close) * 100 if live_close > 0 else 0
             c2.metric(f"Target Profit (+{tp_pct:.1f}%)", format_currency(target_profit, is_us), f"Batas Rugi: {format_currency(stop_loss, is_us)} (-{sl_pct:.1f}%)", delta_color="off")
 
             if is_us:
@@ -972,12 +905,74 @@ def show_chart(use_idx_data, market_choice):
                     dict(bounds=["sat", "mon"]) # Melompati hari Sabtu hingga Senin (Pagi)
                 ]
             )
-            st.plotly_chart(fig, use_container_width=True)
+            with timer("plotly_render_chart"):
+                st.plotly_chart(fig, use_container_width=True)
 
 # --- 13. FITUR ADMIN DASHBOARD ---
 # ==============================================================================
 # --- FITUR ADMIN DASHBOARD (CONTROL PANEL) ---
 # ==============================================================================
+ADMIN_PAGE_SIZE = 50
+
+@timed("supabase.profiles_page")
+def fetch_profiles_page(search, after_email, page_size=ADMIN_PAGE_SIZE):
+    """Keyset pagination tabel profiles (urut email). Mengembalikan (baris halaman ini, ada halaman berikutnya?)."""
+    def page(columns):
+        q = supabase.table('profiles').select(columns)
+        if search: q = q.ilike('email', f"%{search}%")
+        if after_email: q = q.gt('email', after_email)
+        return q.order('email').limit(page_size + 1).execute().data
+    try: rows = page('id, email, role, daily_quota, used_quota, created_at')
+    except: rows = page('id, email, role, daily_quota, used_quota') # Tabel profiles lama tanpa kolom created_at
+    return rows[:page_size], len(rows) > page_size
+
+@timed("supabase.audit_page")
+def fetch_audit_page(action, start_date, end_date, cursor=None, page_size=ADMIN_PAGE_SIZE):
+    """Log audit per rentang tanggal (WIB), dengan kursor (created_at, id) untuk 'muat lebih banyak'."""
+    start_utc = (pd.Timestamp(start_date) - pd.Timedelta(hours=7)).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    end_utc = (pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(hours=7)).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    q = supabase.table('audit_logs').select('id, created_at, user_email, details').eq('action', action) \
+        .gte('created_at', start_utc).lt('created_at', end_utc)
+    if cursor:
+        ts, last_id = cursor
+        q = q.or_(f'created_at.lt."{ts}",and(created_at.eq."{ts}",id.lt.{last_id})')
+    rows = q.order('created_at', desc=True).order('id', desc=True).limit(page_size + 1).execute().data
+    return rows[:page_size], len(rows) > page_size
+
+def show_audit_log(action, key):
+    """Tab log audit: filter rentang tanggal + tombol muat lebih banyak (keyset, bukan offset)."""
+    state_key = f"audit_{key}"
+    today_wib = (datetime.utcnow() + timedelta(hours=7)).date()
+    date_range = st.date_input("Rentang Tanggal (WIB):", (today_wib - timedelta(days=7), today_wib), key=f"range_{key}")
+    if not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+        st.info("Pilih tanggal awal dan akhir.")
+        return
+
+    if st.button("Muat Log", type="primary", key=f"btn_{key}"):
+        try:
+            rows, has_more = fetch_audit_page(action, *date_range)
+            st.session_state[state_key] = {"rows": rows, "has_more": has_more, "range": tuple(date_range)}
+        except: st.error("Gagal menarik data log.")
+
+    state = st.session_state.get(state_key)
+    if not state or state['range'] != tuple(date_range): return
+    if not state['rows']:
+        st.info("Belum ada data.")
+        return
+
+    df = pd.DataFrame(state['rows'])
+    df['Waktu (UTC)'] = df['created_at'].str.slice(0, 19).str.replace('T', ' ')
+    st.dataframe(df[['Waktu (UTC)', 'user_email', 'details']], use_container_width=True, hide_index=True)
+    st.caption(f"Menampilkan {len(df)} log.")
+
+    if state['has_more'] and st.button("⬇️ Muat Lebih Banyak", key=f"more_{key}"):
+        try:
+            last = state['rows'][-1]
+            rows, has_more = fetch_audit_page(action, *date_range, cursor=(last['created_at'], last['id']))
+            state.update({"rows": state['rows'] + rows, "has_more": has_more})
+            st.rerun()
+        except: st.error("Gagal menarik data log.")
+
 def show_admin_dashboard():
     st.header("👑 Admin Dashboard & Control Panel")
     st.markdown("Pusat kendali akun, kuota API, dan analitik pengguna secara *real-time*.")
@@ -989,24 +984,47 @@ def show_admin_dashboard():
     st.divider()
 
     # Menambah Tab Manajemen Pengguna di awal
-    tab1, tab2, tab3 = st.tabs(["👥 Manajemen Pengguna", "📜 Log Persetujuan ToS", "🔍 Log Pencarian Saham"])
+    tab1, tab2, tab3, tab4 = st.tabs(["👥 Manajemen Pengguna", "📜 Log Persetujuan ToS", "🔍 Log Pencarian Saham", "⏱️ Performa"])
 
     # --- TAB 1: MANAJEMEN PENGGUNA & KUOTA ---
     with tab1:
         try:
-            # Tarik data lengkap dari profil
-            res_users = supabase.table('profiles').select('*').execute()
-            df_users = pd.DataFrame(res_users.data)
-
-            if not df_users.empty:
-                # Metrik Ringkasan Dinamis
-                role_counts = df_users['role'].value_counts()
+            # Metrik Ringkasan Dinamis (dihitung di SQL, bukan menarik seluruh tabel profiles)
+            role_counts = supabase.table('profile_role_counts').select('role, n_users').order('n_users', desc=True).execute().data
+            if role_counts:
                 cols = st.columns(len(role_counts))
-                for i, (role_name, count) in enumerate(role_counts.items()):
-                    cols[i].metric(f"Role: {role_name.upper()}", f"{count} User")
+                for i, r in enumerate(role_counts):
+                    cols[i].metric(f"Role: {str(r['role']).upper()}", f"{r['n_users']} User")
 
-                st.divider()
+            quota = supabase.table('profile_quota_summary').select('*').execute().data
+            if quota:
+                q1, q2, q3 = st.columns(3)
+                q1.metric("Kuota Terpakai Hari Ini", f"{int(quota[0]['total_used_quota'] or 0):,}", f"dari {int(quota[0]['total_daily_quota'] or 0):,}", delta_color="off")
+                q2.metric("User Kuota Habis", f"{int(quota[0]['n_exhausted'] or 0)} User")
+                q3.metric("Total User", f"{int(quota[0]['n_users'] or 0)} User")
 
+            # Total buku besar seluruh user (1 baris agregat ledger_totals)
+            try:
+                tot = supabase.table('ledger_totals').select('*').eq('id', 1).execute().data
+                if tot:
+                    l1, l2, l3 = st.columns(3)
+                    l1.metric("PnL Terealisasi (Semua User)", f"Rp {float(tot[0]['realized_pnl']):,.0f}")
+                    l2.metric("Total Transaksi Jual", f"{tot[0]['n_sells']}x")
+                    l3.metric("Total Transaksi Beli", f"{tot[0]['n_buys']}x")
+            except: pass
+
+            st.divider()
+
+            # --- PENCARIAN & HALAMAN USER (KEYSET PAGINATION) ---
+            search = st.text_input("🔎 Cari Email User:", key="admin_user_search").strip()
+            if st.session_state.get('admin_user_search_last') != search:
+                st.session_state['admin_user_cursors'] = [None] # Tumpukan kursor: email terakhir tiap halaman sebelumnya
+                st.session_state['admin_user_search_last'] = search
+            cursors = st.session_state['admin_user_cursors']
+            rows, has_next = fetch_profiles_page(search, cursors[-1])
+            df_users = pd.DataFrame(rows)
+
+            if not df_users.empty:
                 # Form Update Akun
                 st.subheader("⚙️ Konfigurasi Akun & Kuota")
                 with st.expander("Klik untuk Edit Role & Batas Kuota User", expanded=True):
@@ -1020,7 +1038,7 @@ def show_admin_dashboard():
                     idx_role = roles.index(u_data['role']) if u_data['role'] in roles else 0
                     
                     new_role = c_role.selectbox("Role Baru:", roles, index=idx_role)
-                    new_q = c_quota.number_input("Batas Kuota Harian:", min_value=0, value=int(u_data.get('daily_quota', 0)))
+                    new_q = c_quota.number_input("Batas Kuota Harian:", min_value=0, value=int(u_data.get('daily_quota', 0) or 0))
 
                     if st.button("💾 Simpan Perubahan", type="primary", use_container_width=True):
                         supabase.table('profiles').update({
@@ -1055,6 +1073,16 @@ def show_admin_dashboard():
                 
                 st.dataframe(df_final, use_container_width=True, hide_index=True)
 
+                # Navigasi halaman
+                p_prev, p_info, p_next = st.columns([1, 2, 1])
+                if p_prev.button("⬅️ Sebelumnya", disabled=len(cursors) == 1, use_container_width=True):
+                    cursors.pop()
+                    st.rerun()
+                p_info.caption(f"Halaman {len(cursors)} · {len(df_users)} user ditampilkan")
+                if p_next.button("Berikutnya ➡️", disabled=not has_next, use_container_width=True):
+                    cursors.append(rows[-1]['email'])
+                    st.rerun()
+
             else:
                 st.info("Tidak ada data pengguna.")
         except Exception as e:
@@ -1062,29 +1090,50 @@ def show_admin_dashboard():
 
     # --- TAB 2: LOG PERSETUJUAN TOS ---
     with tab2:
-        if st.button("Muat Data Persetujuan ToS", type="primary", key="btn_tos"):
-            with st.spinner("Mengambil log..."):
-                try:
-                    res = supabase.table('audit_logs').select('*').eq('action', 'LOGIN_TOS_ACCEPTED').order('created_at', desc=True).limit(100).execute()
-                    if res.data:
-                        df = pd.DataFrame(res.data)
-                        df['Waktu (UTC)'] = df['created_at'].str.slice(0, 19).str.replace('T', ' ')
-                        st.dataframe(df[['Waktu (UTC)', 'user_email', 'details']], use_container_width=True, hide_index=True)
-                    else: st.info("Belum ada data.")
-                except: st.error("Gagal menarik data log.")
+        show_audit_log('LOGIN_TOS_ACCEPTED', "tos")
 
     # --- TAB 3: LOG PENCARIAN SAHAM ---
     with tab3:
-        if st.button("Muat Data Pencarian Saham", type="primary", key="btn_search"):
-            with st.spinner("Mengambil log..."):
-                try:
-                    res = supabase.table('audit_logs').select('*').eq('action', 'SEARCH_CHART').order('created_at', desc=True).limit(100).execute()
-                    if res.data:
-                        df = pd.DataFrame(res.data)
-                        df['Waktu (UTC)'] = df['created_at'].str.slice(0, 19).str.replace('T', ' ')
-                        st.dataframe(df[['Waktu (UTC)', 'user_email', 'details']], use_container_width=True, hide_index=True)
-                    else: st.info("Belum ada data.")
-                except: st.error("Gagal menarik data log.")
+        show_audit_log('SEARCH_CHART', "search")
+
+    # --- TAB 4: LATENSI HOT PATH (RING BUFFER PROSES INI) ---
+    with tab4:
+        st.caption(f"Sampel dari proses server ini sejak start (maks {perf.RING_SIZE:,} panggilan terakhir). Fungsi ber-cache hanya tercatat saat benar-benar dihitung.")
+        by_name = perf.summary('name')
+        if by_name.empty:
+            st.info("Belum ada sampel. Buka beberapa halaman terlebih dahulu.")
+        else:
+            st.subheader("Per Fungsi")
+            st.dataframe(by_name, use_container_width=True, hide_index=True)
+            st.subheader("Per Halaman")
+            st.dataframe(perf.summary('page'), use_container_width=True, hide_index=True)
+
+            pick = st.selectbox("Histogram latensi:", by_name['name'].tolist(), key="perf_hist")
+            edges, counts = perf.histogram(pick)
+            if len(counts):
+                fig_h = go.Figure(go.Bar(x=[f"{a:.1f}-{b:.1f}" for a, b in zip(edges[:-1], edges[1:])], y=counts, marker_color='cyan'))
+                fig_h.update_layout(height=300, template="plotly_dark", margin=dict(l=0, r=0, t=10, b=0), xaxis_title="Latensi (ms)", yaxis_title="Jumlah")
+                st.plotly_chart(fig_h, use_container_width=True)
+
+        # --- PROFILER SEKALI JALAN ---
+        st.divider()
+        st.subheader("🧪 Profiler Rerun Berikutnya")
+        st.caption("Pilih halaman, lalu buka halaman tersebut dan jalankan aksi yang lambat. Rerun pertama setelah halaman tampil (aksi Anda) diprofil (cProfile + tracemalloc).")
+        pages = [m for m in menu_options if m != "👑 Admin Dashboard"]
+        c_page, c_arm = st.columns([2, 1])
+        target_page = c_page.selectbox("Halaman:", pages, key="profile_page")
+        if c_arm.button("🎯 Aktifkan", use_container_width=True):
+            st.session_state['profile_next'] = {"page": target_page, "armed": False}
+        if st.session_state.get('profile_next'):
+            st.info(f"Menunggu aksi berikutnya di **{st.session_state['profile_next']['page']}**...")
+        if st.session_state.get('profile_report'):
+            show_profile_report(st.session_state['profile_report'], "admin")
+
+        c_exp, c_reset = st.columns(2)
+        c_exp.download_button("📥 Export Metrik (JSON)", perf.export_json(), file_name=f"perf_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.json", mime="application/json", use_container_width=True)
+        if c_reset.button("🔄 Reset Sampel", use_container_width=True):
+            perf.reset()
+            st.rerun()
                 
 # --- 14. PUSAT EDUKASI & STRATEGI TRADING ---
 def show_education():
@@ -1172,6 +1221,67 @@ def show_education():
         3. **Sabar di Fase Accumulation**: Saham di fase akumulasi harganya sangat aman, namun mungkin membutuhkan kesabaran ekstra sebelum bandar mulai menerbangkannya ke atas.
         """)
 # --- 14.5 FITUR BARU: MESIN BACKTESTING (UJI SEJARAH STRATEGI) ---
+# Strategi & parameter menjadi bagian dari kunci cache hasil backtest.
+# Tambah entri baru di sini jika ada strategi lain (jangan ubah yang lama, agar cache lama tetap valid).
+BACKTEST_STRATEGY = "TREND_SMA50_SMA20"
+BACKTEST_PARAMS = {"entry_sma": 50, "exit_sma": 20, "years": 3}
+
+@st.cache_data(ttl=86400, show_spinner=False)
+@timed()
+def get_backtest_result(symbol, market, strategy, params_json, last_bar_date, _df):
+    """
+    Memoization 2 lapis: memori server (st.cache_data) lalu tabel Supabase 'backtest_cache'.
+    Tanggal bar terakhir ikut jadi kunci, jadi cache otomatis basi saat bar baru masuk.
+    Pasar ikut jadi kunci: kode yang sama bisa ada di IDX & US (mis. PGEO).
+    """
+    cache_key = f"{market}|{symbol}|{strategy}|{params_json}|{last_bar_date}"
+    try:
+        res = supabase.table('backtest_cache').select('result').eq('cache_key', cache_key).execute()
+        if res.data: return res.data[0]['result']
+    except: pass
+
+    params = json.loads(params_json)
+    result = compute_backtest(_df, entry_sma=params['entry_sma'], exit_sma=params['exit_sma'])
+    if result is None: return None
+
+    try:
+        supabase.table('backtest_cache').upsert({
+            "cache_key": cache_key, "symbol": symbol, "market": market, "strategy": strategy,
+            "params": params, "last_bar_date": last_bar_date, "result": result
+        }).execute()
+        # Buang hasil lama milik kombinasi yang sama (bar-nya sudah basi)
+        supabase.table('backtest_cache').delete().eq('symbol', symbol).eq('market', market).eq('strategy', strategy).lt('last_bar_date', last_bar_date).execute()
+    except: pass
+    return result
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def get_backtest_projection(symbol, market, strategy, params_json, last_bar_date, _equity):
+    """Monte Carlo kurva ekuitas strategi, di-cache dengan kunci yang sama seperti hasil backtest."""
+    return monte_carlo(pd.Series(_equity).pct_change().dropna())
+
+def show_projection(mc, modal, is_us=False):
+    """Pita persentil proyeksi Monte Carlo + peluang rugi, dikalikan modal awal."""
+    if mc is None:
+        st.info("🔮 Proyeksi Monte Carlo tidak tersedia: belum ada return harian yang cukup.")
+        return
+    st.subheader(f"🔮 Proyeksi Modal {mc['horizon']} Hari Bursa ke Depan (Monte Carlo)")
+    st.caption(f"{mc['n_paths']:,} simulasi *block bootstrap* dari return harian historis. Bukan jaminan hasil di masa depan.")
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Skenario Tengah (Median)", format_currency(modal * mc['median_final'], is_us), f"{(mc['median_final'] - 1) * 100:.1f}%")
+    m2.metric("Skenario Buruk (5%)", format_currency(modal * mc['p5_final'], is_us), f"{(mc['p5_final'] - 1) * 100:.1f}%")
+    m3.metric("Peluang Rugi", f"{mc['prob_loss']:.1f}%", "Nilai akhir < modal awal", delta_color="off")
+
+    bands = mc['bands'] * modal
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=bands.index, y=bands['P95'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=bands.index, y=bands['P5'], fill='tonexty', fillcolor='rgba(46,134,193,0.2)', line=dict(width=0), name='Rentang 5%-95%'))
+    fig.add_trace(go.Scatter(x=bands.index, y=bands['P75'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=bands.index, y=bands['P25'], fill='tonexty', fillcolor='rgba(46,134,193,0.4)', line=dict(width=0), name='Rentang 25%-75%'))
+    fig.add_trace(go.Scatter(x=bands.index, y=bands['P50'], mode='lines', name='Median', line=dict(color='cyan', width=2)))
+    fig.add_hline(y=modal, line_dash="dash", line_color="gray")
+    fig.update_layout(height=350, template="plotly_dark", margin=dict(l=0, r=0, t=10, b=0), xaxis_title="Hari Bursa ke-", yaxis_title="Nilai", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    st.plotly_chart(fig, use_container_width=True)
+
 def show_backtesting(market_choice):
     st.header("🧪 Mesin Backtesting (Uji Strategi AI)")
     # --- PROTEKSI VIP ---
@@ -1209,51 +1319,33 @@ def show_backtesting(market_choice):
             ticker_only = ticker.replace(".JK", "")
 
             try:
-                # Menarik data 3 tahun terakhir
-                df = yf.download(symbol, period="3y", auto_adjust=True, progress=False)
+                # Menarik data dari History Store (Supabase + lazy load yfinance), dipotong sesuai periode strategi
+                df = get_lazy_historical_data(symbol, period="10y")
                 if df.empty:
                     st.error("❌ Data saham tidak ditemukan.")
                     return
                 
                 df = fix_dataframe(df)
                 df = df[df['Volume'] > 0]
+                df = df[df.index >= df.index[-1] - pd.DateOffset(years=BACKTEST_PARAMS['years'])]
                 
-                # --- STRATEGI ALGORITMA (AI Trend Follower) ---
-                # Aturan Beli: Harga menembus MA 50 ke atas (Uptrend Reversal)
-                # Aturan Jual: Harga jatuh ke bawah MA 20 (Momentum Hilang)
-                df['SMA20'] = df.ta.sma(length=20)
-                df['SMA50'] = df.ta.sma(length=50)
-                
-                # Simulasi Keputusan (Vectorized - Super Cepat)
-                df['Signal'] = 0
-                df.loc[df['Close'] > df['SMA50'], 'Signal'] = 1  # Mode Beli/Hold
-                df.loc[df['Close'] < df['SMA20'], 'Signal'] = 0  # Mode Jual/Cash
-                
-                df['Position'] = df['Signal'].ffill().fillna(0)
-                
-                # Hitung Keuntungan Harian
-                df['Daily_Return'] = df['Close'].pct_change()
-                df['Strategy_Return'] = df['Position'].shift(1) * df['Daily_Return']
-                
-                # Pertumbuhan Modal Berbunga (Compound Interest)
-                df['Equity'] = modal_awal * (1 + df['Strategy_Return']).cumprod()
-                df['Buy_Hold_Equity'] = modal_awal * (1 + df['Daily_Return']).cumprod()
-                
-                # --- KALKULASI METRIK PERFORMA ---
-                df = df.dropna()
-                modal_akhir = df['Equity'].iloc[-1]
-                bnh_akhir = df['Buy_Hold_Equity'].iloc[-1]
-                
-                total_return = ((modal_akhir - modal_awal) / modal_awal) * 100
-                bnh_return = ((bnh_akhir - modal_awal) / modal_awal) * 100
-                
-                # Menghitung Risiko (Max Drawdown / Penurunan Terdalam)
-                rolling_max = df['Equity'].cummax()
-                drawdown = (df['Equity'] - rolling_max) / rolling_max
-                max_drawdown = drawdown.min() * 100
+                last_bar_date = df.index[-1].strftime('%Y-%m-%d')
+                params_json = json.dumps(BACKTEST_PARAMS, sort_keys=True)
+                result = get_backtest_result(ticker_only, "US" if is_us else "IDX", BACKTEST_STRATEGY, params_json, last_bar_date, df)
+                if not result:
+                    st.error("❌ Data historis terlalu pendek untuk disimulasikan.")
+                    return
+
+                equity = pd.Series(result['equity'], index=pd.to_datetime(result['dates'])) * modal_awal
+                bnh_equity = pd.Series(result['bnh'], index=equity.index) * modal_awal
+                modal_akhir = equity.iloc[-1]
+                bnh_akhir = bnh_equity.iloc[-1]
+                total_return = result['total_return']
+                bnh_return = result['bnh_return']
+                max_drawdown = result['max_drawdown']
 
                 # --- TAMPILAN DASHBOARD HASIL ---
-                st.success(f"✅ Simulasi Selesai! Menguji {len(df)} hari perdagangan pada saham {ticker_only}.")
+                st.success(f"✅ Simulasi Selesai! Menguji {result['n_days']} hari perdagangan pada saham {ticker_only}.")
                 
                 c1, c2, c3 = st.columns(3)
                 c1.metric("Modal Akhir (Strategi AI)", format_currency(modal_akhir, is_us), f"{total_return:.2f}% Profit")
@@ -1268,18 +1360,44 @@ def show_backtesting(market_choice):
                 # --- GRAFIK PERTUMBUHAN MODAL (EQUITY CURVE) ---
                 st.subheader("📈 Grafik Pertumbuhan Modal (Equity Curve)")
                 fig = go.Figure()
-                fig.add_trace(go.Scatter(x=df.index, y=df['Equity'], mode='lines', name='Strategi Quant AI', line=dict(color='#00FF00', width=3)))
-                fig.add_trace(go.Scatter(x=df.index, y=df['Buy_Hold_Equity'], mode='lines', name='Beli & Tahan Biasa', line=dict(color='#555555', width=2, dash='dot')))
+                fig.add_trace(go.Scatter(x=equity.index, y=equity, mode='lines', name='Strategi Quant AI', line=dict(color='#00FF00', width=3)))
+                fig.add_trace(go.Scatter(x=bnh_equity.index, y=bnh_equity, mode='lines', name='Beli & Tahan Biasa', line=dict(color='#555555', width=2, dash='dot')))
                 
                 fig.update_layout(height=400, template="plotly_dark", margin=dict(l=0, r=0, t=30, b=0), yaxis_title="Saldo Modal", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
                 st.plotly_chart(fig, use_container_width=True)
 
+                # --- PROYEKSI MASA DEPAN STRATEGI ---
+                show_projection(get_backtest_projection(ticker_only, "US" if is_us else "IDX", BACKTEST_STRATEGY, params_json, last_bar_date, result['equity']), modal_akhir, is_us)
+
             except Exception as e:
                 st.error(f"Gagal melakukan simulasi: Terjadi kesalahan data ({e}).")
 # --- 14.6 FITUR BARU: RADAR SENTIMEN BERITA LOKAL  ---
 
+@st.cache_data(ttl=300, show_spinner=False)
+def get_stored_news(ticker, limit=10):
+    """Berita tersimpan hasil job news_ingest.py (sudah diberi skor sentimen)."""
+    try:
+        res = supabase.table('news').select('title, link, publisher, published_at, score').eq('symbol', ticker).order('published_at', desc=True).limit(limit).execute()
+        return [{
+            "title": r['title'], "link": r['link'], "publisher": r['publisher'],
+            "date": str(r['published_at'])[:16].replace('T', ' ') + " UTC", "score": r['score']
+        } for r in res.data]
+    except: return []
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_sentiment_trend(ticker, days=60):
+    """Deret waktu sentimen harian per saham (tabel news_sentiment_daily)."""
+    try:
+        since = (datetime.utcnow() + timedelta(hours=7) - timedelta(days=days)).strftime('%Y-%m-%d')
+        res = supabase.table('news_sentiment_daily').select('date, n_news, avg_score').eq('symbol', ticker).gte('date', since).order('date').execute()
+        if not res.data: return pd.DataFrame()
+        df_trend = pd.DataFrame(res.data)
+        df_trend['date'] = pd.to_datetime(df_trend['date'])
+        return df_trend.set_index('date')
+    except: return pd.DataFrame()
+
 @st.cache_data(ttl=1800, show_spinner=False)
-@st.cache_data(ttl=1800, show_spinner=False)
+@timed("rss.google_news")
 def fetch_local_news(ticker):
     # UPGRADE: Menggunakan Google News RSS Search khusus regional Indonesia
     # Ini akan menyapu SELURUH media lokal secara spesifik mencari kode saham user.
@@ -1288,10 +1406,10 @@ def fetch_local_news(ticker):
     
     news_list = []
     try:
-        feed = feedparser.parse(url)
+        feed = parse_feed(url)
         
-        # Ambil maksimal 10 berita paling relevan/terbaru
-        for entry in feed.entries[:10]:
+        # Ambil 30 kandidat teratas; berita sindikasi digabung jadi klaster di halaman radar
+        for entry in feed.entries[:30]:
             raw_title = entry.title
             link = entry.link
             date = entry.get('published', '')
@@ -1315,23 +1433,14 @@ def fetch_local_news(ticker):
         
     return news_list
 
+@st.cache_resource
+def get_sentiment_scorer():
+    # Kamus dikompilasi sekali per proses (lihat data/sentiment_lexicon.json)
+    return SentimentScorer.from_file()
+
 def analyze_indonesian_sentiment(text):
-    # Kamus NLP sederhana khusus bahasa gaul saham Indonesia
-    kata_positif = ['naik', 'cuan', 'laba', 'untung', 'dividen', 'terbang', 'akumulasi', 'positif', 'rekor', 'melonjak', 'melesat', 'tumbuh', 'meroket', 'bullish', 'borong', 'lonjakan']
-    kata_negatif = ['turun', 'rugi', 'anjlok', 'arb', 'distribusi', 'negatif', 'utang', 'suspensi', 'jeblok', 'merosot', 'hancur', 'jatuh', 'bearish', 'gagal', 'koreksi', 'dilepas', 'jual']
-    
-    text_lower = text.lower()
-    score = 0
-    
-    # Deteksi sentimen
-    for kata in kata_positif:
-        if re.search(r'\b' + kata + r'\b', text_lower): score += 1
-    for kata in kata_negatif:
-        if re.search(r'\b' + kata + r'\b', text_lower): score -= 1
-        
-    if score > 0: return "🟢 POSITIF", score
-    elif score < 0: return "🔴 NEGATIF", score
-    else: return "⚪ NETRAL", score
+    score = get_sentiment_scorer().score(text)
+    return sentiment_label(score), score
 
 def show_news_sentiment(market_choice):
     st.header("📰 Radar Sentimen Berita Lokal")
@@ -1372,31 +1481,44 @@ def show_news_sentiment(market_choice):
             ticker_only = ticker.replace(".JK", "")
 
             try:
-                # Memanggil data dari fungsi penyedot RSS (Google News Tracker)
-                berita_lokal = fetch_local_news(ticker_only)
+                # Baca hasil job ingest berkala dulu (instan), fallback ke penyedot RSS live (Google News Tracker)
+                berita_lokal = get_stored_news(ticker_only, limit=30)
+                if not berita_lokal:
+                    berita_lokal = fetch_local_news(ticker_only)
 
                 if not berita_lokal:
                     st.warning(f"⚠️ Radar tidak menemukan berita terbaru yang menyebutkan saham {ticker_only} di media Indonesia hari ini.")
                     st.info("💡 Tips: Coba gunakan saham berkapitalisasi besar atau saham yang sedang ramai ditransaksikan.")
                     return
 
-                total_score = 0
+                # Gabungkan judul sindikasi (satu cerita dimuat banyak media) -> maksimal 10 cerita unik
+                groups = group_clusters(cluster_near_duplicates([item['title'] for item in berita_lokal]))[:10]
+                wakil = [berita_lokal[idx[0]] for idx in groups]
+
+                total_score, total_bobot = 0, 0
                 news_items = []
 
-                # Analisis satu per satu dengan Kamus Bahasa Indonesia
-                for item in berita_lokal:
-                    sentiment_label, score = analyze_indonesian_sentiment(item['title'])
-                    total_score += score
+                # Berita tersimpan sudah punya skor. Sisanya dianalisis sekaligus dengan Kamus Bahasa Indonesia (1x pindai)
+                if all('score' in item for item in wakil):
+                    scores = [item['score'] for item in wakil]
+                else:
+                    scores = get_sentiment_scorer().score_many([item['title'] for item in wakil])
+                for idx, item, score in zip(groups, wakil, scores):
+                    salinan = [berita_lokal[i] for i in idx[1:]]
+                    bobot = len({item['publisher']} | {c['publisher'] for c in salinan}) # Bobot = jumlah media berbeda
+                    total_score += score * bobot
+                    total_bobot += bobot
                     news_items.append({
                         "title": item['title'],
                         "publisher": item['publisher'],
-                        "sentiment": sentiment_label,
+                        "sentiment": sentiment_label(score),
                         "link": item['link'],
                         "score": score,
-                        "date": item['date']
+                        "date": item['date'],
+                        "copies": salinan
                     })
 
-                avg_score = total_score / len(berita_lokal)
+                avg_score = total_score / total_bobot
                 
                 # --- DASHBOARD KESIMPULAN ---
                 st.subheader(f"🧠 Kesimpulan Radar Sentimen {ticker_only}")
@@ -1415,18 +1537,129 @@ def show_news_sentiment(market_choice):
                 c1.metric("Kondisi Emosi Media", status_berita, f"Skor Sentimen: {avg_score:.1f}", delta_color=warna)
                 c2.info("Sistem secara pintar memindai kata kunci finansial (seperti laba, cuan, rugi, ARB) dari artikel lokal yang baru saja dirilis.")
                 
+                # --- TREN SENTIMEN HARIAN (DARI JOB INGEST) ---
+                df_trend = get_sentiment_trend(ticker_only)
+                if not df_trend.empty:
+                    st.subheader("📈 Tren Sentimen Harian (60 Hari)")
+                    fig_trend = make_subplots(specs=[[{"secondary_y": True}]])
+                    fig_trend.add_trace(go.Bar(x=df_trend.index, y=df_trend['n_news'], name="Jumlah Berita", marker_color='rgba(128,128,128,0.4)'), secondary_y=True)
+                    fig_trend.add_trace(go.Scatter(x=df_trend.index, y=df_trend['avg_score'], name="Skor Sentimen", mode='lines+markers', line=dict(color='cyan', width=2)), secondary_y=False)
+                    fig_trend.add_hline(y=0, line_dash="dash", line_color="gray")
+                    fig_trend.update_layout(height=300, template="plotly_dark", margin=dict(l=0, r=0, t=10, b=0), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+                    fig_trend.update_yaxes(title_text="Skor Rata-rata", secondary_y=False)
+                    fig_trend.update_yaxes(title_text="Jumlah Berita", secondary_y=True)
+                    st.plotly_chart(fig_trend, use_container_width=True)
+
                 st.divider()
                 
                 # --- DAFTAR BERITA YANG DIBACA AI ---
                 st.subheader("📑 Arsip Berita yang Terdeteksi")
                 for item in news_items:
-                    with st.expander(f"{item['sentiment']} | {item['title']}"):
+                    label_media = f" (+{len(item['copies'])} media)" if item['copies'] else ""
+                    with st.expander(f"{item['sentiment']} | {item['title']}{label_media}"):
                         st.write(f"**Sumber:** {item['publisher']} | **Waktu Terbit:** {item['date']}")
                         st.markdown(f"[🔗 Baca artikel selengkapnya di sini]({item['link']})")
+                        if item['copies']:
+                            st.caption("Juga dimuat oleh: " + " · ".join(f"[{c['publisher']}]({c['link']})" for c in item['copies']))
                         
             except Exception as e:
                 st.error(f"Gagal menyapu berita lokal: {e}")
 # --- 14.7 FITUR BARU: PETA PROBABILITAS MUSIMAN (SEASONALITY HEATMAP) ---
+@st.cache_data(ttl=3600, show_spinner=False)
+@timed()
+def get_seasonality_table(ticker_only, symbol, market):
+    """
+    Membaca tabel musiman pra-hitung (diisi fetcher.py tiap malam) dengan 1 query ber-index.
+    Fallback: hitung on-demand dari History Store untuk saham di luar universe.
+    Mengembalikan (status, tabel) dengan status 'ok' / 'not_found' / 'too_short'.
+    """
+    try:
+        res = supabase.table('seasonality_stats').select('*').eq('symbol', ticker_only).eq('market', market).execute()
+        if res.data: return "ok", res.data[0]
+    except: pass
+
+    df = get_lazy_historical_data(symbol, period="10y")
+    if df.empty: return "not_found", None
+    table = compute_seasonality_table(fix_dataframe(df))
+    if table is None: return "too_short", None
+    return "ok", table
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_seasonality_ranking(market, month):
+    """Ranking seluruh universe untuk bulan tertentu (Win Rate lalu Rata-rata Return)."""
+    try:
+        res = supabase.table('seasonality_stats').select('symbol, month_win_rate, month_avg, month_min, n_years').eq('market', market).execute()
+        if not res.data: return pd.DataFrame()
+        df_rank = pd.DataFrame(res.data)
+        df_rank['Win Rate (%)'] = df_rank['month_win_rate'].str[month-1].astype(float)
+        df_rank['Avg Return (%)'] = df_rank['month_avg'].str[month-1].astype(float)
+        df_rank['Terburuk (%)'] = df_rank['month_min'].str[month-1].astype(float)
+        df_rank = df_rank.rename(columns={'symbol': 'Kode', 'n_years': 'Tahun Data'})
+        df_rank = df_rank.sort_values(['Win Rate (%)', 'Avg Return (%)'], ascending=False)
+        return df_rank[['Kode', 'Win Rate (%)', 'Avg Return (%)', 'Terburuk (%)', 'Tahun Data']]
+    except: return pd.DataFrame()
+
+# --- EVENT STUDY: RAMADAN, LEBARAN & EX-DIVIDEN ---
+EVENT_OPTIONS = list(HIJRI_EVENTS.keys()) + ["💰 Ex-Dividen"]
+
+@timed("yf.download_panel")
+def download_close_panel(tickers, period):
+    """Panel harga penutupan banyak saham sekaligus (1x download massal). Kolom = kode tanpa .JK"""
+    price_data = price_provider.download(list(tickers), period=period, group_by='ticker', auto_adjust=True, progress=False, threads=True)
+    closes = {}
+    for t in tickers:
+        try: closes[t.replace(".JK", "")] = fix_dataframe(price_data[t].copy())['Close']
+        except: continue
+    return pd.DataFrame(closes).dropna(how='all')
+
+@st.cache_data(ttl=43200, show_spinner=False)
+def get_close_panel(tickers, period="10y"):
+    """Panel 10 tahun untuk event study (cukup diperbarui 2x sehari)."""
+    return download_close_panel(tickers, period)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_recent_close_panel(tickers, period="3mo"):
+    """Panel 3 bulan untuk tren SMA portofolio: TTL pendek agar harga intraday tidak basi berjam-jam."""
+    return download_close_panel(tickers, period)
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def get_ex_dividend_dates(symbols, market="IDX"):
+    """
+    Ex-date dividen banyak saham -> {kode: [Timestamp]} dari tabel dividend_history (diisi fetcher malam),
+    dibaca per halaman 1000 baris. Saham yang belum ada di tabel diambil paralel dari penyedia harga.
+    """
+    rows, page = [], 1000
+    try:
+        while True:
+            res = supabase.table('dividend_history').select('symbol, ex_date').eq('market', market) \
+                .in_('symbol', list(symbols)).order('symbol').order('ex_date').range(len(rows), len(rows) + page - 1).execute()
+            rows.extend(res.data)
+            if len(res.data) < page: break
+    except: rows = []
+    events = {}
+    for r in rows: events.setdefault(r['symbol'], []).append(pd.Timestamp(r['ex_date']).normalize())
+
+    missing = [sym for sym in symbols if sym not in events]
+    if missing:
+        suffix = ".JK" if market == "IDX" else ""
+        for t, divs in scan_dividend_histories([f"{sym}{suffix}" for sym in missing], prices=price_provider).items():
+            events[t.replace(".JK", "")] = list(divs.index)
+    return events
+
+@st.cache_data(ttl=43200, show_spinner=False)
+@timed()
+def get_event_study(event_name, pre, post):
+    """CAR rata-rata seluruh saham syariah (Lapis 1 + Lapis 2) terhadap IHSG di sekitar event."""
+    tickers = tuple(f"{s}.JK" for s in SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS) + ("^JKSE",)
+    panel = get_close_panel(tickers)
+    bench = panel.pop("^JKSE")
+
+    if event_name in HIJRI_EVENTS:
+        events = hijri_event_dates(*HIJRI_EVENTS[event_name], panel.index[0], panel.index[-1])
+    else:
+        events = get_ex_dividend_dates(tuple(panel.columns))
+    return event_study(panel, bench, events, pre=pre, post=post)
+
 def show_seasonality(market_choice):
     st.header("🗓️ Peta Probabilitas Musiman & Risiko")
     st.markdown("Mendeteksi pola siklus bulanan saham dalam 10 tahun terakhir dengan cerdas via Database & Cloud.")
@@ -1439,50 +1672,28 @@ def show_seasonality(market_choice):
             st.markdown("<br>", unsafe_allow_html=True)
             submit_season = st.form_submit_button("Analisis Siklus 🔍", use_container_width=True)
 
-    if submit_season and ticker:
+    # Simpan saham yang sedang dianalisis agar hasil tidak hilang saat form Event Study dikirim
+    if submit_season: st.session_state['season_ticker'] = ticker
+
+    if ticker and st.session_state.get('season_ticker') == ticker:
         with st.spinner(f"Sinkronisasi data 10 tahun untuk {ticker}..."):
             is_us = "US" in market_choice
             symbol = f"{ticker}.JK" if not is_us and not ticker.endswith(".JK") else ticker
             ticker_only = ticker.replace(".JK", "")
 
             try:
-                # --- INTEGRASI LAZY LOADING (OPTIMASI DATABASE) ---
-                df = get_lazy_historical_data(symbol, period="10y")
+                # --- BACA TABEL MUSIMAN PRA-HITUNG (1 QUERY) ---
+                status_data, table = get_seasonality_table(ticker_only, symbol, "US" if is_us else "IDX")
                 
-                if df.empty:
+                if status_data == "not_found":
                     st.error(f"❌ Data saham {ticker_only} tidak ditemukan.")
                     return
-                
-                # Standarisasi Kolom
-                close_data = df['Close'].squeeze()
-                
-                if len(close_data) < 250 * 5: # Kurang lebih 5 tahun trading days
+                if status_data == "too_short":
                     st.warning("⚠️ Data histori terlalu pendek untuk analisis musiman yang akurat (Minimal 5 tahun idealnya).")
                     return
 
-                # --- PENGOLAHAN DATA BULANAN ---
-                try:
-                    df_monthly = close_data.resample('ME').last()
-                except:
-                    df_monthly = close_data.resample('M').last()
-                
-                returns = df_monthly.pct_change() * 100
-                df_ret = returns.to_frame(name='Return').dropna()
-                df_ret['Year'] = df_ret.index.year
-                df_ret['Month'] = df_ret.index.month
-
-                # Pivot Table
-                pivot = df_ret.pivot(index='Year', columns='Month', values='Return')
-                month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-                
-                for m in range(1, 13):
-                    if m not in pivot.columns: pivot[m] = np.nan
-                pivot = pivot[[m for m in range(1, 13)]]
-
-                win_rate = (pivot > 0).sum() / pivot.notna().sum() * 100
-                avg_return = pivot.mean()
-                win_rate = win_rate.fillna(0)
-                avg_return = avg_return.fillna(0)
+                pivot, win_rate, avg_return, min_returns, day_stats = table_to_frames(table)
+                month_names = MONTH_NAMES
 
                 # Data Bulan Saat Ini
                 curr_month = datetime.now().month
@@ -1511,7 +1722,7 @@ def show_seasonality(market_choice):
                 # ==========================================
                 st.success("💎 **VIP Access:** Menampilkan Analisis Risiko Level Institusi.")
                 
-                tab1, tab2 = st.tabs(["🗺️ Peta Musiman 10 Tahun", "📅 Efek Hari & Drawdown Risiko"])
+                tab1, tab2, tab3, tab4 = st.tabs(["🗺️ Peta Musiman 10 Tahun", "📅 Efek Hari & Drawdown Risiko", f"🏆 Saham Terbaik Bulan {curr_month_name}", "🌙 Efek Ramadan & Dividen"])
 
                 with tab1:
                     st.subheader(f"📊 Rapor Musiman {ticker_only}")
@@ -1559,9 +1770,7 @@ def show_seasonality(market_choice):
                         st.subheader("⚠️ Max Drawdown (Risiko)")
                         st.markdown("Penurunan bulanan **terdalam** yang pernah terjadi dalam 10 tahun.")
                         
-                        # Hitung nilai minimum (Drawdown) di setiap bulan
-                        min_returns = pivot.min()
-                        
+                        # Nilai minimum (Drawdown) di setiap bulan sudah dihitung fetcher
                         fig_dd = go.Figure(go.Bar(
                             x=month_names, 
                             y=min_returns.values,
@@ -1574,21 +1783,7 @@ def show_seasonality(market_choice):
                         st.subheader("📅 Efek Hari Perdagangan")
                         st.markdown("Probabilitas saham ditutup **Hijau (Naik)** berdasarkan hari.")
                         
-                        # Hitung Win-Rate Harian dari raw dataframe
-                        daily_df = df.copy()
-                        if 'Open' in daily_df.columns:
-                            daily_df['Is_Up'] = daily_df['Close'] > daily_df['Open']
-                        else:
-                            daily_df['Is_Up'] = daily_df['Close'] > daily_df['Close'].shift(1)
-                            
-                        daily_df['DayOfWeek'] = daily_df.index.dayofweek
-                        day_stats = daily_df.groupby('DayOfWeek')['Is_Up'].mean() * 100
-                        
-                        # Format label hari (Senin = 0, Jumat = 4)
-                        hari_indo = ['Senin', 'Selasa', 'Rabu', 'Kamis', 'Jumat']
-                        day_stats = day_stats[day_stats.index < 5] # Abaikan jika ada data anomali di akhir pekan
-                        day_stats.index = [hari_indo[i] for i in day_stats.index]
-                        
+                        # Win-Rate Harian (Senin-Jumat) sudah dihitung fetcher
                         fig_day = go.Figure(go.Scatter(
                             x=day_stats.index, 
                             y=day_stats.values,
@@ -1600,6 +1795,64 @@ def show_seasonality(market_choice):
                         fig_day.update_layout(height=350, template="plotly_dark", yaxis_title="Win-Rate (%)", margin=dict(l=0, r=0, t=10, b=0))
                         st.plotly_chart(fig_day, use_container_width=True)
 
+                # FITUR BARU VIP: RANKING MUSIMAN SELURUH UNIVERSE
+                with tab3:
+                    st.subheader(f"🏆 Saham dengan Riwayat Terbaik di Bulan {curr_month_name}")
+                    st.markdown("Diurutkan dari *Win Rate* tertinggi, lalu rata-rata return bulan ini selama 10 tahun terakhir.")
+                    df_rank = get_seasonality_ranking("US" if is_us else "IDX", curr_month)
+                    if df_rank.empty:
+                        st.info("Data ranking belum tersedia. Tabel musiman diperbarui otomatis oleh server setiap malam.")
+                    else:
+                        st.dataframe(df_rank.head(15), use_container_width=True, hide_index=True,
+                            column_config={
+                                "Win Rate (%)": st.column_config.NumberColumn(format="%.0f %%"),
+                                "Avg Return (%)": st.column_config.NumberColumn(format="%.2f %%"),
+                                "Terburuk (%)": st.column_config.NumberColumn(format="%.2f %%"),
+                            })
+
+                # FITUR BARU VIP: EVENT STUDY (RAMADAN, LEBARAN, EX-DIVIDEN)
+                with tab4:
+                    st.subheader("🌙 Event Study: Ramadan, Lebaran & Ex-Dividen")
+                    st.markdown("Rata-rata *Cumulative Abnormal Return* (CAR), yaitu return saham **di atas/bawah IHSG**, di sekitar tanggal event selama 10 tahun terakhir. Tanggal Hijriah dipetakan ke hari bursa terdekat.")
+
+                    if is_us:
+                        st.info("ℹ️ Event Study hanya tersedia untuk saham syariah Indonesia (acuan IHSG).")
+                    else:
+                        with st.form(key='event_form'):
+                            c_ev1, c_ev2, c_ev3 = st.columns([2, 2, 1])
+                            with c_ev1: event_name = st.selectbox("Jenis Event:", EVENT_OPTIONS)
+                            with c_ev2: event_window = st.slider("Jendela (hari bursa sebelum & sesudah):", 5, 30, 10)
+                            with c_ev3:
+                                st.markdown("<br>", unsafe_allow_html=True)
+                                submit_event = st.form_submit_button("Hitung 📊", use_container_width=True)
+                        if submit_event: st.session_state['event_params'] = (event_name, event_window)
+
+                        if st.session_state.get('event_params'):
+                            ev_name, ev_window = st.session_state['event_params']
+                            with st.spinner(f"Menghitung efek {ev_name} untuk seluruh saham syariah..."):
+                                curve, summary = get_event_study(ev_name, ev_window, ev_window)
+
+                            if curve.empty:
+                                st.warning("Data event belum cukup untuk dihitung.")
+                            else:
+                                fig_ev = go.Figure()
+                                fig_ev.add_trace(go.Scatter(x=curve.index, y=curve.mean(axis=1), mode='lines', name='Rata-rata Saham Syariah', line=dict(color='#555555', width=2, dash='dot')))
+                                if ticker_only in curve.columns:
+                                    fig_ev.add_trace(go.Scatter(x=curve.index, y=curve[ticker_only], mode='lines+markers', name=ticker_only, line=dict(color='cyan', width=3)))
+                                fig_ev.add_vline(x=0, line_dash="dash", line_color="gold", annotation_text="Hari Event")
+                                fig_ev.add_hline(y=0, line_color="gray")
+                                fig_ev.update_layout(height=350, template="plotly_dark", xaxis_title="Hari Bursa dari Event", yaxis_title="CAR vs IHSG (%)", margin=dict(l=0, r=0, t=30, b=0), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+                                st.plotly_chart(fig_ev, use_container_width=True)
+                                if ticker_only not in curve.columns:
+                                    st.caption(f"ℹ️ {ticker_only} belum masuk universe Event Study, grafik menampilkan rata-rata saham syariah.")
+
+                                st.markdown(f"**🏆 Ranking Saham Syariah: {ev_name} (hari -{ev_window} s/d +{ev_window})**")
+                                st.dataframe(summary, use_container_width=True, hide_index=True,
+                                    column_config={
+                                        "CAR (%)": st.column_config.NumberColumn(format="%.2f %%"),
+                                        "Win Rate (%)": st.column_config.NumberColumn(format="%.0f %%"),
+                                    })
+
             except Exception as e:
                 st.error(f"Terjadi kendala teknis: {e}")
                
@@ -1614,14 +1867,14 @@ def get_gold_data():
     """Penarik data instan untuk Morning Predictor (Native YFinance Bypass)"""
     try:
         # Kita hapus parameter session=session, biarkan yfinance mengurusnya
-        gold = yf.Ticker("XAUUSD=X").history(period="10d")
+        gold = price_provider.history("XAUUSD=X", period="10d")
         
         if gold.empty:
-            gold = yf.Ticker("GC=F").history(period="10d")
+            gold = price_provider.history("GC=F", period="10d")
             if gold.empty:
                 return None, None, None, None, "Data kosong. Rate Limit dari Yahoo."
 
-        idr = yf.Ticker("IDR=X").history(period="10d")
+        idr = price_provider.history("IDR=X", period="10d")
         if idr.empty:
             return None, None, None, None, "Data IDR kosong."
 
@@ -1639,11 +1892,11 @@ def get_gold_data():
 def get_historical_gold_idr(period="1y"):
     """Peracik Grafik Sintesis Emas Murni Rupiah"""
     try:
-        gold = yf.Ticker("XAUUSD=X").history(period=period)
+        gold = price_provider.history("XAUUSD=X", period=period)
         if gold.empty:
-            gold = yf.Ticker("GC=F").history(period=period)
+            gold = price_provider.history("GC=F", period=period)
             
-        idr = yf.Ticker("IDR=X").history(period=period)
+        idr = price_provider.history("IDR=X", period=period)
         
         if gold.empty or idr.empty:
             return pd.DataFrame()
@@ -1711,11 +1964,11 @@ def get_historical_gold_idr(period="1y"):
 def get_macro_correlation_data(period="1y"):
     """Menarik data korelasi Emas vs US10Y Treasury Yield untuk User VIP"""
     try:
-        gold = yf.Ticker("XAUUSD=X").history(period=period)
-        if gold.empty: gold = yf.Ticker("GC=F").history(period=period)
+        gold = price_provider.history("XAUUSD=X", period=period)
+        if gold.empty: gold = price_provider.history("GC=F", period=period)
         
         # Tarik data US 10-Year Treasury Yield (^TNX)
-        us10y = yf.Ticker("^TNX").history(period=period)
+        us10y = price_provider.history("^TNX", period=period)
         
         if gold.empty or us10y.empty: return pd.DataFrame()
         
@@ -1910,32 +2163,131 @@ def show_gold_predictor():
 # --- 14.9 FITUR BARU: ROBO-ADVISOR PORTOFOLIO ---
 # ==============================================================================
 
-@st.cache_data(ttl=60, show_spinner=False)
+@st.cache_resource
+def get_price_snapshot():
+    """Snapshot harga terakhir seluruh universe (IDX + US), satu per proses dan di-refresh di latar belakang."""
+    universe = [f"{s}.JK" for s in SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS] + US_STOCKS
+    return PriceSnapshot(universe, provider=price_provider).start()
+
 def get_current_prices(symbols):
-    """Mengambil harga saham real-time secara massal (batch) agar cepat."""
+    """Harga terakhir dari snapshot bersama (tanpa network call selama snapshot masih segar)."""
     if not symbols: return {}
     
     # Format ke .JK jika belum ada (asumsi saham Indonesia)
     formatted_syms = [s if s.endswith(".JK") else f"{s}.JK" for s in symbols]
-    
+    prices = get_price_snapshot().get(formatted_syms)
+    return {orig: prices[fmt] for orig, fmt in zip(symbols, formatted_syms) if fmt in prices}
+
+def portfolio_state(df):
+    """Ringkas tabel portofolio menjadi {symbol: (avg_price, total_lot)} untuk dibandingkan (diff)."""
+    state = {}
+    for sym, price, lot in zip(df['Kode Saham'], df['Harga Beli'], df['Jumlah Lot']):
+        if pd.isna(sym) or str(sym).strip() == "" or pd.isna(lot) or int(lot) <= 0: continue
+        state[str(sym).strip().upper()] = (float(price) if pd.notna(price) else 0.0, int(lot))
+    return state
+
+def load_portfolio_data():
+    """Muat portofolio aktif dari database ke session_state (+ salinan kondisi database sebagai dasar diff)."""
     try:
-        # Gunakan auto_adjust=False agar kompatibel dengan yfinance versi terbaru
-        data = yf.download(formatted_syms, period="1d", progress=False)
-        
-        # Mengatasi format MultiIndex yfinance jika saham > 1
-        if isinstance(data.columns, pd.MultiIndex):
-            close_data = data['Close']
+        res = supabase.table('user_portfolios').select('*').eq('user_id', user_id).execute()
+        if res.data:
+            df_db = pd.DataFrame(res.data)
+            # KITA TIDAK LAGI PAKAI KOLOM CHECKBOX "HAPUS"
+            st.session_state['portfolio_data'] = pd.DataFrame({
+                "Kode Saham": df_db['symbol'],
+                "Harga Beli": df_db['avg_price'].astype(int),
+                "Jumlah Lot": df_db['total_lot'].astype(int)
+            })
         else:
-            close_data = pd.DataFrame(data['Close'], columns=[formatted_syms[0]])
+            st.session_state['portfolio_data'] = pd.DataFrame(columns=["Kode Saham", "Harga Beli", "Jumlah Lot"])
+    except:
+        st.session_state['portfolio_data'] = pd.DataFrame(columns=["Kode Saham", "Harga Beli", "Jumlah Lot"])
+    # Salinan kondisi database saat dimuat, dasar perbandingan saat menyimpan
+    st.session_state['portfolio_loaded'] = portfolio_state(st.session_state['portfolio_data'])
 
-        prices = {}
-        for orig, fmt in zip(symbols, formatted_syms):
-            if fmt in close_data.columns and not pd.isna(close_data[fmt].iloc[-1]):
-                prices[orig] = float(close_data[fmt].iloc[-1])
-        return prices
-    except Exception as e:
-        print(f"Error fetching prices: {e}")
-        return {}
+def save_portfolio_diff(edited_df):
+    """
+    Simpan HANYA yang berubah: 1 upsert batch untuk baris baru/berubah + 1 delete untuk saham yang dibuang.
+    Tidak ada lagi delete-semua-lalu-insert, jadi portofolio tidak bisa kosong jika koneksi putus di tengah.
+    """
+    loaded = st.session_state.get('portfolio_loaded', {})
+    desired = portfolio_state(edited_df)
+
+    changed = [{"user_id": user_id, "symbol": sym, "avg_price": price, "total_lot": lot}
+               for sym, (price, lot) in desired.items() if loaded.get(sym) != (price, lot)]
+    removed = [sym for sym in loaded if sym not in desired]
+
+    if changed: supabase.table('user_portfolios').upsert(changed, on_conflict='user_id,symbol').execute()
+    if removed: supabase.table('user_portfolios').delete().eq('user_id', user_id).in_('symbol', removed).execute()
+    if changed or removed: reconcile_open_lots()
+
+    st.session_state['portfolio_loaded'] = desired
+    return len(changed), len(removed)
+
+def reconcile_open_lots():
+    """Koreksi manual tidak tercatat di buku besar: pangkas lot terbuka ledger agar tidak melebihi posisi di user_portfolios."""
+    try: supabase.rpc('reconcile_open_lots', {'p_user_id': user_id}).execute()
+    except: pass
+
+def unmatched_lots_error(e):
+    """Jumlah lot dari pesan 'UNMATCHED_LOTS:<n>' RPC record_transaction (None jika error lain)."""
+    msg = str(e)
+    if 'UNMATCHED_LOTS:' not in msg: return None
+    digits = ''.join(ch for ch in msg.split('UNMATCHED_LOTS:', 1)[1][:12] if ch.isdigit())
+    return int(digits) if digits else 0
+
+def get_pnl_summary(uid):
+    """Agregat PnL terealisasi user (tabel user_pnl_summary, diperbarui oleh RPC record_transaction)."""
+    try:
+        res = supabase.table('user_pnl_summary').select('*').eq('user_id', uid).execute()
+        return res.data[0] if res.data else None
+    except: return None
+
+def get_transactions(uid, limit=100):
+    """Riwayat transaksi terbaru dari buku besar."""
+    try:
+        res = supabase.table('user_transactions').select('created_at, symbol, side, price, lots, realized_pnl') \
+            .eq('user_id', uid).order('created_at', desc=True).limit(limit).execute()
+        if not res.data: return pd.DataFrame()
+        df_txn = pd.DataFrame(res.data)
+        df_txn['created_at'] = pd.to_datetime(df_txn['created_at']).dt.tz_convert('Asia/Jakarta').dt.strftime('%Y-%m-%d %H:%M')
+        df_txn['side'] = df_txn['side'].map({'BUY': '🟢 Beli', 'SELL': '🔴 Jual'})
+        df_txn['realized_pnl'] = df_txn['realized_pnl'].astype(float).where(df_txn['side'] == '🔴 Jual')
+        return df_txn.rename(columns={'created_at': 'Waktu', 'symbol': 'Kode Saham', 'side': 'Jenis', 'price': 'Harga', 'lots': 'Lot', 'realized_pnl': 'PnL Terealisasi'})
+    except: return pd.DataFrame()
+
+@st.cache_data(max_entries=200, show_spinner=False)
+@timed()
+def get_portfolio_risk(holdings_key, last_bar_date, _returns, _last_close):
+    """
+    Hasil mesin risiko (+ proyeksi Monte Carlo) di-cache per (kepemilikan, tanggal bar terakhir).
+    Bobot diturunkan dari lot x harga penutupan bar terakhir, jadi tidak berubah setiap tick harga live.
+    """
+    lots = pd.Series(dict(holdings_key), dtype=float).reindex(_returns.columns)
+    value = lots * _last_close.reindex(_returns.columns)
+    weights = value / value.sum()
+    risk = portfolio_risk(_returns, weights)
+    risk['projection'] = monte_carlo(_returns.to_numpy() @ weights.fillna(0.0).to_numpy())
+    return risk
+
+def load_portfolio_risk(lots):
+    """Matriks return dari history store (Supabase) lalu hitung risiko portofolio. None jika data kurang."""
+    closes = {}
+    for sym in lots.index:
+        try: closes[sym] = get_lazy_historical_data(f"{sym}.JK", "2y")['Close']
+        except: continue
+    if len(closes) < 1: return None
+    panel = pd.DataFrame(closes)
+    excluded = short_history_columns(panel) # Satu saham baru IPO tidak boleh menggugurkan seluruh panel
+    panel = panel.drop(columns=excluded)
+    if panel.empty: return None
+    returns = returns_matrix(panel)
+    if len(returns) < 60: return None
+
+    holdings_key = tuple(sorted((sym, int(lot)) for sym, lot in lots.items() if sym in returns.columns))
+    last_close = panel.sort_index().ffill().iloc[-1]
+    risk = get_portfolio_risk(holdings_key, returns.index[-1].strftime('%Y-%m-%d'), returns, last_close)
+    return {**risk, 'excluded': excluded}
 
 def show_portfolio_advisor():
     st.header("💼 Robo-Advisor & Portfolio Manager")
@@ -1944,20 +2296,7 @@ def show_portfolio_advisor():
 
     # --- 1. SINKRONISASI DATABASE KE MEMORI ---
     if 'portfolio_data' not in st.session_state:
-        try:
-            res = supabase.table('user_portfolios').select('*').eq('user_id', user_id).execute()
-            if res.data:
-                df_db = pd.DataFrame(res.data)
-                # KITA TIDAK LAGI PAKAI KOLOM CHECKBOX "HAPUS"
-                st.session_state['portfolio_data'] = pd.DataFrame({
-                    "Kode Saham": df_db['symbol'],
-                    "Harga Beli": df_db['avg_price'].astype(int),
-                    "Jumlah Lot": df_db['total_lot'].astype(int)
-                })
-            else:
-                st.session_state['portfolio_data'] = pd.DataFrame(columns=["Kode Saham", "Harga Beli", "Jumlah Lot"])
-        except:
-            st.session_state['portfolio_data'] = pd.DataFrame(columns=["Kode Saham", "Harga Beli", "Jumlah Lot"])
+        load_portfolio_data()
 
     tab1, tab2, tab3 = st.tabs(["📈 Portofolio Aktif", "💰 Transaksi Jual (PnL)", "🛡️ Analisis AI 360°"])
 
@@ -1967,6 +2306,7 @@ def show_portfolio_advisor():
     with tab1:
         st.subheader("📝 Kelola Saham")
         st.info("💡 **PANDUAN INTERAKTIF:**\n* **✏️ Edit:** Ketuk langsung pada angka Harga/Lot untuk mengubah.\n* **➕ Tambah:** Ketik kode saham baru di baris kosong paling bawah.\n* **🗑️ Hapus Cepat (Ide A):** Ubah angka 'Jumlah Lot' menjadi **0**, lalu klik Simpan.")
+        st.caption("Tabel ini untuk koreksi manual (mis. posisi lama). Pembelian/penjualan baru dicatat lewat tab Transaksi agar PnL terealisasi ikut dihitung.")
 
         # Data Editor yang lebih bersih (Tanpa Checkbox Hapus)
         edited_df = st.data_editor(
@@ -1985,24 +2325,11 @@ def show_portfolio_advisor():
                 # IDE A: FILTER BARIS YANG LOT-NYA > 0 (Lot 0 otomatis terbuang)
                 to_keep = edited_df[edited_df['Jumlah Lot'] > 0]
                 
-                # Bersihkan data lama di Supabase, masukkan yang baru
-                supabase.table('user_portfolios').delete().eq('user_id', user_id).execute()
-                
-                if not to_keep.empty:
-                    insert_data = []
-                    for _, row in to_keep.iterrows():
-                        if pd.notna(row['Kode Saham']) and str(row['Kode Saham']).strip() != "":
-                            insert_data.append({
-                                "user_id": user_id,
-                                "symbol": str(row['Kode Saham']).upper(),
-                                "avg_price": float(row['Harga Beli']),
-                                "total_lot": int(row['Jumlah Lot'])
-                            })
-                    if insert_data:
-                        supabase.table('user_portfolios').insert(insert_data).execute()
+                # Kirim hanya selisih terhadap data yang terakhir dimuat
+                n_changed, n_removed = save_portfolio_diff(to_keep)
                 
                 st.session_state['portfolio_data'] = to_keep
-                st.success("✅ Data tersimpan! (Saham dengan 0 Lot otomatis dihapus)")
+                st.success(f"✅ Data tersimpan! ({n_changed} diperbarui, {n_removed} dihapus. Saham dengan 0 Lot otomatis dihapus)")
                 time.sleep(1.5)
                 st.rerun()
             except Exception as e:
@@ -2016,6 +2343,8 @@ def show_portfolio_advisor():
                 if st.button(f"Hapus {del_sym} Permanen"):
                     # Hapus dari Supabase
                     supabase.table('user_portfolios').delete().eq('user_id', user_id).eq('symbol', del_sym).execute()
+                    reconcile_open_lots()
+                    st.session_state['portfolio_loaded'].pop(str(del_sym).upper(), None)
                     # Update Memori
                     st.session_state['portfolio_data'] = st.session_state['portfolio_data'][st.session_state['portfolio_data']['Kode Saham'] != del_sym]
                     st.success(f"{del_sym} berhasil dihapus dari portofolio.")
@@ -2028,48 +2357,84 @@ def show_portfolio_advisor():
     # TAB 2: HISTORI PENJUALAN (IDE C)
     # ==========================================
     with tab2:
+        # --- RINGKASAN PnL TEREALISASI (1 baris agregat, tidak memutar ulang histori) ---
+        pnl_sum = get_pnl_summary(user_id)
+        if pnl_sum:
+            k1, k2, k3 = st.columns(3)
+            realized = float(pnl_sum.get('realized_pnl') or 0)
+            n_sells = int(pnl_sum.get('n_sells') or 0)
+            k1.metric("PnL Terealisasi", f"Rp {realized:,.0f}", delta_color="normal" if realized >= 0 else "inverse")
+            k2.metric("Transaksi Jual", f"{n_sells}x", f"{int(pnl_sum.get('n_buys') or 0)}x Beli", delta_color="off")
+            k3.metric("Win Rate Jual", f"{(int(pnl_sum.get('n_wins') or 0) / n_sells * 100) if n_sells else 0:.0f}%")
+
         st.subheader("🛒 Form Penjualan Saham")
-        if 'sold_history' not in st.session_state:
-            st.session_state['sold_history'] = pd.DataFrame(columns=["Kode Saham", "Harga Beli", "Harga Jual", "Lot", "PnL Bersih (%)"])
 
         with st.expander("Catat Transaksi Penjualan Baru", expanded=True):
             c1, c2, c3, c4 = st.columns(4)
             s_ticker = c1.text_input("Kode Saham", placeholder="cth: BRIS").upper()
-            s_buy = c2.number_input("Harga Beli (Rp)", min_value=0)
+            s_buy = c2.number_input("Harga Beli (Rp)", min_value=0, help="Hanya wajib untuk lot lama yang belum tercatat di buku besar. Lot yang tercatat dicocokkan FIFO.")
             s_sell = c3.number_input("Harga Jual (Rp)", min_value=0)
             s_lot = c4.number_input("Jumlah Lot Terjual", min_value=1)
             
             if st.button("Simpan Transaksi Jual"):
-                if s_ticker and s_buy > 0 and s_sell > 0:
-                    # 1. Catat ke Histori PnL
-                    modal = s_buy * s_lot * 100
-                    hasil_jual = s_sell * s_lot * 100
-                    pnl_nominal = hasil_jual - modal
-                    pnl_persen = (pnl_nominal / modal) * 100 if modal > 0 else 0
-                    
-                    new_sale = pd.DataFrame([[s_ticker, s_buy, s_sell, s_lot, f"{pnl_persen:.2f}%"]], 
-                                            columns=["Kode Saham", "Harga Beli", "Harga Jual", "Lot", "PnL Bersih (%)"])
-                    st.session_state['sold_history'] = pd.concat([st.session_state['sold_history'], new_sale], ignore_index=True)
-                    st.success(f"Transaksi dicatat! Keuntungan/Kerugian: {pnl_persen:.2f}%")
-
-                    # 2. IDE C: LOGIKA AUTO-DELETE DI PORTOFOLIO AKTIF
-                    mask = st.session_state['portfolio_data']['Kode Saham'] == s_ticker
-                    if mask.any():
-                        current_lot = st.session_state['portfolio_data'].loc[mask, 'Jumlah Lot'].values[0]
-                        sisa_lot = current_lot - s_lot
-                        
-                        if sisa_lot <= 0: # Terjual Habis
-                            supabase.table('user_portfolios').delete().eq('user_id', user_id).eq('symbol', s_ticker).execute()
-                            st.session_state['portfolio_data'] = st.session_state['portfolio_data'][~mask]
+                if s_ticker and s_sell > 0:
+                    # Buku besar (FIFO), PnL & Portofolio Aktif diperbarui database dalam 1 RPC / 1 transaksi
+                    try:
+                        hasil = supabase.rpc('record_transaction', {
+                            'p_user_id': user_id, 'p_symbol': s_ticker, 'p_side': 'SELL',
+                            'p_price': s_sell, 'p_lots': int(s_lot), 'p_cost_hint': s_buy if s_buy > 0 else None
+                        }).execute().data
+                        pnl_nominal = float(hasil['realized_pnl'])
+                        modal = s_sell * s_lot * 100 - pnl_nominal
+                        pnl_persen = (pnl_nominal / modal) * 100 if modal > 0 else 0
+                        st.success(f"Transaksi dicatat! Keuntungan/Kerugian: Rp {pnl_nominal:,.0f} ({pnl_persen:.2f}%)")
+
+                        # IDE C: posisi yang terjual habis sudah dihapus database dari Portofolio Aktif
+                        load_portfolio_data()
+                        if int(hasil['lots']) <= 0:
                             st.info(f"💡 Info: {s_ticker} habis terjual dan otomatis dihapus dari daftar Portofolio Aktif.")
-                        else: # Terjual Sebagian (Parsial)
-                            supabase.table('user_portfolios').update({'total_lot': int(sisa_lot)}).eq('user_id', user_id).eq('symbol', s_ticker).execute()
-                            st.session_state['portfolio_data'].loc[mask, 'Jumlah Lot'] = sisa_lot
-                            st.info(f"💡 Info: Sisa kepemilikan {s_ticker} diupdate menjadi {sisa_lot} Lot.")
+                        else:
+                            st.info(f"💡 Info: Sisa kepemilikan {s_ticker} diupdate menjadi {int(hasil['lots'])} Lot.")
+                    except Exception as e:
+                        n_unmatched = unmatched_lots_error(e)
+                        if n_unmatched is not None:
+                            st.error(f"{n_unmatched} lot {s_ticker} belum tercatat di buku besar. Isi Harga Beli untuk lot lama tersebut.")
+                        else:
+                            st.error(f"Gagal mencatat transaksi: {e}")
+                else:
+                    st.error("Mohon isi data harga dengan benar.")
+
+        with st.expander("Catat Transaksi Pembelian", expanded=False):
+            b1, b2, b3 = st.columns(3)
+            b_ticker = b1.text_input("Kode Saham", placeholder="cth: BRIS", key="buy_ticker").upper()
+            b_price = b2.number_input("Harga Beli (Rp)", min_value=0, key="buy_price")
+            b_lot = b3.number_input("Jumlah Lot Dibeli", min_value=1, key="buy_lot")
+
+            if st.button("Simpan Transaksi Beli"):
+                if b_ticker and b_price > 0:
+                    try:
+                        # Portofolio Aktif (rata-rata tertimbang) digabung database dalam transaksi yang sama
+                        hasil = supabase.rpc('record_transaction', {
+                            'p_user_id': user_id, 'p_symbol': b_ticker, 'p_side': 'BUY',
+                            'p_price': b_price, 'p_lots': int(b_lot)
+                        }).execute().data
+                        load_portfolio_data() # Tab 3 di run yang sama langsung membaca posisi terbaru
+                        st.success(f"Pembelian {b_ticker} {int(b_lot)} Lot dicatat. Posisi baru: {int(hasil['lots'])} Lot @ Rp {float(hasil['avg_cost']):,.0f}")
+                    except Exception as e:
+                        st.error(f"Gagal mencatat transaksi: {e}")
                 else:
                     st.error("Mohon isi data harga dengan benar.")
 
-        st.dataframe(st.session_state['sold_history'], use_container_width=True, hide_index=True)
+        # --- RIWAYAT TRANSAKSI (PERSISTEN, TIDAK HILANG SAAT LOGOUT) ---
+        df_txn = get_transactions(user_id)
+        if not df_txn.empty:
+            st.dataframe(df_txn, use_container_width=True, hide_index=True,
+                column_config={
+                    "Harga": st.column_config.NumberColumn(format="Rp %d"),
+                    "PnL Terealisasi": st.column_config.NumberColumn(format="Rp %d")
+                })
+        else:
+            st.info("Belum ada transaksi yang tercatat.")
 
     # ==========================================
     # TAB 3: ANALISIS AI MULTI-FAKTOR (UPGRADE)
@@ -2085,64 +2450,57 @@ def show_portfolio_advisor():
             with st.spinner("Menarik data Teknikal, PnL, dan Kalender Dividen..."):
                 current_prices = get_current_prices(symbols)
                 
-                # --- RADAR DIVIDEN ---
-                div_messages = []
-                for t in symbols:
-                    try:
-                        info = yf.Ticker(f"{t}.JK").calendar
-                        if info is not None and not info.empty and 'Dividend Date' in info.index:
-                            div_date = info.loc['Dividend Date'].iloc[0]
-                            if pd.notna(div_date) and div_date.date() >= datetime.now().date():
-                                div_messages.append(f"💰 **RADAR DIVIDEN:** {t} dijadwalkan akan bagi dividen pada {div_date.date().strftime('%d %B %Y')}")
-                    except: pass
+                # --- RADAR DIVIDEN (1 query ke kalender dividen, bukan .calendar per saham) ---
+                div_messages = [
+                    f"💰 **RADAR DIVIDEN:** {r['symbol']} dijadwalkan akan bagi dividen pada {pd.Timestamp(r['ex_date']).strftime('%d %B %Y')}"
+                    for r in get_upcoming_dividends(tuple(symbols))
+                ]
                 
                 if div_messages:
                     for msg in div_messages: st.success(msg)
 
-                # --- PROSES PERHITUNGAN PnL & TREN TEKNIKAL AI ---
-                total_modal = 0; total_valuasi = 0
-                table_rows = []
-
-                for _, row in st.session_state['portfolio_data'].iterrows():
-                    sym = str(row['Kode Saham']).upper()
-                    avg_p = float(row['Harga Beli'])
-                    lot = int(row['Jumlah Lot'])
-                    lembar = lot * 100
-                    
-                    modal = avg_p * lembar
-                    curr_p = current_prices.get(sym, avg_p)
-                    valuasi = curr_p * lembar
-                    
-                    pnl_rp = valuasi - modal
-                    pnl_pct = (pnl_rp / modal) * 100 if modal > 0 else 0
-                    total_modal += modal; total_valuasi += valuasi
+                # --- PROSES PERHITUNGAN PnL & TREN TEKNIKAL AI (VECTORIZED SELURUH PORTOFOLIO) ---
+                pf = st.session_state['portfolio_data'].dropna(subset=['Kode Saham'])
+                pf = pd.DataFrame({
+                    "Saham": pf['Kode Saham'].astype(str).str.upper(),
+                    "avg_p": pf['Harga Beli'].astype(float),
+                    "Lot": pf['Jumlah Lot'].astype(int)
+                })
+                pf = pf[pf['Saham'].str.strip() != ""]
+                lembar = pf['Lot'] * 100
+                modal = pf['avg_p'] * lembar
+                curr_p = pf['Saham'].map(current_prices).fillna(pf['avg_p'])
+                pf['Valuasi'] = curr_p * lembar
+                pf['PnL (%)'] = np.where(modal > 0, (pf['Valuasi'] - modal) / modal * 100, 0.0)
+                total_modal = modal.sum(); total_valuasi = pf['Valuasi'].sum()
+
+                # --- DATA TEKNIKAL (SMA 20 & 50): 1x download massal untuk semua saham ---
+                try: panel = get_recent_close_panel(tuple(f"{sym}.JK" for sym in symbols))
+                except: panel = pd.DataFrame()
+                cukup = panel.notna().sum() > 50
+                sma20 = pf['Saham'].map(panel.rolling(20).mean().iloc[-1][cukup]) if not panel.empty else pd.Series(np.nan, index=pf.index)
+                sma50 = pf['Saham'].map(panel.rolling(50).mean().iloc[-1][cukup]) if not panel.empty else pd.Series(np.nan, index=pf.index)
+                valid = sma20.notna() & sma50.notna()
+                naik = sma20 > sma50
+                pf['Kondisi Tren'] = np.select(
+                    [~valid, naik & (curr_p > sma20), naik & (curr_p <= sma20), ~naik & (curr_p < sma20)],
+                    ["N/A", "🔥 Strong Uptrend", "📉 Pullback (Koreksi Naik)", "❄️ Strong Downtrend"],
+                    default="🔄 Rebound / Sideways"
+                )
 
-                    # --- TARIK DATA TEKNIKAL REAL-TIME (SMA 20 & 50) ---
-                    trend_status = "N/A"
-                    try:
-                        hist = yf.Ticker(f"{sym}.JK").history(period="3mo")
-                        if len(hist) > 50:
-                            sma20 = hist['Close'].rolling(20).mean().iloc[-1]
-                            sma50 = hist['Close'].rolling(50).mean().iloc[-1]
-                            if sma20 > sma50 and curr_p > sma20: trend_status = "🔥 Strong Uptrend"
-                            elif sma20 > sma50 and curr_p <= sma20: trend_status = "📉 Pullback (Koreksi Naik)"
-                            elif sma20 <= sma50 and curr_p < sma20: trend_status = "❄️ Strong Downtrend"
-                            else: trend_status = "🔄 Rebound / Sideways"
-                    except: pass
-
-                    # --- LOGIKA AI MULTI-FAKTOR (PnL + Trend) ---
-                    if pnl_pct <= -10 and "Downtrend" in trend_status: rekomendasi = "🚨 Cut Loss (Tren Patah)"
-                    elif pnl_pct <= -5 and ("Uptrend" in trend_status or "Pullback" in trend_status): rekomendasi = "💎 Avg Down (Diskon)"
-                    elif pnl_pct >= 15 and "Downtrend" in trend_status: rekomendasi = "💰 Take Profit (Tren Melemah)"
-                    elif pnl_pct >= 10 and "Uptrend" in trend_status: rekomendasi = "🚀 Let Profit Run (Hold)"
-                    elif pnl_pct > 0: rekomendasi = "📈 Profit Tipis (Hold)"
-                    else: rekomendasi = "👀 Pantau Ketat"
-
-                    table_rows.append({
-                        "Saham": sym, "Lot": lot, "Avg Price": f"Rp {avg_p:,.0f}", 
-                        "Last Price": f"Rp {curr_p:,.0f}", "PnL (%)": pnl_pct, 
-                        "Kondisi Tren": trend_status, "Aksi AI": rekomendasi, "Valuasi": valuasi
-                    })
+                # --- LOGIKA AI MULTI-FAKTOR (PnL + Trend) ---
+                pnl, tren = pf['PnL (%)'], pf['Kondisi Tren']
+                is_up, is_down = tren.str.contains("Uptrend"), tren.str.contains("Downtrend")
+                pf['Aksi AI'] = np.select(
+                    [(pnl <= -10) & is_down, (pnl <= -5) & (is_up | tren.str.contains("Pullback")),
+                     (pnl >= 15) & is_down, (pnl >= 10) & is_up, pnl > 0],
+                    ["🚨 Cut Loss (Tren Patah)", "💎 Avg Down (Diskon)", "💰 Take Profit (Tren Melemah)",
+                     "🚀 Let Profit Run (Hold)", "📈 Profit Tipis (Hold)"],
+                    default="👀 Pantau Ketat"
+                )
+                pf['Avg Price'] = pf['avg_p'].map(lambda x: f"Rp {x:,.0f}")
+                pf['Last Price'] = curr_p.map(lambda x: f"Rp {x:,.0f}")
+                table_rows = pf[["Saham", "Lot", "Avg Price", "Last Price", "PnL (%)", "Kondisi Tren", "Aksi AI", "Valuasi"]]
 
             total_pnl_rp = total_valuasi - total_modal
             total_pnl_pct = (total_pnl_rp / total_modal) * 100 if total_modal > 0 else 0
@@ -2157,7 +2515,7 @@ def show_portfolio_advisor():
 
             # --- VISUALISASI ALOKASI & RISIKO ---
             st.divider()
-            df_display = pd.DataFrame(table_rows)
+            df_display = table_rows.reset_index(drop=True)
             
             c_chart1, c_chart2 = st.columns(2)
             with c_chart1:
@@ -2183,6 +2541,34 @@ def show_portfolio_advisor():
                     else:
                         st.success("✅ **Diversifikasi Sangat Sehat.** Tidak ada saham yang mendominasi lebih dari 50%.")
 
+            # --- RADAR RISIKO (KOVARIANS, VaR/CVaR, KONTRIBUSI RISIKO, KLASTER KORELASI) ---
+            if user_role != 'free' and total_valuasi > 0:
+                risk = load_portfolio_risk(df_display.groupby('Saham')['Lot'].sum())
+                if risk:
+                    st.subheader("⚠️ Radar Risiko Portofolio")
+                    st.caption(f"Dihitung dari {risk['n_days']} hari bursa terakhir. VaR/CVaR = estimasi kerugian 1 hari pada tingkat keyakinan 95%.")
+                    if risk['excluded']:
+                        st.info(f"ℹ️ {', '.join(risk['excluded'])} tidak ikut dihitung: riwayat harga kurang dari 1 tahun bursa.")
+                    r1, r2, r3, r4 = st.columns(4)
+                    r1.metric("Volatilitas Tahunan", f"{risk['vol_annual']:.1f}%")
+                    r2.metric("VaR Historis", f"-{risk['var_hist']:.2f}%", f"Rp {risk['var_hist'] / 100 * total_valuasi:,.0f}", delta_color="off")
+                    r3.metric("CVaR Historis", f"-{risk['cvar_hist']:.2f}%", f"Rp {risk['cvar_hist'] / 100 * total_valuasi:,.0f}", delta_color="off")
+                    r4.metric("VaR Parametrik", f"-{risk['var_param']:.2f}%", f"CVaR -{risk['cvar_param']:.2f}%", delta_color="off")
+
+                    c_risk1, c_risk2 = st.columns(2)
+                    with c_risk1:
+                        st.markdown("**Kontribusi Risiko per Saham**")
+                        st.dataframe(risk['contrib'].round(2), use_container_width=True)
+                    with c_risk2:
+                        fig_corr = go.Figure(data=go.Heatmap(z=risk['corr'].values, x=risk['corr'].columns, y=risk['corr'].index, colorscale='RdBu_r', zmin=-1, zmax=1))
+                        fig_corr.update_layout(height=300, template="plotly_dark", margin=dict(l=0, r=0, t=10, b=0))
+                        st.plotly_chart(fig_corr, use_container_width=True)
+
+                    for cluster in risk['clusters']:
+                        st.warning(f"🔗 **Bergerak Bersama:** {', '.join(cluster)} berkorelasi tinggi. Diversifikasi semu, risikonya menumpuk.")
+
+                    show_projection(risk['projection'], total_valuasi)
+
             # --- TABEL DETAIL PORTOFOLIO (DIPERLENGKAP) ---
             st.subheader("📋 Rekap AI 360° (Teknikal + PnL)")
             st.caption("💡 *Saran AI Ekstra:* Untuk melihat riwayat probabilitas pergerakan saham di bulan ini, silakan cek menu **🗓️ Peta Musiman**.")
@@ -2205,6 +2591,24 @@ def show_portfolio_advisor():
                     use_container_width=True, hide_index=True
                 )
 
+            # --- YIELD-ON-COST (DARI HISTORI DIVIDEN) ---
+            df_pos = st.session_state['portfolio_data'].rename(columns={"Kode Saham": "symbol", "Harga Beli": "avg_price"})
+            df_pos = df_pos.assign(symbol=df_pos['symbol'].astype(str).str.upper(), avg_price=df_pos['avg_price'].astype(float))
+            df_yoc = yield_on_cost(load_dividend_metrics(symbols, "IDX"), df_pos[['symbol', 'avg_price']])
+            df_yoc = df_yoc[df_yoc['ttm_dividend'] > 0]
+            if not df_yoc.empty:
+                st.subheader("💰 Yield-on-Cost Dividen")
+                st.caption("Dividen 12 bulan terakhir dibanding harga beli rata-rata Anda (bukan harga pasar saat ini).")
+                st.dataframe(
+                    df_yoc.rename(columns={"symbol": "Saham", "avg_price": "Avg Price", "ttm_dividend": "Dividen 12 Bln", "yoc_pct": "Yield-on-Cost (%)"}),
+                    use_container_width=True, hide_index=True,
+                    column_config={
+                        "Avg Price": st.column_config.NumberColumn(format="Rp %d"),
+                        "Dividen 12 Bln": st.column_config.NumberColumn(format="Rp %.2f"),
+                        "Yield-on-Cost (%)": st.column_config.NumberColumn(format="%.2f %%")
+                    }
+                )
+
 
 # ==============================================================================
 # ==============================================================================
@@ -2219,13 +2623,10 @@ st.sidebar.markdown(f"Status Akun: <span style='color:{role_color}; font-weight:
 
 # --- VISUALISASI METERAN KUOTA API ---
 try:
-    # Tarik data terbaru untuk Sidebar
-    q_res = supabase.table('profiles').select('daily_quota, used_quota').eq('id', user_id).single().execute()
-    if q_res.data:
-        limit_q = int(q_res.data.get('daily_quota', 0))
-        used_q = int(q_res.data.get('used_quota', 0))
-    else:
-        limit_q = 0; used_q = 0
+    # Dibaca dari cache profil sesi (diperbarui oleh cek reset harian & RPC kuota), tanpa query
+    profile = st.session_state['user']
+    limit_q = int(profile.get('daily_quota') or 0)
+    used_q = int(profile.get('used_quota') or 0)
 except:
     limit_q = 0; used_q = 0
 
@@ -2335,7 +2736,7 @@ if is_admin:
         with col1:
             if st.button("✅ YAKIN", use_container_width=True):
                 st.cache_data.clear()
-                # api_registry.clear() # Buka komentar ini jika api_registry sudah didefinisikan sebelumnya
+                api_registry.clear() # Hanya lapisan memori; status di database tetap
                 st.session_state['confirm_clear_cache'] = False 
                 st.sidebar.success("✅ Memori dibersihkan!")
                 time.sleep(1.5) 
@@ -2364,32 +2765,74 @@ Perdagangan saham memiliki risiko kerugian finansial yang tinggi. Segala keputus
 """, unsafe_allow_html=True)
 
 # --- MENJALANKAN APLIKASI UTAMA ---
-if mode == "🔍 Super Screener":
-    run_screener(use_idx_data, active_stock_list, active_category_name, market_choice)
+def route_page(mode):
+    if mode == "🔍 Super Screener":
+        run_screener(use_idx_data, active_stock_list, active_category_name, market_choice)
 
-elif mode == "📊 Advanced Chart":
-    show_chart(use_idx_data, market_choice)
+    elif mode == "📊 Advanced Chart":
+        show_chart(use_idx_data, market_choice)
+
+    elif mode == "🥇 Emas & Safe Haven":
+        show_gold_predictor()
+
+    elif mode == "🧪 Mesin Backtesting":
+        show_backtesting(market_choice)
+
+    elif mode == "📰 Radar Sentimen Berita":
+        show_news_sentiment(market_choice)
 
-elif mode == "🥇 Emas & Safe Haven":
-    show_gold_predictor()
+    elif mode == "🗓️ Peta Musiman":
+        show_seasonality(market_choice)
 
-elif mode == "🧪 Mesin Backtesting":
-    show_backtesting(market_choice)
+    elif mode == "💼 Robo-Advisor Portofolio":
+        show_portfolio_advisor()
 
-elif mode == "📰 Radar Sentimen Berita":
-    show_news_sentiment(market_choice)
+    elif mode == "📅 Dividend Hunter":
+        show_dividend_hunter(active_stock_list, active_category_name, market_choice)
 
-elif mode == "🗓️ Peta Musiman":
-    show_seasonality(market_choice)
+    elif mode == "📚 Pusat Edukasi":
+        show_education()
 
-elif mode == "💼 Robo-Advisor Portofolio":
-    show_portfolio_advisor()
+    elif mode == "👑 Admin Dashboard" and is_admin:
+        show_admin_dashboard()
 
-elif mode == "📅 Dividend Hunter":
-    show_dividend_hunter(active_stock_list, active_category_name, market_choice)
+def show_profile_report(report, key):
+    st.caption(f"Halaman: **{report['page']}** · {report['at']} · Waktu CPU {report['total_s']:.2f} s · Puncak memori {report['peak_kb']:,.0f} KB")
+    st.markdown("**Fungsi Termahal (Cumulative Time)**")
+    st.dataframe(report['functions'], use_container_width=True, hide_index=True)
+    st.markdown("**Lokasi Alokasi Memori Terbesar**")
+    st.dataframe(report['allocations'], use_container_width=True, hide_index=True)
+    st.caption(f"ℹ️ {report['allocation_note']}")
+    st.download_button("📥 Download .pstats", report['pstats'], file_name=f"profile_{report['at'].replace(' ', '_').replace(':', '')}.pstats", key=f"pstats_{key}", use_container_width=True)
 
-elif mode == "📚 Pusat Edukasi":
-    show_education()
+# Semua waktu yang tercatat selama rerun ini diberi label halaman aktif
+perf.set_page(mode)
+_page_start = time.perf_counter()
 
-elif mode == "👑 Admin Dashboard" and is_admin:
-    show_admin_dashboard()
+# Profiler sekali jalan: admin memilih halaman; rerun navigasi ke halaman itu hanya "mengokang",
+# rerun berikutnya di halaman itu (aksi yang lambat) dibungkus cProfile + tracemalloc
+_profiler = None
+_profile_next = st.session_state.get('profile_next') if is_admin else None
+if _profile_next and _profile_next['page'] == mode:
+    if not _profile_next['armed']:
+        _profile_next['armed'] = True
+    else:
+        _profiler = perf.profile_start()
+        if _profiler is None: st.sidebar.warning("🧪 Profiler sedang dipakai sesi admin lain; akan dicoba lagi di rerun berikutnya.")
+        else: st.session_state['profile_next'] = None
+elif _profile_next and _profile_next['armed']:
+    _profile_next['armed'] = False # Admin pindah halaman sebelum aksi: kokang ulang saat kembali ke halaman itu
+
+try:
+    route_page(mode)
+finally:
+    perf.record("render_page", time.perf_counter() - _page_start)
+    if _profiler is not None:
+        st.session_state['profile_report'] = {
+            **perf.profile_stop(_profiler), "page": mode,
+            "at": (datetime.utcnow() + timedelta(hours=7)).strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+if is_admin and st.session_state.get('profile_report') and mode != "👑 Admin Dashboard":
+    with st.sidebar.expander("🧪 Hasil Profiler Terakhir", expanded=False):
+        show_profile_report(st.session_state['profile_report'], "sidebar")
@@ -0,0 +1,98 @@
+import atexit
+import json
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+# =====================================================================
+# PENCATAT AUDIT ASINKRON (DI LUAR JALUR REQUEST)
+# Event masuk antrian proses, thread latar belakang mengirimnya dalam 1 bulk insert
+# setiap BATCH_SIZE event atau FLUSH_SECONDS detik. Jika database gagal, event ditulis ke file lokal.
+# =====================================================================
+BATCH_SIZE = 50
+FLUSH_SECONDS = 5.0
+FALLBACK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_fallback.jsonl")
+
+class AuditLogger:
+    def __init__(self, client, table='audit_logs', batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS, fallback_path=FALLBACK_PATH):
+        self.client = client
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.fallback_path = fallback_path
+        self._queue = queue.Queue()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="audit-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def log(self, user_email, action, details=""):
+        """Tidak pernah memblokir / melempar error ke halaman."""
+        self._queue.put({
+            "user_email": user_email, "action": action, "details": details,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        })
+        if self._queue.qsize() >= self.batch_size: self._wake.set()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try: batch.append(self._queue.get_nowait())
+            except queue.Empty: break
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.client.table(self.table).insert(batch).execute()
+            return True
+        except Exception as e:
+            print(f"⚠️ Audit log gagal dikirim, disimpan ke file lokal: {e}")
+            try:
+                with open(self.fallback_path, "a", encoding="utf-8") as f:
+                    for event in batch: f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            except Exception as file_err:
+                print(f"❌ Audit log hilang ({len(batch)} event): {file_err}")
+            return False
+
+    def _replay_fallback(self):
+        # Setelah database pulih, kirim ulang event yang sempat tertahan di file lokal.
+        # File .sending yang tertinggal (proses mati / gagal baca sebelumnya) diproses lebih dulu, tidak ditimpa.
+        pending_path = self.fallback_path + ".sending"
+        try:
+            if not os.path.exists(pending_path):
+                if not os.path.exists(self.fallback_path): return
+                os.replace(self.fallback_path, pending_path)
+            with open(pending_path, encoding="utf-8") as f: lines = [line for line in f if line.strip()]
+        except Exception as e:
+            print(f"⚠️ Gagal membaca antrean audit lokal, dicoba lagi nanti: {e}")
+            try:
+                if os.path.exists(pending_path) and not os.path.exists(self.fallback_path): os.replace(pending_path, self.fallback_path)
+            except Exception: pass
+            return
+
+        events, corrupt = [], 0
+        for line in lines:
+            try: events.append(json.loads(line))
+            except ValueError: corrupt += 1 # Satu baris rusak tidak boleh menahan event lainnya
+        if corrupt: print(f"⚠️ {corrupt} baris audit lokal rusak dilewati.")
+        try: os.remove(pending_path)
+        except Exception: pass
+        for i in range(0, len(events), self.batch_size):
+            self._write(events[i:i + self.batch_size])
+
+    def flush(self):
+        """Kirim semua event yang masih mengantri (dipanggil thread latar belakang & saat proses berhenti)."""
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch: break
+                if self._write(batch): self._replay_fallback()
+
+    def _loop(self):
+        while True:
+            # Bangun saat batch penuh (dari log()) atau paling lambat setiap FLUSH_SECONDS
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
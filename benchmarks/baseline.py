@@ -0,0 +1,53 @@
+import json
+
+import pandas as pd
+
+# =====================================================================
+# PERBANDINGAN HASIL BENCHMARK DENGAN BASELINE (DIPAKAI SEMUA SKRIP DI benchmarks/)
+# Hasil = {"config": ..., "environment": ..., "stages": {tahap: {"seconds": .., "peak_kb": ..}}}
+# =====================================================================
+DEFAULT_TOLERANCE = 0.25   # Lebih lambat / boros > 25% dari baseline = regresi
+NOISE_FLOOR = {"seconds": 0.005, "peak_kb": 16}  # Selisih absolut sekecil ini dianggap noise
+
+def add_baseline_args(parser):
+    parser.add_argument("--baseline", help="File JSON baseline untuk dibandingkan")
+    parser.add_argument("--save-baseline", help="Simpan hasil run ini sebagai baseline baru")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--output", help="Simpan hasil run ini (JSON)")
+
+def compare(result, baseline, tolerance):
+    """Tabel perbandingan per tahap + daftar regresi."""
+    rows, regressions = [], []
+    for stage, cur in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        row = {"stage": stage, **cur}
+        if base:
+            for metric in ("seconds", "peak_kb"):
+                if metric not in cur or metric not in base: continue
+                ratio = cur[metric] / base[metric] if base[metric] > 0 else 1.0
+                row[f"base_{metric}"] = base[metric]
+                row[f"{metric}_delta_%"] = (ratio - 1) * 100
+                if ratio > 1 + tolerance and cur[metric] - base[metric] > NOISE_FLOOR[metric]:
+                    regressions.append(f"{stage}.{metric} +{(ratio - 1) * 100:.0f}%")
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("stage").round(4), regressions
+
+def report(result, args):
+    """Cetak tabel, simpan hasil/baseline, kembalikan exit code (1 = ada regresi)."""
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print(f"⚠️ Konfigurasi baseline berbeda: {baseline.get('config')} vs {result['config']}")
+    table, regressions = compare(result, baseline, args.tolerance)
+    print(table.to_string())
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f: json.dump(result, f, indent=2)
+        print(f"💾 Hasil disimpan ke {path}")
+
+    if regressions:
+        print("❌ REGRESI (> {:.0f}% dari baseline): {}".format(args.tolerance * 100, ", ".join(regressions)))
+        return 1
+    if args.baseline: print("✅ Tidak ada regresi terhadap baseline.")
+    return 0
@@ -0,0 +1,99 @@
+"""
+Benchmark inti numerik (technicals.py) di atas data OHLCV sintetis, tanpa jaringan.
+
+    python benchmarks/bench_core.py --symbols 100 --years 10
+    python benchmarks/bench_core.py --symbols 100 --years 10 --save-baseline benchmarks/baseline_core.json
+    python benchmarks/bench_core.py --symbols 100 --years 10 --baseline benchmarks/baseline_core.json
+
+Waktu (detik) per tahap = total seluruh simbol, diambil yang tercepat dari --repeat kali.
+Memori puncak (KB) per tahap = panggilan tunggal terboros, diukur di pass terpisah dengan tracemalloc
+(agar overhead tracemalloc tidak ikut terhitung di waktu). Keluar dengan kode 1 jika ada regresi.
+"""
+import argparse
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from technicals import (calculate_metrics, knn_probability_up, score_analysis, advanced_analysis,
+                        check_candlestick_patterns, compute_backtest, cross_sectional_rank)
+from synthetic import synthetic_universe, synthetic_benchmark, synthetic_quant_rows
+from baseline import add_baseline_args, report
+
+STAGES = ["calculate_metrics", "knn_probability_up", "score_analysis", "advanced_analysis",
+          "check_candlestick_patterns", "compute_backtest", "cross_sectional_rank"]
+
+def run_stages(raw, ihsg, measure):
+    """Jalankan semua tahap per simbol dengan urutan yang sama seperti show_chart / backtesting."""
+    df = measure("calculate_metrics", calculate_metrics, raw, ihsg)
+    measure("knn_probability_up", knn_probability_up, df)
+    measure("score_analysis", score_analysis, df, None)
+    measure("advanced_analysis", advanced_analysis, df)
+    measure("check_candlestick_patterns", check_candlestick_patterns, df.iloc[-1], df.iloc[-2])
+    measure("compute_backtest", compute_backtest, raw)
+
+def time_pass(args, ihsg):
+    totals = dict.fromkeys(STAGES, 0.0)
+    def measure(stage, func, *a):
+        start = time.perf_counter()
+        out = func(*a)
+        totals[stage] += time.perf_counter() - start
+        return out
+    for _, raw in synthetic_universe(args.symbols, args.years, args.seed):
+        run_stages(raw, ihsg, measure)
+    quant = synthetic_quant_rows(args.symbols, args.seed)
+    measure("cross_sectional_rank", cross_sectional_rank, quant)
+    return totals
+
+def memory_pass(args, ihsg):
+    peaks = dict.fromkeys(STAGES, 0)
+    def measure(stage, func, *a):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        out = func(*a)
+        peaks[stage] = max(peaks[stage], tracemalloc.get_traced_memory()[1] - base)
+        return out
+    tracemalloc.start()
+    try:
+        for _, raw in synthetic_universe(args.symbols, args.years, args.seed):
+            run_stages(raw, ihsg, measure)
+        measure("cross_sectional_rank", cross_sectional_rank, synthetic_quant_rows(args.symbols, args.seed))
+    finally:
+        tracemalloc.stop()
+    return {k: v / 1024 for k, v in peaks.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=50, help="Jumlah simbol sintetis (1-1000)")
+    parser.add_argument("--years", type=float, default=5, help="Panjang sejarah per simbol dalam tahun (1-20)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Ulangi pass waktu, ambil yang tercepat")
+    add_baseline_args(parser)
+    args = parser.parse_args(argv)
+    if not 1 <= args.symbols <= 1000: parser.error("--symbols harus 1-1000")
+    if not 1 <= args.years <= 20: parser.error("--years harus 1-20")
+
+    ihsg = synthetic_benchmark(args.years, args.seed)
+    print(f"⏱️ Benchmark inti numerik: {args.symbols} simbol x {args.years:g} tahun (seed {args.seed})")
+
+    times = [time_pass(args, ihsg) for _ in range(max(1, args.repeat))]
+    seconds = {stage: min(t[stage] for t in times) for stage in STAGES}
+    peaks = memory_pass(args, ihsg)
+
+    result = {
+        "config": {"symbols": args.symbols, "years": args.years, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__, "machine": platform.machine()},
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "stages": {stage: {"seconds": seconds[stage], "peak_kb": peaks[stage]} for stage in STAGES},
+    }
+
+    return report(result, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Benchmark render sisi server untuk setiap menu app.py secara headless (streamlit.testing AppTest).
+
+Harga/fundamental, broker summary & RSS diganti penyedia tiruan deterministik (benchmarks/stubs.py),
+database = SQLite sementara, dan sesi login admin disuntikkan langsung ke session_state.
+Per halaman diukur: waktu run pertama (cache dingin) & rerun (cache hangat), jumlah panggilan eksternal
+(penyedia + round trip database), serta jumlah & ukuran pesan delta yang dikirim ke browser.
+
+    python benchmarks/bench_pages.py
+    python benchmarks/bench_pages.py --write-budget benchmarks/page_budget.json --headroom 0.5
+    python benchmarks/bench_pages.py --budget benchmarks/page_budget.json      # exit 1 jika ada halaman melewati budget
+    python benchmarks/bench_pages.py --db data/local.db --pages "Advanced Chart" "Dividend"
+
+--db menyalin database lokal yang sudah terisi (mis. hasil STORAGE_BACKEND=sqlite python fetcher.py)
+agar halaman yang membaca hasil screener malam ikut merender tabelnya.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+APP_PATH = os.path.join(ROOT, "app.py")
+ADMIN_EMAIL = "bench-admin@local"
+METRICS = ("cold_seconds", "rerun_seconds", "external_calls", "delta_kb")
+DEFAULT_HEADROOM = 0.5 # Budget = hasil terukur + 50%
+
+class DeltaMeter:
+    """Hitung setiap ForwardMsg delta yang di-enqueue ke browser (sebelum digabung oleh antrian)."""
+    def __init__(self):
+        self.count = self.bytes = 0
+
+    def install(self):
+        from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+        original = ForwardMsgQueue.enqueue
+        meter = self
+        def enqueue(queue, msg):
+            if msg.WhichOneof("type") == "delta":
+                meter.count += 1
+                meter.bytes += msg.ByteSize()
+            return original(queue, msg)
+        ForwardMsgQueue.enqueue = enqueue
+
+    def reset(self):
+        snapshot = (self.count, self.bytes)
+        self.count = self.bytes = 0
+        return snapshot
+
+def prepare_environment(args):
+    """Database SQLite sementara + akun admin lokal; konfigurasi lewat env agar dibaca load_config(st.secrets)."""
+    db_dir = tempfile.mkdtemp(prefix="bench_pages_")
+    db_path = os.path.join(db_dir, "bench.db")
+    if args.db: shutil.copyfile(args.db, db_path)
+    os.environ.update({"STORAGE_BACKEND": "sqlite", "LOCAL_DB_PATH": db_path, "CASSETTE_MODE": "off",
+                       "SUPABASE_URL": "", "SUPABASE_KEY": ""})
+
+    import providers
+    import stubs
+    stubs.install(providers)
+    admin = providers.new_local_profile(providers.get_storage(providers.load_config()), ADMIN_EMAIL, role="admin", daily_quota=1000)
+    stubs.calls.reset()
+    return admin
+
+def render(page, admin, timeout):
+    """Satu sesi baru: run pertama lalu rerun tanpa interaksi. Kembalikan metrik dua run tersebut."""
+    import streamlit.logger
+    from streamlit.testing.v1 import AppTest
+    import stubs
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state['logged_in'] = True
+    at.session_state['user'] = dict(admin)
+    at.session_state['active_menu'] = page
+
+    runs = []
+    for _ in range(2):
+        streamlit.logger.set_log_level("error") # AppTest memuat ulang config tiap run; peringatan per widget menenggelamkan tabel hasil
+        meter.reset()
+        start = time.perf_counter()
+        at.run()
+        seconds = time.perf_counter() - start
+        deltas, size = meter.reset()
+        runs.append({"seconds": seconds, "calls": stubs.calls.reset(), "deltas": deltas, "delta_kb": size / 1024,
+                     "errors": [e.value for e in at.exception]})
+    return runs
+
+def check_budget(result, budget):
+    breaches = []
+    for page, cur in result["pages"].items():
+        limit = budget.get("pages", {}).get(page)
+        if not limit:
+            breaches.append(f"{page}: tidak ada di budget")
+            continue
+        for metric in METRICS:
+            if metric in limit and cur[metric] > limit[metric]:
+                breaches.append(f"{page}.{metric} {cur[metric]:g} > {limit[metric]:g}")
+    return breaches
+
+def write_budget(result, path, headroom):
+    pages = {}
+    for page, cur in result["pages"].items():
+        pages[page] = {m: round(cur[m] * (1 + headroom), 3) for m in ("cold_seconds", "rerun_seconds", "delta_kb")}
+        pages[page]["external_calls"] = int(cur["external_calls"] * (1 + headroom)) + 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"created_at": result["created_at"], "headroom": headroom, "environment": result["environment"], "pages": pages}, f, indent=2, ensure_ascii=False)
+    print(f"💾 Budget ditulis ke {path}")
+
+meter = DeltaMeter()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="*", help="Hanya menu yang namanya mengandung teks ini")
+    parser.add_argument("--db", help="Database SQLite lokal yang sudah terisi (disalin, tidak diubah)")
+    parser.add_argument("--timeout", type=float, default=120, help="Batas waktu per run (detik)")
+    parser.add_argument("--budget", help="File JSON budget per halaman; exit 1 jika ada yang terlewati")
+    parser.add_argument("--write-budget", help="Tulis budget dari hasil run ini")
+    parser.add_argument("--headroom", type=float, default=DEFAULT_HEADROOM)
+    parser.add_argument("--output", help="Simpan hasil run ini (JSON)")
+    args = parser.parse_args(argv)
+
+    admin = prepare_environment(args)
+    meter.install()
+
+    # Daftar menu diambil dari app.py itu sendiri (admin melihat semua menu)
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    probe = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    probe.session_state['logged_in'] = True
+    probe.session_state['user'] = dict(admin)
+    probe.run()
+    menu = list(probe.sidebar.radio(key="active_menu").options)
+    pages = [p for p in menu if not args.pages or any(f.lower() in p.lower() for f in args.pages)]
+    print(f"⏱️ Benchmark render halaman (AppTest, penyedia tiruan): {len(pages)} menu")
+
+    result = {"environment": {"python": platform.python_version(), "streamlit": st.__version__, "pandas": pd.__version__, "machine": platform.machine()},
+              "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), "pages": {}}
+    rows, failed = [], []
+    for page in pages:
+        st.cache_data.clear() # Run pertama tiap halaman selalu dingin, tidak menumpang cache halaman sebelumnya
+        cold, warm = render(page, admin, args.timeout)
+        calls = sum(cold["calls"].values()) + sum(warm["calls"].values())
+        result["pages"][page] = {"cold_seconds": round(cold["seconds"], 4), "rerun_seconds": round(warm["seconds"], 4),
+                                 "external_calls": calls, "delta_kb": round(max(cold["delta_kb"], warm["delta_kb"]), 2),
+                                 "deltas": max(cold["deltas"], warm["deltas"]),
+                                 "calls_by_name": {k: cold["calls"].get(k, 0) + warm["calls"].get(k, 0) for k in sorted({*cold["calls"], *warm["calls"]})}}
+        rows.append({"page": page, **{k: v for k, v in result["pages"][page].items() if k != "calls_by_name"}})
+        if cold["errors"] or warm["errors"]: failed.append(f"{page}: {(cold['errors'] + warm['errors'])[0][:200]}")
+
+    print(pd.DataFrame(rows).set_index("page").to_string())
+    if failed:
+        print("❌ Exception saat render:\n  " + "\n  ".join(failed))
+
+    for path in filter(None, [args.output]):
+        with open(path, "w", encoding="utf-8") as f: json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"💾 Hasil disimpan ke {path}")
+    if args.write_budget: write_budget(result, args.write_budget, args.headroom)
+
+    if args.budget:
+        with open(args.budget, encoding="utf-8") as f: budget = json.load(f)
+        breaches = check_budget(result, budget)
+        if breaches:
+            print("❌ MELEWATI BUDGET: " + ", ".join(breaches))
+            return 1
+        print("✅ Semua halaman dalam budget.")
+    return 2 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
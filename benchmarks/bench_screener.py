@@ -0,0 +1,98 @@
+"""
+Benchmark end-to-end fetcher.run_screener dengan trafik jaringan yang diputar ulang dari kaset.
+
+1) Rekam sekali (jaringan asli, tulis ke database lokal agar Supabase produksi tidak tersentuh).
+   GITHUB_EVENT_NAME=workflow_dispatch memaksa fetcher menjalankan KEDUA pasar; tanpa itu pasar yang
+   dijalankan bergantung jam UTC (bahkan tidak ada sama sekali di jam 03-09 / 16-19 UTC):
+    GITHUB_EVENT_NAME=workflow_dispatch CASSETTE_MODE=record CASSETTE_PATH=data/cassettes/nightly.cassette STORAGE_BACKEND=sqlite python fetcher.py
+2) Putar ulang tanpa jaringan (deterministik) dan bandingkan dengan baseline:
+    python benchmarks/bench_screener.py --cassette data/cassettes/nightly.cassette --save-baseline benchmarks/baseline_screener.json
+    python benchmarks/bench_screener.py --cassette data/cassettes/nightly.cassette --baseline benchmarks/baseline_screener.json
+
+Kaset harus berisi pasar yang dijalankan (--market); panggilan yang tidak terekam menggagalkan benchmark.
+"""
+import argparse
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from baseline import add_baseline_args, report
+
+MARKETS = {
+    "idx": ("JII30 (Indonesia)", "SHARIA_STOCKS", "^JKSE", "jii30_daily_data", True),
+    "us": ("Wall Street (US)", "US_STOCKS", "^GSPC", "us_daily_data", False),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", required=True, help="File kaset hasil CASSETTE_MODE=record")
+    parser.add_argument("--market", choices=["idx", "us", "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=3, help="Ulangi pass waktu, ambil yang tercepat")
+    add_baseline_args(parser)
+    args = parser.parse_args(argv)
+
+    # Konfigurasi dibaca fetcher saat di-import: putar ulang kaset + database SQLite sementara
+    db_dir = tempfile.mkdtemp(prefix="bench_screener_")
+    os.environ.update({"CASSETTE_MODE": "replay", "CASSETTE_PATH": os.path.abspath(args.cassette),
+                       "STORAGE_BACKEND": "sqlite", "LOCAL_DB_PATH": os.path.join(db_dir, "bench.db")})
+    import pandas as pd
+    import fetcher
+    from providers import get_cassette
+    from cassette import CassetteMiss
+
+    markets = ["idx", "us"] if args.market == "both" else [args.market]
+    jobs = {}
+    for m in markets:
+        name, stocks, bm, table, use_goapi = MARKETS[m]
+        jobs[f"run_screener_{m}"] = (lambda name=name, stocks=getattr(fetcher, stocks), bm=bm, table=table, use_goapi=use_goapi:
+                                     fetcher.run_screener(name, stocks, bm, table, use_goapi=use_goapi))
+
+    print(f"⏱️ Benchmark run_screener (replay {os.path.basename(args.cassette)}): {', '.join(markets)}")
+    seconds, peaks = {stage: float("inf") for stage in jobs}, {}
+    try:
+        for _ in range(max(1, args.repeat)):
+            for stage, job in jobs.items():
+                start = time.perf_counter()
+                job()
+                seconds[stage] = min(seconds[stage], time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            for stage, job in jobs.items():
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                job()
+                peaks[stage] = (tracemalloc.get_traced_memory()[1] - base) / 1024
+        finally:
+            tracemalloc.stop()
+    except CassetteMiss as e:
+        # Miss di luar try milik fetcher (mis. prices.download satu pasar penuh) menghentikan run
+        print(f"❌ {e}; pasar --market {args.market} belum terekam di kaset (lihat langkah 1 di --help).")
+        return 2
+
+    cassette = get_cassette(fetcher.CONFIG)
+    stats = cassette.stats()
+    if stats["misses"]:
+        print(f"❌ {stats['misses']} panggilan tidak ada di kaset; rekam ulang dengan CASSETTE_MODE=record.")
+        return 2
+
+    # Rincian per fungsi (perf.timed) dari seluruh pass, berguna untuk melihat tahap mana yang berubah
+    print(fetcher.perf.summary().head(15).to_string(index=False))
+
+    result = {
+        "config": {"cassette": os.path.basename(args.cassette), "markets": markets},
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__, "machine": platform.machine()},
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "cassette": {k: stats[k] for k in ("entries", "hits", "by_name")},
+        "stages": {stage: {"seconds": seconds[stage], "peak_kb": peaks[stage]} for stage in jobs},
+    }
+    return report(result, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
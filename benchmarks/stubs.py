@@ -0,0 +1,135 @@
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from providers import PriceProvider, BrokerProvider
+from synthetic import synthetic_ohlcv, TRADING_DAYS
+
+# =====================================================================
+# PENYEDIA TIRUAN UNTUK BENCHMARK HALAMAN (TANPA JARINGAN, DETERMINISTIK)
+# Setiap ticker mendapat data sintetis dengan seed dari nama ticker-nya,
+# dan setiap panggilan dihitung agar jumlah "panggilan eksternal" per halaman bisa dibandingkan.
+# =====================================================================
+HISTORY_YEARS = 12 # Cukup untuk period terpanjang yang dipakai aplikasi (10y)
+
+def _seed(ticker):
+    return zlib.crc32(ticker.encode("utf-8"))
+
+class CallCounter:
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def hit(self, name):
+        with self._lock: self.counts[name] += 1
+
+    def reset(self):
+        with self._lock:
+            snapshot = dict(self.counts)
+            self.counts.clear()
+        return snapshot
+
+calls = CallCounter()
+
+class SyntheticPrices(PriceProvider):
+    def __init__(self):
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _frame(self, ticker):
+        with self._lock:
+            if ticker not in self._frames:
+                df = synthetic_ohlcv(HISTORY_YEARS * TRADING_DAYS, seed=_seed(ticker), start_price=100.0 + _seed(ticker) % 9000)
+                # Bar terakhir = hari bursa terakhir sebelum hari ini, seperti data live
+                df.index = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.offsets.BDay(1), periods=len(df), name="Date")
+                self._frames[ticker] = df
+            return self._frames[ticker]
+
+    def _slice(self, ticker, period, start):
+        from providers import period_start
+        df = self._frame(ticker)
+        if start is not None: return df[df.index >= pd.Timestamp(start)].copy()
+        begin = period_start(period or "1mo", df.index[-1])
+        return (df if begin is None else df[df.index > begin]).copy()
+
+    def download(self, tickers, period=None, start=None, group_by=None, **kwargs):
+        calls.hit("prices.download")
+        if isinstance(tickers, str) and not group_by: return self._slice(tickers, period, start)
+        names = [tickers] if isinstance(tickers, str) else list(tickers)
+        panel = pd.concat({t: self._slice(t, period, start) for t in names}, axis=1, names=["Ticker", "Price"])
+        return panel if group_by == "ticker" else panel.swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+    def history(self, ticker, period="1mo"):
+        calls.hit("prices.history")
+        return self._slice(ticker, period, None)
+
+    def info(self, ticker):
+        calls.hit("prices.info")
+        s = _seed(ticker)
+        close = float(self._frame(ticker)['Close'].iloc[-1])
+        return {"priceToBook": 0.5 + s % 40 / 10, "earningsQuarterlyGrowth": (s % 50 - 10) / 100, "sector": f"Sector{s % 8}",
+                "dividendRate": close * (s % 8) / 100, "previousClose": close, "dividendYield": (s % 8) / 100,
+                "exDividendDate": int(time.time()) + 86400 * (s % 60), "fiftyTwoWeekLow": close * 0.8}
+
+    def dividends(self, ticker):
+        calls.hit("prices.dividends")
+        idx = self._frame(ticker).index
+        dates = idx[idx.month == 5][::21][:HISTORY_YEARS] # Sekitar satu pembagian per tahun
+        amounts = np.round(np.linspace(10, 10 + _seed(ticker) % 30, len(dates)), 2)
+        return pd.Series(amounts, index=dates, name="Dividends")
+
+class StubBroker(BrokerProvider):
+    def broker_summary(self, symbol, target_date, investor="FOREIGN"):
+        calls.hit("broker.broker_summary")
+        s = _seed(f"{symbol}{target_date}")
+        return [{"side": "BUY", "value": 1e9 + s % 1e9, "lot": 10000 + s % 5000},
+                {"side": "SELL", "value": 8e8 + s % 7e8, "lot": 9000 + s % 4000}]
+
+def stub_parse_feed(url, **kwargs):
+    """Pengganti feedparser.parse: 5 berita tiruan per query."""
+    import feedparser
+    calls.hit("feedparser.parse")
+    now = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())
+    entries = [feedparser.FeedParserDict(title=f"Laba emiten naik {i * 7}% - Media {i}", link=f"https://example.com/{_seed(url)}/{i}",
+                                         published=now, source=feedparser.FeedParserDict(title=f"Media {i}"))
+               for i in range(5)]
+    return feedparser.FeedParserDict(entries=entries, status=200)
+
+class CountedStorage:
+    """Proksi penyimpanan: hitung setiap execute() (1 round trip database) per tabel/RPC."""
+    def __init__(self, inner):
+        self._inner = inner
+        self.auth = inner.auth
+
+    def table(self, name):
+        query = self._inner.table(name)
+        original = query.execute
+        def execute():
+            calls.hit(f"storage.{name}")
+            return original()
+        query.execute = execute
+        return query
+
+    def rpc(self, name, params=None):
+        query = self._inner.rpc(name, params)
+        original = query.execute
+        def execute():
+            calls.hit(f"storage.rpc.{name}")
+            return original()
+        query.execute = execute
+        return query
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+def install(providers_module):
+    """Ganti pabrik penyedia di modul providers sebelum app.py dijalankan (AppTest berbagi proses yang sama)."""
+    real_storage = providers_module.get_storage
+    providers_module.get_price_provider = lambda config: SyntheticPrices()
+    providers_module.get_broker_provider = lambda config: StubBroker()
+    providers_module.get_feed_parser = lambda config: stub_parse_feed
+    providers_module.get_storage = lambda config: CountedStorage(real_storage(config))
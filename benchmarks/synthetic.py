@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# =====================================================================
+# DATA OHLCV SINTETIS UNTUK BENCHMARK (TANPA JARINGAN)
+# Harga mengikuti random walk log-normal dengan seed tetap per simbol,
+# jadi setiap run menghasilkan data yang sama persis.
+# =====================================================================
+TRADING_DAYS = 252
+START_DATE = "2005-01-03"
+
+def synthetic_ohlcv(n_days, seed=0, start_price=1000.0, vol=0.02):
+    """Satu DataFrame OHLCV harian (hari bursa Senin-Jumat) dengan relasi High >= max(Open, Close) >= Low."""
+    rng = np.random.default_rng(seed)
+    log_ret = rng.normal(0.0003, vol, n_days)
+    close = start_price * np.exp(np.cumsum(log_ret))
+    open_ = close * np.exp(rng.normal(0, vol / 3, n_days))
+    spread = np.abs(rng.normal(0, vol / 2, (2, n_days)))
+    high = np.maximum(open_, close) * (1 + spread[0])
+    low = np.minimum(open_, close) * (1 - spread[1])
+    volume = rng.lognormal(15, 0.6, n_days).round()
+
+    index = pd.bdate_range(START_DATE, periods=n_days, name="Date")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+def synthetic_universe(n_symbols, years, seed=0):
+    """Generator (simbol, DataFrame) agar 1.000 simbol x 20 tahun tidak harus ada di memori sekaligus."""
+    n_days = int(years * TRADING_DAYS)
+    for i in range(n_symbols):
+        yield f"SYN{i:04d}", synthetic_ohlcv(n_days, seed=seed * 100003 + i, start_price=500.0 + 10 * (i % 100))
+
+def synthetic_benchmark(years, seed=0):
+    """Indeks acuan (pengganti IHSG) dengan kolom IHSG_Close seperti get_ihsg_data."""
+    df = synthetic_ohlcv(int(years * TRADING_DAYS), seed=seed * 100003 + 99991, start_price=7000.0, vol=0.01)
+    return df[['Close']].rename(columns={'Close': 'IHSG_Close'})
+
+def synthetic_quant_rows(n_symbols, seed=0, sectors=11):
+    """Baris mentah seperti raw_data_list di fetcher.run_screener (input ranking cross-sectional)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "symbol": [f"SYN{i:04d}" for i in range(n_symbols)],
+        "mom_6m": rng.normal(0.05, 0.25, n_symbols),
+        "vol_6m": np.abs(rng.normal(0.35, 0.1, n_symbols)),
+        "bp_ratio": np.abs(rng.normal(0.6, 0.3, n_symbols)),
+        "ret_20": rng.normal(0.0, 0.08, n_symbols),
+        "sector": [f"Sector{j}" for j in rng.integers(0, sectors, n_symbols)],
+        "base_score": rng.uniform(0, 8, n_symbols),
+    })
@@ -0,0 +1,131 @@
+import atexit
+import functools
+import gzip
+import hashlib
+import os
+import pickle
+import threading
+from datetime import datetime, timezone
+
+# =====================================================================
+# KASET REKAM/PUTAR ULANG TRAFIK JARINGAN (YAHOO, GOAPI, RSS)
+# Mode 'record': panggilan asli dijalankan, hasilnya (atau error-nya) disimpan.
+# Mode 'replay': hasil diputar ulang dari kaset TANPA jaringan; panggilan yang tidak terekam = CassetteMiss.
+# Format: satu file pickle terkompresi gzip {kunci -> hasil ter-pickle}, kunci = hash(nama, argumen).
+# =====================================================================
+FORMAT_VERSION = 1
+IGNORED_KWARGS = ("progress", "threads", "timeout") # Tidak mengubah isi respons
+
+class CassetteMiss(KeyError):
+    pass
+
+def _normalize(value):
+    if isinstance(value, (list, tuple)): return tuple(_normalize(v) for v in value)
+    if isinstance(value, (set, frozenset)): return tuple(sorted(_normalize(v) for v in value))
+    if isinstance(value, dict): return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+class Cassette:
+    def __init__(self, path, mode="replay"):
+        if mode not in ("record", "replay"): raise ValueError(f"Mode kaset tidak dikenal: {mode}")
+        self.path = path
+        self.mode = mode
+        self.entries = {}   # kunci -> (nama, status 'ok'/'error', bytes pickle)
+        self.hits = self.misses = self.recorded = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        if os.path.exists(path):
+            with gzip.open(path, "rb") as f: payload = pickle.load(f)
+            if payload.get("version") != FORMAT_VERSION: raise ValueError(f"Versi kaset {path} tidak didukung")
+            self.entries = payload["entries"]
+        elif mode == "replay":
+            raise FileNotFoundError(f"Kaset tidak ditemukan: {path} (rekam dulu dengan CASSETTE_MODE=record)")
+        if mode == "record": atexit.register(self.save)
+
+    def key(self, name, args, kwargs, ignore=()):
+        kwargs = {k: v for k, v in kwargs.items() if k not in IGNORED_KWARGS and k not in ignore}
+        raw = repr((name, _normalize(args), _normalize(kwargs)))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def call(self, name, func, args=(), kwargs=None, ignore=()):
+        kwargs = kwargs or {}
+        k = self.key(name, args, kwargs, ignore)
+        entry = self.entries.get(k)
+        if entry is not None and (self.mode == "replay" or entry[1] == "ok"):
+            self.hits += 1
+            status, blob = entry[1], entry[2]
+            value = pickle.loads(blob) # Salinan baru setiap kali: pemanggil bebas memodifikasi DataFrame
+            if status == "error": raise value
+            return value
+
+        if self.mode == "replay":
+            self.misses += 1
+            raise CassetteMiss(f"{name}{args} tidak ada di kaset {os.path.basename(self.path)}")
+
+        try:
+            value = func(*args, **kwargs)
+        except Exception as e:
+            self._store(k, name, "error", e if _picklable(e) else RuntimeError(str(e)))
+            raise
+        self._store(k, name, "ok", value)
+        return value
+
+    def _store(self, k, name, status, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.entries[k] = (name, status, blob)
+            self.recorded += 1
+            self._dirty = True
+
+    def wrap(self, name, func, ignore=()):
+        """Bungkus callable apa pun: cassette.wrap("feedparser.parse", feedparser.parse)."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(name, func, args, kwargs, ignore)
+        return wrapper
+
+    def save(self):
+        with self._lock:
+            if not self._dirty: return
+            if os.path.dirname(self.path): os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                pickle.dump({"version": FORMAT_VERSION, "saved_at": datetime.now(timezone.utc).isoformat(),
+                             "entries": self.entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def stats(self):
+        by_name = {}
+        for name, _, blob in self.entries.values():
+            n, size = by_name.get(name, (0, 0))
+            by_name[name] = (n + 1, size + len(blob))
+        return {"mode": self.mode, "entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "recorded": self.recorded, "by_name": {k: {"count": n, "kb": round(s / 1024, 1)} for k, (n, s) in by_name.items()}}
+
+def _picklable(obj):
+    try:
+        pickle.dumps(obj)
+        return True
+    except Exception: return False
+
+class Recorded:
+    """Proksi penyedia (PriceProvider/BrokerProvider): setiap metode publik lewat kaset dengan nama '{prefix}.{metode}'."""
+    def __init__(self, inner, cassette, prefix):
+        self._inner = inner
+        self._cassette = cassette
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name.startswith("_") or not callable(attr): return attr
+        return self._cassette.wrap(f"{self._prefix}.{name}", attr)
+
+_open = {}
+_open_lock = threading.Lock()
+
+def open_cassette(path, mode):
+    """Satu objek Cassette per file per proses (dipakai bersama semua penyedia)."""
+    with _open_lock:
+        if path not in _open: _open[path] = Cassette(path, mode)
+        return _open[path]
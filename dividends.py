@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from providers import YahooPrices
+
+# =====================================================================
+# PEMINDAI DIVIDEN - DIPAKAI BERSAMA OLEH fetcher.py (tabel dividend_calendar) & app.py (fallback live)
+# =====================================================================
+MAX_WORKERS = 16      # Jumlah ticker yang ditarik bersamaan (I/O bound, aman di atas jumlah core)
+MAX_YIELD = 40        # Yield di atas ini hampir pasti data rusak / dividen spesial
+RECENT_DIVIDENDS = 12 # Jumlah pembagian dividen terakhir yang ikut disimpan
+
+def parse_dividend_row(symbol, market, info, dividends=None):
+    """Meringkas yf.Ticker.info (+ histori dividen) menjadi satu baris kalender dividen, atau None jika tidak valid."""
+    div_rate = info.get('dividendRate', 0)
+    price = info.get('previousClose', 1)
+    div_yield_raw = info.get('dividendYield', 0)
+    ex_date_ts = info.get('exDividendDate', None)
+
+    if pd.notna(div_rate) and div_rate and div_rate > 0 and pd.notna(price) and price and price > 0:
+        calculated_yield = (div_rate / price) * 100
+    elif pd.notna(div_yield_raw) and div_yield_raw and div_yield_raw > 0:
+        calculated_yield = (div_yield_raw * 100) if div_yield_raw < 1 else div_yield_raw
+    else: calculated_yield = 0
+
+    if not (0 < calculated_yield <= MAX_YIELD): return None
+
+    recent = []
+    if dividends is not None and len(dividends):
+        tail = dividends.tail(RECENT_DIVIDENDS)
+        recent = [{"date": d.strftime('%Y-%m-%d'), "amount": round(float(v), 4)} for d, v in zip(tail.index, tail.values)]
+
+    return {
+        "symbol": symbol.replace(".JK", ""), "market": market,
+        "price": float(price) if pd.notna(price) else None,
+        "dividend_rate": float(div_rate) if pd.notna(div_rate) and div_rate else None,
+        "yield_pct": round(float(calculated_yield), 2),
+        "ex_date": datetime.fromtimestamp(ex_date_ts, timezone.utc).strftime('%Y-%m-%d') if ex_date_ts else None,
+        "low_52w": float(info.get('fiftyTwoWeekLow') or 0),
+        "recent_dividends": recent,
+    }
+
+def fetch_dividend_row(ticker, market, with_history=True, prices=None):
+    prices = prices or YahooPrices()
+    try:
+        return parse_dividend_row(ticker, market, prices.info(ticker), prices.dividends(ticker) if with_history else None)
+    except: return None
+
+def scan_dividends(tickers, market, with_history=True, max_workers=MAX_WORKERS, prices=None):
+    """Tarik data dividen seluruh ticker secara paralel (thread pool), urut yield tertinggi."""
+    if not tickers: return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as pool:
+        rows = list(pool.map(lambda t: fetch_dividend_row(t, market, with_history, prices), tickers))
+    return sorted([r for r in rows if r], key=lambda r: r['yield_pct'], reverse=True)
+
+# =====================================================================
+# HISTORI DIVIDEN & ANALITIK (TRAILING YIELD, STREAK, KONSISTENSI, YIELD-ON-COST)
+# =====================================================================
+CONSISTENCY_YEARS = 10 # Jendela penilaian konsistensi pembagian dividen
+
+def fetch_dividend_history(ticker, prices=None):
+    """Seluruh histori dividen (tanggal ex-date -> nominal per lembar) dari penyedia harga (default yfinance)."""
+    prices = prices or YahooPrices()
+    try:
+        divs = prices.dividends(ticker)
+        if divs is None or divs.empty: return pd.Series(dtype=float)
+        divs.index = pd.to_datetime(divs.index).tz_localize(None).normalize()
+        return divs[divs > 0]
+    except: return pd.Series(dtype=float)
+
+def scan_dividend_histories(tickers, max_workers=MAX_WORKERS, prices=None):
+    """Histori dividen banyak ticker secara paralel -> {ticker: Series}."""
+    if not tickers: return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as pool:
+        return dict(zip(tickers, pool.map(lambda t: fetch_dividend_history(t, prices), tickers)))
+
+def dividend_metrics(history, as_of=None):
+    """
+    Analitik dividen per saham dari tabel panjang histori (kolom: symbol, ex_date, amount), dihitung vectorized.
+    - ttm_dividend : total dividen 12 bulan terakhir (dasar trailing yield & yield-on-cost)
+    - growth_streak: jumlah tahun berturut-turut dividen tahunan tidak turun (sampai tahun penuh terakhir)
+    - consistency  : % tahun yang membagi dividen dalam CONSISTENCY_YEARS tahun penuh terakhir
+    """
+    cols = ['ttm_dividend', 'growth_streak', 'consistency', 'last_ex_date']
+    if history is None or len(history) == 0: return pd.DataFrame(columns=cols)
+    as_of = pd.Timestamp(as_of or datetime.now(timezone.utc).date())
+    hist = history.assign(ex_date=pd.to_datetime(history['ex_date']), amount=history['amount'].astype(float))
+
+    ttm = hist[hist['ex_date'] > as_of - pd.DateOffset(years=1)].groupby('symbol')['amount'].sum()
+
+    # Matriks saham x tahun penuh (tahun berjalan belum lengkap sehingga tidak ikut dinilai)
+    last_full = as_of.year - 1
+    years = range(last_full - CONSISTENCY_YEARS + 1, last_full + 1)
+    annual = hist.groupby(['symbol', hist['ex_date'].dt.year])['amount'].sum().unstack(fill_value=0.0)
+    annual = annual.reindex(columns=years, fill_value=0.0)
+    consistency = (annual > 0).mean(axis=1) * 100
+
+    # Streak: hitung mundur dari tahun terakhir selama dividen > 0 dan tidak turun dibanding tahun sebelumnya
+    vals = annual.to_numpy()
+    ok = (vals[:, 1:] >= vals[:, :-1]) & (vals[:, 1:] > 0) & (vals[:, :-1] > 0)
+    broken = ~ok[:, ::-1]
+    streak = np.where(broken.any(axis=1), broken.argmax(axis=1), ok.shape[1])
+
+    out = pd.DataFrame({
+        'ttm_dividend': ttm.reindex(annual.index).fillna(0.0),
+        'growth_streak': pd.Series(streak, index=annual.index),
+        'consistency': consistency,
+        'last_ex_date': hist.groupby('symbol')['ex_date'].max().dt.strftime('%Y-%m-%d'),
+    })
+    return out[cols]
+
+def yield_on_cost(metrics, portfolio):
+    """Yield-on-cost (%) per posisi: dividen 12 bulan terakhir / harga beli rata-rata. portfolio: kolom symbol, avg_price."""
+    merged = portfolio.merge(metrics[['ttm_dividend']], left_on='symbol', right_index=True, how='left')
+    merged['ttm_dividend'] = merged['ttm_dividend'].fillna(0.0)
+    merged['yoc_pct'] = np.where(merged['avg_price'] > 0, merged['ttm_dividend'] / merged['avg_price'] * 100, 0.0)
+    return merged
@@ -1,47 +1,35 @@
 import os
 import numpy as np
-import yfinance as yf
 import pandas as pd
 import pandas_ta as ta
-import requests
 from datetime import datetime, timedelta, timezone
-from supabase import create_client, Client
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler
+from seasonality import compute_seasonality_table
+from dividends import scan_dividends, scan_dividend_histories
+from api_registry import ApiRegistry
+from providers import load_config, get_storage, get_price_provider, get_broker_provider
+from technicals import check_candlestick_patterns, knn_probability_up, cross_sectional_rank
+import perf
+from perf import timed, timer
 
 # --- 1. SETUP & KUNCI RAHASIA ---
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-IDX_API_KEY = os.getenv("IDX_API_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# SUPABASE_URL, SUPABASE_KEY, IDX_API_KEY + pilihan backend (PRICE_PROVIDER, BROKER_PROVIDER, STORAGE_BACKEND) dari env
+CONFIG = load_config()
+supabase = get_storage(CONFIG)
+prices = get_price_provider(CONFIG)
+broker = get_broker_provider(CONFIG)
 
 # DAFTAR SAHAM
 SHARIA_STOCKS = ["ADRO", "AKRA", "ANTM", "BRIS", "BRPT", "CPIN", "EXCL", "HRUM", "ICBP", "INCO", "INDF", "INKP", "INTP", "ITMG", "KLBF", "MAPI", "MBMA", "MDKA", "MEDC", "PGAS", "PGEO", "PTBA", "SMGR", "TLKM", "UNTR", "UNVR", "ACES", "AMRT", "ASII", "TPIA"]
+# Lapis 2 (Midcap Syariah), dipakai untuk kalender dividen
+SHARIA_MIDCAP_STOCKS = ["BRMS", "ELSA", "ENRG", "PTRO", "SIDO", "MYOR", "ESSA", "CTRA", "BSDE", "SMRA", "PWON", "ARTO", "BTPS", "MIKA", "HEAL", "SILO", "MAPA", "AUTO", "SMSM", "TAPG", "DSNG", "LSIP", "AALI", "WIKA", "PTPP", "TOTL", "NRCA", "SCMA", "MNCN", "ERAA"]
 # 20 Saham Raksasa Wall Street
 US_STOCKS = ["AAPL", "MSFT", "NVDA", "AMZN", "META", "GOOGL", "TSLA", "AVGO", "LLY", "JPM", "V", "MA", "UNH", "HD", "PG", "COST", "JNJ", "NFLX", "AMD", "CRM"]
 
 # --- 2. FUNGSI TEKNIKAL ---
-def check_candlestick_patterns(curr, prev):
-    score = 0; patterns = []
-    try:
-        body = abs(curr['Close'] - curr['Open'])
-        upper = curr['High'] - max(curr['Close'], curr['Open'])
-        lower = min(curr['Close'], curr['Open']) - curr['Low']
-        rsi = curr.get('Rsi', 50)
-        lower_bb = curr.get('BBL_20_2.0', 0)
-        is_valid_support = (rsi < 40) or (curr['Low'] <= lower_bb * 1.01)
-
-        if (lower > 2 * body) and (upper < body):
-            if is_valid_support: score += 1; patterns.append("🔨 Hammer")
-        if (prev['Close'] < prev['Open']) and (curr['Close'] > curr['Open']): 
-            if (curr['Open'] < prev['Close']) and (curr['Close'] > prev['Open']):
-                if is_valid_support: score += 1.5; patterns.append("🦁 Engulfing")
-    except: pass
-    return score, patterns
-
+@timed()
 def get_benchmark_data(ticker):
     try:
-        bm = yf.download(ticker, period="1y", auto_adjust=True, progress=False)
+        bm = prices.download(ticker, period="1y", auto_adjust=True, progress=False)
         if isinstance(bm.columns, pd.MultiIndex): bm.columns = bm.columns.get_level_values(0)
         bm.columns = [str(c).capitalize() for c in bm.columns]
         return bm[['Close']].rename(columns={'Close': 'BM_Close'})
@@ -51,13 +39,14 @@ def get_target_date(df):
     return df.index[-1].strftime('%Y-%m-%d')
 
 # --- 3. MESIN UTAMA ---
+@timed()
 def run_screener(market_name, stock_list, benchmark_ticker, table_name, use_goapi=False):
     print(f"\n[{datetime.now(timezone.utc)}] 🚀 Memulai Scan & AI Predictor untuk {market_name}...")
     
     bm_df = get_benchmark_data(benchmark_ticker)
     
     tickers = [f"{s}.JK" if use_goapi else s for s in stock_list]
-    price_data = yf.download(tickers, period="2y", group_by='ticker', auto_adjust=True, progress=False, threads=True) 
+    price_data = prices.download(tickers, period="2y", group_by='ticker', auto_adjust=True, progress=False, threads=True) 
 
     raw_data_list = []
 
@@ -114,21 +103,7 @@ def run_screener(market_name, stock_list, benchmark_ticker, table_name, use_goap
                 df['BM_Ret_20'] = (df['BM_Close'] - df['BM_Close'].shift(20)) / df['BM_Close'].shift(20)
 
             # Fitur AI (KNN)
-            prob_up = 0.5
-            try:
-                df['Target_Besok'] = (df['Close'].shift(-1) > df['Close']).astype(int)
-                ml_df = df[['Rsi', 'CMF', 'Ret_1', 'Target_Besok']].dropna()
-                if len(ml_df) > 100: 
-                    X = ml_df[['Rsi', 'CMF', 'Ret_1']]
-                    y = ml_df['Target_Besok']
-                    scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
-                    knn = KNeighborsClassifier(n_neighbors=5)
-                    knn.fit(X_scaled, y)
-                    today_features = pd.DataFrame({'Rsi': [df['Rsi'].iloc[-1]], 'CMF': [df['CMF'].iloc[-1]], 'Ret_1': [df['Ret_1'].iloc[-1]]})
-                    today_scaled = scaler.transform(today_features)
-                    prob_up = knn.predict_proba(today_scaled)[0][1]
-            except: pass
+            prob_up = knn_probability_up(df)
 
             curr, prev = df.iloc[-1], df.iloc[-2]
             close, volume, atr = curr['Close'], curr['Volume'], curr.get('ATR', 0)
@@ -181,7 +156,7 @@ def run_screener(market_name, stock_list, benchmark_ticker, table_name, use_goap
             else: wyckoff = "Markdown" if close < curr.get('SMA20', 0) else "Accumulation"
 
             try:
-                info = yf.Ticker(t).info
+                info = prices.info(t)
                 pbv = info.get('priceToBook', 0)
                 bp_ratio = (1 / pbv) if (pd.notna(pbv) and pbv > 0) else 0
                 sector = info.get('sector', 'Unknown') 
@@ -206,13 +181,7 @@ def run_screener(market_name, stock_list, benchmark_ticker, table_name, use_goap
     # Ranking Cross-Sectional Tetap Utuh
     results = []
     if raw_data_list:
-        df_quant = pd.DataFrame(raw_data_list)
-        df_quant['mom_rank'] = df_quant['mom_6m'].rank(pct=True)
-        df_quant['vol_rank'] = df_quant['vol_6m'].rank(ascending=False, pct=True) 
-        df_quant['bp_rank'] = df_quant['bp_ratio'].rank(pct=True)
-        df_quant['sector_mean_ret'] = df_quant.groupby('sector')['ret_20'].transform('mean')
-        df_quant['sector_diff'] = df_quant['ret_20'] - df_quant['sector_mean_ret']
-        df_quant['mr_rank'] = df_quant['sector_diff'].rank(ascending=True, pct=True)
+        df_quant = cross_sectional_rank(pd.DataFrame(raw_data_list))
 
         for index, row in df_quant.iterrows():
             symbol = row['symbol']
@@ -240,18 +209,16 @@ def run_screener(market_name, stock_list, benchmark_ticker, table_name, use_goap
             # Logika GoAPI HANYA nyala untuk saham Indonesia
             if use_goapi:
                 try:
-                    url_broker = f"https://api.goapi.io/stock/idx/{symbol}/broker_summary?date={target_date}&investor=FOREIGN"
-                    res_broker = requests.get(url_broker, headers={'accept': 'application/json', 'X-API-KEY': IDX_API_KEY}, timeout=10)
-                    if res_broker.status_code == 200:
-                        data = res_broker.json().get('data', {}).get('results', [])
-                        buy_val = sum(b['value'] for b in data if b['side'] == 'BUY')
-                        buy_lot = sum(b['lot'] for b in data if b['side'] == 'BUY')
-                        sell_val = sum(b['value'] for b in data if b['side'] == 'SELL')
-                        net_foreign = buy_val - sell_val
-                        if buy_lot > 0: avg_buy_price = buy_val / (buy_lot * 100)
-                        if (close * volume) > 0: 
-                            power_pct = (abs(net_foreign) / (close * volume)) * 100
-                            if power_pct > 100: power_pct = 100.0  # Capping maksimal 100%
+                    with timer("goapi.broker_summary"):
+                        data = broker.broker_summary(symbol, target_date, investor="FOREIGN")
+                    buy_val = sum(b['value'] for b in data if b['side'] == 'BUY')
+                    buy_lot = sum(b['lot'] for b in data if b['side'] == 'BUY')
+                    sell_val = sum(b['value'] for b in data if b['side'] == 'SELL')
+                    net_foreign = buy_val - sell_val
+                    if buy_lot > 0: avg_buy_price = buy_val / (buy_lot * 100)
+                    if (close * volume) > 0: 
+                        power_pct = (abs(net_foreign) / (close * volume)) * 100
+                        if power_pct > 100: power_pct = 100.0  # Capping maksimal 100%
                 except: pass
                 
                 # Syarat Lolos Asing (Hanya Berlaku di Indo)
@@ -285,34 +252,141 @@ def run_screener(market_name, stock_list, benchmark_ticker, table_name, use_goap
         })
         print(f"⚠️ Mode CASH IS KING aktif untuk {market_name}.")
 
-    try:
-        supabase.table(table_name).delete().neq('id', 0).execute()
-    except: pass
+    with timer("supabase.write_screener"):
+        try:
+            supabase.table(table_name).delete().neq('id', 0).execute()
+        except: pass
 
-    supabase.table(table_name).insert(results).execute()
+        supabase.table(table_name).insert(results).execute()
     print(f"[{datetime.now(timezone.utc)}] 🎉 Sukses menyimpan ke tabel: {table_name}")
 
+# --- 3b. PRA-HITUNG TABEL MUSIMAN (SEASONALITY) ---
+@timed()
+def update_seasonality_tables(stock_list, use_goapi=False):
+    """Menghitung ulang tabel musiman seluruh universe (1x download massal) lalu upsert ke 'seasonality_stats'."""
+    print(f"[{datetime.now(timezone.utc)}] 🗓️ Menghitung tabel musiman untuk {len(stock_list)} saham...")
+    tickers = [f"{s}.JK" if use_goapi else s for s in stock_list]
+    price_data = prices.download(tickers, period="10y", group_by='ticker', auto_adjust=True, progress=False, threads=True)
+    updated_at = datetime.now(timezone.utc).isoformat()
+
+    records = []
+    for t in tickers:
+        try:
+            df = price_data[t].copy() if len(tickers) > 1 else price_data.copy()
+            if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
+            df.columns = [str(c).capitalize() for c in df.columns]
+            df = df.loc[:, ~df.columns.duplicated()].dropna(subset=['Close'])
+
+            table = compute_seasonality_table(df)
+            if table is None: continue
+            records.append({"symbol": t.replace(".JK", ""), "market": "IDX" if use_goapi else "US", "updated_at": updated_at, **table})
+        except Exception as e:
+            print(f"⚠️ Gagal menghitung musiman {t}: {e}")
+
+    try:
+        if records: supabase.table('seasonality_stats').upsert(records, on_conflict='symbol,market').execute()
+        print(f"[{datetime.now(timezone.utc)}] 🎉 {len(records)} tabel musiman tersimpan.")
+    except Exception as e:
+        print(f"❌ Gagal menyimpan tabel musiman: {e}")
+
+# --- 3c. KALENDER DIVIDEN (DIVIDEND HUNTER) ---
+@timed()
+def update_dividend_calendar(stock_list, use_goapi=False):
+    """Tarik info dividen seluruh universe secara paralel lalu upsert ke 'dividend_calendar' (dibaca Dividend Hunter)."""
+    print(f"[{datetime.now(timezone.utc)}] 💰 Memindai kalender dividen untuk {len(stock_list)} saham...")
+    market = "IDX" if use_goapi else "US"
+    tickers = [f"{s}.JK" if use_goapi else s for s in stock_list]
+    updated_at = datetime.now(timezone.utc).isoformat()
+
+    try:
+        records = [{**r, "updated_at": updated_at} for r in scan_dividends(tickers, market, prices=prices)]
+        if records:
+            supabase.table('dividend_calendar').upsert(records).execute()
+            # Saham yang tidak lagi membagi dividen dihapus agar tidak muncul di kalender
+            stale = sorted(set(stock_list) - {r['symbol'] for r in records})
+            if stale: supabase.table('dividend_calendar').delete().eq('market', market).in_('symbol', stale).execute()
+        print(f"[{datetime.now(timezone.utc)}] 🎉 {len(records)} saham pembagi dividen tersimpan.")
+    except Exception as e:
+        print(f"❌ Gagal menyimpan kalender dividen: {e}")
+
+@timed()
+def update_dividend_history(stock_list, use_goapi=False):
+    """Tambahkan HANYA pembagian dividen yang lebih baru dari ex-date terakhir tersimpan ke 'dividend_history'."""
+    market = "IDX" if use_goapi else "US"
+    tickers = [f"{s}.JK" if use_goapi else s for s in stock_list]
+
+    try:
+        res = supabase.table('dividend_history_latest').select('symbol, last_ex_date').eq('market', market).execute()
+        last_known = {r['symbol']: r['last_ex_date'] for r in res.data}
+
+        records = []
+        for t, divs in scan_dividend_histories(tickers, prices=prices).items():
+            sym = t.replace(".JK", "")
+            if sym in last_known: divs = divs[divs.index > pd.Timestamp(last_known[sym])]
+            records.extend({"symbol": sym, "market": market, "ex_date": d.strftime('%Y-%m-%d'), "amount": float(v)} for d, v in divs.items())
+
+        for i in range(0, len(records), 500):
+            supabase.table('dividend_history').upsert(records[i:i + 500]).execute()
+        print(f"[{datetime.now(timezone.utc)}] 🎉 {len(records)} pembagian dividen baru tersimpan.")
+    except Exception as e:
+        print(f"❌ Gagal memperbarui histori dividen: {e}")
+
+BACKTEST_CACHE_MAX_AGE_DAYS = 7 # Lebih lama dari libur bursa terpanjang biasa, hasil yang masih dipakai tidak ikut terhapus
+
+def prune_backtest_cache(max_age_days=BACKTEST_CACHE_MAX_AGE_DAYS):
+    """Hapus hasil backtest yang bar terakhirnya sudah lewat beberapa hari (saham yang tidak pernah dibacktest ulang)."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime('%Y-%m-%d')
+    res = supabase.table('backtest_cache').delete().lt('last_bar_date', cutoff).execute()
+    print(f"[{datetime.now(timezone.utc)}] 🧹 {len(res.data or [])} hasil backtest kedaluwarsa dihapus (bar terakhir < {cutoff}).")
+
 # --- 4. EKSEKUSI JADWAL CRON ---
 if __name__ == "__main__":
     import os
     
+    # Bersihkan kunci buku tamu API yang sudah kedaluwarsa
+    try: ApiRegistry(supabase).prune()
+    except Exception as e: print(f"⚠️ Gagal membersihkan api_registry: {e}")
+    try: prune_backtest_cache()
+    except Exception as e: print(f"⚠️ Gagal membersihkan backtest_cache: {e}")
+
     current_utc_hour = datetime.now(timezone.utc).hour
     is_manual_run = os.getenv("GITHUB_EVENT_NAME") == "workflow_dispatch"
 
     if is_manual_run:
         print("🚨 Tombol MANUAL ditekan! Mengeksekusi Kedua Pasar secara berurutan...")
         run_screener("JII30 (Indonesia)", SHARIA_STOCKS, "^JKSE", "jii30_daily_data", use_goapi=True)
+        update_seasonality_tables(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
+        update_dividend_calendar(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
+        update_dividend_history(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
         run_screener("Wall Street (US)", US_STOCKS, "^GSPC", "us_daily_data", use_goapi=False)
+        update_seasonality_tables(US_STOCKS, use_goapi=False)
+        update_dividend_calendar(US_STOCKS, use_goapi=False)
+        update_dividend_history(US_STOCKS, use_goapi=False)
 
     elif 10 <= current_utc_hour <= 15:
         print("🕒 Mode Auto Shift 1 (Malam): Mengeksekusi Pasar Indonesia...")
         run_screener("JII30 (Indonesia)", SHARIA_STOCKS, "^JKSE", "jii30_daily_data", use_goapi=True)
+        update_seasonality_tables(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
+        update_dividend_calendar(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
+        update_dividend_history(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
 
     elif 20 <= current_utc_hour <= 23 or 0 <= current_utc_hour <= 2:
         print("🕒 Mode Auto Shift 2 (Pagi): Mengeksekusi Pasar Wall Street...")
         run_screener("Wall Street (US)", US_STOCKS, "^GSPC", "us_daily_data", use_goapi=False)
+        update_seasonality_tables(US_STOCKS, use_goapi=False)
+        update_dividend_calendar(US_STOCKS, use_goapi=False)
+        update_dividend_history(US_STOCKS, use_goapi=False)
 
     else:
         print("🕒 Mode Fallback: Mengeksekusi Kedua Pasar...")
         run_screener("JII30 (Indonesia)", SHARIA_STOCKS, "^JKSE", "jii30_daily_data", use_goapi=True)
-        run_screener("Wall Street (US)", US_STOCKS, "^GSPC", "us_daily_data", use_goapi=False)
\ No newline at end of file
+        update_seasonality_tables(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
+        update_dividend_calendar(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
+        update_dividend_history(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS, use_goapi=True)
+        run_screener("Wall Street (US)", US_STOCKS, "^GSPC", "us_daily_data", use_goapi=False)
+        update_seasonality_tables(US_STOCKS, use_goapi=False)
+        update_dividend_calendar(US_STOCKS, use_goapi=False)
+        update_dividend_history(US_STOCKS, use_goapi=False)
+
+    # Ringkasan latensi job ini (disimpan di log GitHub Actions untuk perbandingan antar malam)
+    print(perf.export_json())
@@ -0,0 +1,86 @@
+import re
+import zlib
+
+import numpy as np
+
+# =====================================================================
+# DEDUPLIKASI BERITA SINDIKASI (MinHash + LSH)
+# Judul yang sama/mirip dari banyak media digabung jadi satu klaster,
+# sehingga satu cerita dinilai sekali dan tidak menggelembungkan skor.
+# =====================================================================
+NUM_PERM = 64          # Panjang tanda tangan MinHash
+BANDS = 16             # LSH: 16 band x 4 baris -> ambang kemiripan ~0.5
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5       # Shingle 5 karakter
+SIMILARITY = 0.5       # Kandidat LSH dikonfirmasi dengan estimasi Jaccard
+CHUNK_DOCS = 2000      # Batas memori saat hashing massal
+
+_PRIME = np.uint64(2147483647) # Mersenne 2^31-1 agar a*x tidak overflow di uint64
+_rng = np.random.default_rng(20240410)
+_A = _rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)
+
+def normalize_title(title):
+    """Huruf kecil, buang nama media di ujung (" - CNBC Indonesia"), tanda baca, dan spasi ganda."""
+    title = str(title).lower()
+    if " - " in title: title = title.rsplit(" - ", 1)[0]
+    title = re.sub(r"[^0-9a-z]+", " ", title)
+    return re.sub(r"\s+", " ", title).strip()
+
+def _shingles(text):
+    if len(text) <= SHINGLE_SIZE: return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def minhash_signatures(titles):
+    """Tanda tangan MinHash (N x NUM_PERM) untuk seluruh judul, dihitung vectorized per potongan."""
+    sig = np.empty((len(titles), NUM_PERM), dtype=np.uint64)
+    for start in range(0, len(titles), CHUNK_DOCS):
+        chunk = titles[start:start + CHUNK_DOCS]
+        hashes, owners = [], []
+        for j, title in enumerate(chunk):
+            sh = [zlib.crc32(s.encode("utf-8")) for s in _shingles(normalize_title(title))]
+            hashes.extend(sh); owners.extend([j] * len(sh))
+        x = np.asarray(hashes, dtype=np.uint64) % _PRIME
+        perm = (x[:, None] * _A[None, :] + _B[None, :]) % _PRIME   # (total shingle x NUM_PERM)
+        bounds = np.flatnonzero(np.r_[True, np.diff(owners) != 0])
+        sig[start:start + len(chunk)] = np.minimum.reduceat(perm, bounds, axis=0)
+    return sig
+
+def cluster_near_duplicates(titles, threshold=SIMILARITY):
+    """
+    Label klaster untuk setiap judul (judul pertama di klaster menjadi wakil).
+    LSH banding membuat jumlah perbandingan kira-kira linear terhadap jumlah judul.
+    """
+    n = len(titles)
+    if n == 0: return np.array([], dtype=int)
+    sig = minhash_signatures(list(titles))
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]; i = parent[i]
+        return i
+
+    for b in range(BANDS):
+        band = np.ascontiguousarray(sig[:, b * ROWS:(b + 1) * ROWS]).view(f"V{8 * ROWS}").ravel()
+        # Judul dengan band identik masuk ember yang sama; bandingkan dengan penghuni pertama ember
+        _, first_idx, inverse = np.unique(band, return_index=True, return_inverse=True)
+        rep = first_idx[inverse.ravel()]
+        cand = np.flatnonzero(rep != np.arange(n))
+        if not len(cand): continue
+        similar = (sig[cand] == sig[rep[cand]]).mean(axis=1) >= threshold
+        for i, j in zip(cand[similar], rep[cand][similar]):
+            ri, rj = find(i), find(j)
+            if ri != rj: parent[max(ri, rj)] = min(ri, rj) # Wakil klaster = judul yang muncul paling awal
+
+    return np.array([find(i) for i in range(n)])
+
+def group_clusters(labels):
+    """Daftar indeks per klaster, berurutan sesuai kemunculan wakilnya."""
+    groups = {}
+    for i, label in enumerate(labels): groups.setdefault(int(label), []).append(i)
+    return list(groups.values())
+
+def cluster_id(title):
+    """ID klaster yang stabil dari judul wakil (untuk disimpan di database)."""
+    return format(zlib.crc32(normalize_title(title).encode("utf-8")), "08x")
@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from sentiment import SentimentScorer, sentiment_label
+from news_dedup import cluster_near_duplicates, group_clusters, cluster_id
+from providers import load_config, get_storage, get_feed_parser
+
+# --- 1. SETUP & KUNCI RAHASIA ---
+CONFIG = load_config()
+supabase = get_storage(CONFIG) # STORAGE_BACKEND=sqlite untuk menjalankan tanpa Supabase
+parse_feed = get_feed_parser(CONFIG) # feedparser.parse (atau versi berkaset, CASSETTE_MODE)
+
+# DAFTAR SAHAM (Sama seperti di app.py: Lapis 1 + Lapis 2)
+SHARIA_STOCKS = ["ADRO", "AKRA", "ANTM", "BRIS", "BRPT", "CPIN", "EXCL", "HRUM", "ICBP", "INCO", "INDF", "INKP", "INTP", "ITMG", "KLBF", "MAPI", "MBMA", "MDKA", "MEDC", "PGAS", "PGEO", "PTBA", "SMGR", "TLKM", "UNTR", "UNVR", "ACES", "AMRT", "ASII", "TPIA"]
+SHARIA_MIDCAP_STOCKS = ["BRMS", "ELSA", "ENRG", "PTRO", "SIDO", "MYOR", "ESSA", "CTRA", "BSDE", "SMRA", "PWON", "ARTO", "BTPS", "MIKA", "HEAL", "SILO", "MAPA", "AUTO", "SMSM", "TAPG", "DSNG", "LSIP", "AALI", "WIKA", "PTPP", "TOTL", "NRCA", "SCMA", "MNCN", "ERAA"]
+
+MAX_WORKERS = 8 # Jumlah feed RSS yang ditarik bersamaan
+CHUNK_SIZE = 500
+
+scorer = SentimentScorer.from_file()
+
+def build_feed_url(ticker):
+    # Google News RSS Search khusus regional Indonesia (sama dengan fetch_local_news di app.py)
+    return f"https://news.google.com/rss/search?q=saham+{ticker}&hl=id&gl=ID&ceid=ID:id"
+
+def load_feed_state():
+    """ETag & Last-Modified terakhir per saham, agar feed yang tidak berubah tidak diunduh ulang."""
+    try:
+        res = supabase.table('news_feed_state').select('symbol, etag, modified').execute()
+        return {r['symbol']: r for r in res.data}
+    except Exception as e:
+        print(f"⚠️ Gagal membaca state feed, semua feed ditarik penuh: {e}")
+        return {}
+
+def poll_feed(ticker, state):
+    """Conditional GET (If-None-Match / If-Modified-Since). Status 304 = feed tidak berubah."""
+    feed = parse_feed(build_feed_url(ticker), etag=state.get('etag'), modified=state.get('modified'))
+    new_state = {
+        "symbol": ticker, "etag": feed.get('etag', state.get('etag')),
+        "modified": feed.get('modified', state.get('modified')),
+        "checked_at": datetime.now(timezone.utc).isoformat()
+    }
+    if feed.get('status') == 304: return ticker, [], new_state
+
+    items = []
+    for entry in feed.entries:
+        raw_title = entry.get('title', '')
+        if " - " in raw_title:
+            clean_title, publisher = raw_title.rsplit(" - ", 1)
+        else:
+            clean_title, publisher = raw_title, "Media Finansial"
+
+        published = entry.get('published_parsed')
+        published_at = datetime(*published[:6], tzinfo=timezone.utc) if published else datetime.now(timezone.utc)
+        items.append({
+            "symbol": ticker, "link": entry.get('link', ''), "title": clean_title, "publisher": publisher,
+            "published_at": published_at.isoformat(),
+            "published_date": (published_at + timedelta(hours=7)).strftime('%Y-%m-%d') # Tanggal WIB
+        })
+    return ticker, [i for i in items if i['link']], new_state
+
+def update_daily_sentiment(new_rows):
+    """
+    Update inkremental deret waktu sentimen harian per saham HANYA dari berita yang benar-benar baru.
+    Satu klaster berita sindikasi dihitung sekali, dengan bobot = jumlah media berbeda yang memuatnya.
+    """
+    if not new_rows: return
+    df_new = pd.DataFrame(new_rows)
+    clusters = df_new.groupby(['symbol', 'published_date', 'cluster_id']).agg(
+        n_news=('link', 'size'), weight=('publisher', 'nunique'), score=('score', 'first')
+    ).reset_index()
+    clusters['w_score'] = clusters['score'] * clusters['weight']
+    clusters['is_pos'] = clusters['score'] > 0
+    clusters['is_neg'] = clusters['score'] < 0
+    agg = clusters.groupby(['symbol', 'published_date']).agg(
+        n_news=('n_news', 'sum'), n_clusters=('cluster_id', 'size'), sum_weight=('weight', 'sum'),
+        sum_score=('w_score', 'sum'), n_pos=('is_pos', 'sum'), n_neg=('is_neg', 'sum')
+    ).reset_index().rename(columns={'published_date': 'date'})
+    cols = ['n_news', 'n_clusters', 'sum_weight', 'sum_score', 'n_pos', 'n_neg']
+
+    # Gabungkan dengan angka yang sudah tersimpan (1 query untuk semua saham & tanggal yang tersentuh)
+    res = supabase.table('news_sentiment_daily').select('symbol, date, ' + ', '.join(cols)) \
+        .in_('symbol', agg['symbol'].unique().tolist()).in_('date', agg['date'].unique().tolist()).execute()
+    if res.data:
+        old = pd.DataFrame(res.data).fillna(0)
+        agg = pd.concat([agg, old]).groupby(['symbol', 'date'], as_index=False)[cols].sum()
+
+    agg['avg_score'] = agg['sum_score'] / agg['sum_weight'].where(agg['sum_weight'] > 0, 1)
+    records = [{
+        "symbol": r.symbol, "date": r.date, "n_news": int(r.n_news), "n_clusters": int(r.n_clusters),
+        "sum_weight": float(r.sum_weight), "sum_score": float(r.sum_score),
+        "n_pos": int(r.n_pos), "n_neg": int(r.n_neg), "avg_score": float(r.avg_score)
+    } for r in agg.itertuples()]
+    for i in range(0, len(records), CHUNK_SIZE):
+        supabase.table('news_sentiment_daily').upsert(records[i:i + CHUNK_SIZE]).execute()
+
+def ingest_news(tickers):
+    print(f"[{datetime.now(timezone.utc)}] 📡 Memindai RSS berita untuk {len(tickers)} saham...")
+    state = load_feed_state()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        results = list(pool.map(lambda t: poll_feed(t, state.get(t, {})), tickers))
+
+    # Deduplikasi per (saham, link) di dalam batch ini
+    unique = {}
+    for _, items, _ in results:
+        for item in items: unique[(item['symbol'], item['link'])] = item
+    rows = list(unique.values())
+    unchanged = sum(1 for _, items, _ in results if not items)
+    print(f"📰 {len(rows)} berita dari {len(tickers) - unchanged} feed berubah ({unchanged} feed tidak berubah / kosong).")
+
+    # Gabungkan judul sindikasi (MinHash/LSH), lalu skor wakil tiap klaster dalam satu kali pindai
+    groups = group_clusters(cluster_near_duplicates([r['title'] for r in rows]))
+    rep_scores = scorer.score_many([rows[idx[0]]['title'] for idx in groups])
+    for idx, score in zip(groups, rep_scores):
+        cid = cluster_id(rows[idx[0]]['title'])
+        for i in idx:
+            rows[i].update({"score": score, "sentiment": sentiment_label(score), "cluster_id": cid})
+    print(f"🧩 {len(rows)} berita tergabung menjadi {len(groups)} klaster cerita.")
+
+    # Link yang sudah pernah tersimpan diabaikan database; yang kembali hanya baris baru
+    new_rows = []
+    for i in range(0, len(rows), CHUNK_SIZE):
+        res = supabase.table('news').upsert(rows[i:i + CHUNK_SIZE], on_conflict='symbol,link', ignore_duplicates=True).execute()
+        new_rows.extend(res.data or [])
+
+    update_daily_sentiment(new_rows)
+    supabase.table('news_feed_state').upsert([feed_state for _, _, feed_state in results]).execute()
+    print(f"[{datetime.now(timezone.utc)}] 🎉 {len(new_rows)} berita baru tersimpan.")
+
+if __name__ == "__main__":
+    ingest_news(SHARIA_STOCKS + SHARIA_MIDCAP_STOCKS)
@@ -0,0 +1,146 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# =====================================================================
+# INSTRUMENTASI LATENSI HOT PATH (DIPAKAI app.py & fetcher.py)
+# Setiap panggilan yang diukur masuk ring buffer satu proses: (waktu, nama, halaman, durasi).
+# Buffer terbatas sehingga memori tetap konstan; persentil dihitung saat panel dibuka.
+# =====================================================================
+RING_SIZE = 20000
+
+_samples = deque(maxlen=RING_SIZE)
+_context = threading.local() # Halaman aktif per thread (Streamlit: 1 thread per rerun sesi)
+
+def set_page(page):
+    _context.page = page
+
+def current_page():
+    return getattr(_context, 'page', '-')
+
+def record(name, seconds):
+    _samples.append((time.time(), name, current_page(), seconds)) # deque.append atomik antar thread
+
+@contextmanager
+def timer(name):
+    """Context manager: with timer("knn_fit"): ..."""
+    start = time.perf_counter()
+    try: yield
+    finally: record(name, time.perf_counter() - start)
+
+def timed(name=None):
+    """Decorator: @timed() atau @timed("yf.download")."""
+    def decorator(func):
+        label = name or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try: return func(*args, **kwargs)
+            finally: record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def samples_frame():
+    rows = list(_samples)
+    return pd.DataFrame(rows, columns=['ts', 'name', 'page', 'seconds'])
+
+def summary(by='name'):
+    """Jumlah panggilan & latensi (ms) p50/p95/p99 per fungsi atau per halaman."""
+    df = samples_frame()
+    if df.empty: return pd.DataFrame(columns=[by, 'count', 'total_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+    ms = df['seconds'] * 1000
+    g = ms.groupby(df[by])
+    out = pd.DataFrame({
+        'count': g.size(), 'total_ms': g.sum(),
+        'p50_ms': g.quantile(0.5), 'p95_ms': g.quantile(0.95), 'p99_ms': g.quantile(0.99), 'max_ms': g.max(),
+    }).reset_index()
+    return out.sort_values('total_ms', ascending=False).round(1)
+
+def histogram(name, bins=20):
+    """Histogram latensi (ms, skala log) satu fungsi: (tepi bin, jumlah)."""
+    df = samples_frame()
+    ms = df.loc[df['name'] == name, 'seconds'].to_numpy() * 1000
+    if not len(ms): return np.array([]), np.array([])
+    edges = np.logspace(np.log10(max(ms.min(), 0.01)), np.log10(max(ms.max(), 0.02)), bins + 1)
+    counts, edges = np.histogram(ms, bins=edges)
+    return edges, counts
+
+def export_json():
+    """Snapshot metrik untuk perbandingan offline (ringkasan per fungsi & halaman)."""
+    return json.dumps({
+        "exported_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "n_samples": len(_samples),
+        "by_name": summary('name').to_dict(orient='records'),
+        "by_page": summary('page').to_dict(orient='records'),
+    }, indent=2, default=float)
+
+def reset():
+    _samples.clear()
+
+# =====================================================================
+# PROFILER SEKALI JALAN (cProfile + tracemalloc) UNTUK SATU RERUN HALAMAN
+# =====================================================================
+PROFILE_TOP = 25
+ALLOCATION_NOTE = "tracemalloc mencatat alokasi seluruh proses: alokasi sesi lain yang berjalan bersamaan ikut terhitung."
+
+_profile_lock = threading.Lock() # cProfile & tracemalloc bersifat global per proses: satu sesi profil dalam satu waktu
+
+def profile_start():
+    """Mulai profil rerun ini. None jika sesi lain sedang memprofil (coba lagi di rerun berikutnya)."""
+    if not _profile_lock.acquire(blocking=False): return None
+    own_tracing = not tracemalloc.is_tracing() # Jangan ganggu tracemalloc yang dinyalakan pihak lain
+    if own_tracing: tracemalloc.start()
+    profiler = cProfile.Profile()
+    try: profiler.enable()
+    except Exception:
+        if own_tracing: tracemalloc.stop()
+        _profile_lock.release()
+        return None
+    return {"profiler": profiler, "own_tracing": own_tracing}
+
+def profile_stop(handle, top=PROFILE_TOP):
+    """Hentikan profiler, kembalikan fungsi termahal (cumulative), lokasi alokasi terbesar, dan file .pstats."""
+    profiler = handle["profiler"]
+    try:
+        profiler.disable()
+        snapshot, peak, note = None, 0, ALLOCATION_NOTE
+        if handle["own_tracing"]:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        else:
+            note = "tracemalloc sudah aktif sebelum profil dimulai (dipakai pihak lain); alokasi memori tidak diukur."
+    finally:
+        _profile_lock.release()
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, lineno, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({"function": f"{func} ({os.path.basename(filename)}:{lineno})", "calls": nc, "tottime_s": tt, "cumtime_s": ct})
+    functions = pd.DataFrame(rows).sort_values("cumtime_s", ascending=False).head(top).round(4) if rows else pd.DataFrame()
+
+    allocations = pd.DataFrame([{
+        "location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+        "size_kb": stat.size / 1024, "count": stat.count,
+    } for stat in (snapshot.statistics('lineno')[:top] if snapshot else [])]).round(1)
+
+    with tempfile.NamedTemporaryFile(suffix=".pstats", delete=False) as f: path = f.name
+    try:
+        profiler.dump_stats(path)
+        with open(path, "rb") as f: pstats_bytes = f.read()
+    finally:
+        os.remove(path)
+
+    return {"functions": functions, "allocations": allocations, "peak_kb": peak / 1024, "allocation_note": note,
+            "total_s": sum(tt for (_, _, tt, _, _) in stats.stats.values()), "pstats": pstats_bytes}
@@ -0,0 +1,124 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# =====================================================================
+# MESIN RISIKO PORTOFOLIO (KOVARIANS, VaR/CVaR, KONTRIBUSI RISIKO, KLASTER KORELASI)
+# Semua perhitungan berupa operasi matriks NumPy atas matriks return (hari x saham).
+# =====================================================================
+TRADING_DAYS = 252
+LOOKBACK_DAYS = 252     # 1 tahun bursa terakhir
+CONFIDENCE = 0.95
+CORR_THRESHOLD = 0.7    # Pasangan dengan korelasi >= ini dianggap satu klaster (bergerak bersama)
+MIN_COVERAGE = 0.9      # Saham dengan return < 90% hari di jendela lookback dikeluarkan dari matriks
+
+def returns_matrix(close_panel, lookback=LOOKBACK_DAYS):
+    """Return harian sederhana (hari x saham) dari panel harga penutupan, hanya hari yang lengkap."""
+    rets = close_panel.sort_index().pct_change(fill_method=None).iloc[1:]
+    return rets.tail(lookback).dropna(how='any')
+
+def short_history_columns(close_panel, lookback=LOOKBACK_DAYS, min_coverage=MIN_COVERAGE):
+    """Saham yang datanya terlalu pendek (baru IPO / bolong) sehingga akan memangkas jendela semua saham lain."""
+    rets = close_panel.sort_index().pct_change(fill_method=None).iloc[1:].tail(lookback)
+    return rets.columns[rets.notna().mean() < min_coverage].tolist()
+
+def correlation_clusters(corr, threshold=CORR_THRESHOLD):
+    """Komponen terhubung dari graf korelasi >= threshold, via penutupan transitif matriks boolean."""
+    reach = (corr.to_numpy() >= threshold) | np.eye(len(corr), dtype=bool)
+    for _ in range(int(np.ceil(np.log2(max(len(corr), 2))))):
+        reach = (reach.astype(np.int32) @ reach.astype(np.int32)) > 0
+    labels = reach.argmax(axis=1) # Anggota dengan indeks terkecil dalam komponen = label
+    names = np.asarray(corr.columns)
+    return [names[labels == lab].tolist() for lab in np.unique(labels) if (labels == lab).sum() > 1]
+
+def portfolio_risk(returns, weights, confidence=CONFIDENCE, threshold=CORR_THRESHOLD):
+    """
+    returns: DataFrame return harian (hari x saham). weights: Series bobot per saham (dinormalisasi ke 1).
+    VaR/CVaR dinyatakan sebagai angka kerugian positif (% nilai portofolio) untuk horizon 1 hari.
+    """
+    w = weights.reindex(returns.columns).fillna(0.0).to_numpy(dtype=float)
+    w = w / w.sum()
+    R = returns.to_numpy(dtype=float)
+
+    cov = np.cov(R, rowvar=False, ddof=1).reshape(len(w), len(w))
+    port_var = float(w @ cov @ w)
+    vol = np.sqrt(port_var)
+
+    # Historis: distribusi return portofolio yang benar-benar terjadi
+    port_ret = R @ w
+    cutoff = np.quantile(port_ret, 1 - confidence)
+    var_hist = -cutoff
+    cvar_hist = -port_ret[port_ret <= cutoff].mean()
+
+    # Parametrik (normal): mu - z*sigma, CVaR = -(mu - sigma*phi(z)/(1-c))
+    z = NormalDist().inv_cdf(confidence)
+    mu = float(port_ret.mean())
+    var_param = -(mu - z * vol)
+    cvar_param = -(mu - vol * NormalDist().pdf(z) / (1 - confidence))
+
+    # Kontribusi risiko marginal: w_i * (Cov w)_i / sigma_p, totalnya = sigma_p
+    mrc = w * (cov @ w) / vol if vol > 0 else np.zeros_like(w)
+    contrib = pd.DataFrame({
+        "Bobot (%)": w * 100,
+        "Volatilitas (%)": np.sqrt(np.diag(cov) * TRADING_DAYS) * 100,
+        "Kontribusi Risiko (%)": (mrc / vol * 100) if vol > 0 else mrc,
+    }, index=returns.columns)
+
+    corr = pd.DataFrame(np.corrcoef(R, rowvar=False).reshape(len(w), len(w)), index=returns.columns, columns=returns.columns)
+
+    return {
+        "n_days": int(len(R)),
+        "vol_daily": vol * 100,
+        "vol_annual": vol * np.sqrt(TRADING_DAYS) * 100,
+        "var_hist": var_hist * 100, "cvar_hist": cvar_hist * 100,
+        "var_param": var_param * 100, "cvar_param": cvar_param * 100,
+        "contrib": contrib.sort_values("Kontribusi Risiko (%)", ascending=False),
+        "corr": corr,
+        "clusters": correlation_clusters(corr, threshold),
+    }
+
+# =====================================================================
+# PROYEKSI MONTE CARLO (BLOCK BOOTSTRAP)
+# Jalur masa depan disusun dari potongan return historis berurutan (blok), sehingga
+# volatility clustering jangka pendek tetap terbawa. Dihitung per potongan jalur agar memori terbatas.
+# =====================================================================
+MC_PATHS = 10000
+MC_HORIZON = 252        # 1 tahun bursa ke depan
+MC_BLOCK = 5            # Panjang blok bootstrap (1 minggu bursa)
+MC_CHUNK = 2500         # Jumlah jalur per potongan
+MC_SEED = 42
+MC_PERCENTILES = (5, 25, 50, 75, 95)
+
+def monte_carlo(daily_returns, horizon=MC_HORIZON, n_paths=MC_PATHS, block=MC_BLOCK, seed=MC_SEED, chunk=MC_CHUNK):
+    """
+    daily_returns: array/Series return harian (portofolio atau kurva ekuitas strategi).
+    Mengembalikan pita persentil nilai relatif (awal = 1.0) per hari dan ringkasan nilai akhir,
+    atau None jika tidak ada return valid untuk di-bootstrap.
+    """
+    r = np.log1p(np.asarray(daily_returns, dtype=float))
+    r = r[np.isfinite(r)]
+    if len(r) == 0: return None
+    block = max(1, min(block, len(r)))
+    n_blocks = -(-horizon // block)
+    rng = np.random.default_rng(seed)
+    offsets = np.arange(block)
+
+    log_paths = np.empty((n_paths, horizon), dtype=np.float32)
+    for start in range(0, n_paths, chunk):
+        n = min(chunk, n_paths - start)
+        starts = rng.integers(0, len(r) - block + 1, size=(n, n_blocks))
+        idx = (starts[:, :, None] + offsets).reshape(n, -1)[:, :horizon]
+        log_paths[start:start + n] = np.cumsum(r[idx], axis=1)
+
+    bands = np.exp(np.percentile(log_paths, MC_PERCENTILES, axis=0))
+    bands = pd.DataFrame(np.vstack([np.ones(len(MC_PERCENTILES)), bands.T]), columns=[f"P{p}" for p in MC_PERCENTILES])
+    final = np.exp(log_paths[:, -1])
+    return {
+        "bands": bands,                                   # baris = hari ke-0..horizon
+        "prob_loss": float((final < 1).mean() * 100),
+        "median_final": float(np.median(final)),
+        "p5_final": float(np.percentile(final, 5)),
+        "p95_final": float(np.percentile(final, 95)),
+        "n_paths": n_paths, "horizon": horizon,
+    }
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pandas as pd
+
+from providers import YahooPrices
+
+# =====================================================================
+# SNAPSHOT HARGA TERAKHIR SATU PROSES (DIBAGI SEMUA USER & HALAMAN)
+# Satu thread latar belakang menarik harga seluruh universe dalam 1x download massal.
+# Permintaan yang bersamaan saat data basi hanya memicu SATU download (single-flight).
+# =====================================================================
+REFRESH_SECONDS = 60   # Jadwal refresh latar belakang
+MAX_AGE_SECONDS = 180  # Lebih tua dari ini = basi, pembaca ikut menunggu refresh
+MAX_EXTRA_TICKERS = 200 # Ticker di luar universe (mis. ketikan user di portofolio) yang ikut di-refresh
+EXTRA_TTL_SECONDS = 3600 # Ticker tambahan yang tidak diminta lagi selama ini dibuang dari refresh
+REJECT_TTL_SECONDS = 900 # Ticker yang tidak mengembalikan harga (salah ketik/tidak valid) tidak dicoba ulang selama ini
+
+class PriceSnapshot:
+    def __init__(self, tickers, refresh_seconds=REFRESH_SECONDS, max_age=MAX_AGE_SECONDS, provider=None):
+        self.tickers = set(tickers)  # Universe tetap (daftar saham aplikasi)
+        self.extras = {}             # Ticker tambahan yang sudah tervalidasi -> waktu terakhir diminta
+        self.rejected = {}           # Ticker tanpa harga -> waktu ditolak
+        self.provider = provider or YahooPrices()
+        self.refresh_seconds = refresh_seconds
+        self.max_age = max_age
+        self.prices = {}
+        self.updated_at = 0.0
+        self._fetch_lock = threading.Lock()   # Hanya satu download berjalan pada satu waktu
+        self._extra_lock = threading.Lock()   # Melindungi extras/rejected (ditulis thread pembaca & refresh)
+        self._thread = None
+
+    def _download(self, tickers):
+        data = self.provider.download(sorted(tickers), period="5d", progress=False, threads=True)
+        if data.empty: return {}
+        close = data['Close'] if isinstance(data.columns, pd.MultiIndex) else data[['Close']].set_axis(sorted(tickers), axis=1)
+        last = close.ffill().iloc[-1].dropna()
+        return {t: float(p) for t, p in last.items()}
+
+    def refresh(self):
+        """Single-flight: jika download lain sedang berjalan, tunggu hasilnya alih-alih menarik ulang."""
+        if not self._fetch_lock.acquire(blocking=False):
+            with self._fetch_lock: return
+        try:
+            started = time.time()
+            with self._extra_lock:
+                expired = [t for t, seen in self.extras.items() if started - seen > EXTRA_TTL_SECONDS]
+                for t in expired: del self.extras[t]
+                universe = self.tickers | self.extras.keys()
+            prices = self._download(universe)
+            if prices:
+                # Ganti dict utuh (atomik untuk pembaca); ticker kedaluwarsa ikut dibuang
+                self.prices = {t: p for t, p in {**self.prices, **prices}.items() if t in universe}
+                self.updated_at = started
+        except Exception as e:
+            print(f"Error refreshing price snapshot: {e}")
+        finally:
+            self._fetch_lock.release()
+
+    def _loop(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="price-snapshot", daemon=True)
+            self._thread.start()
+        return self
+
+    def age(self):
+        return time.time() - self.updated_at
+
+    def _add_extras(self, tickers):
+        """Tarik HANYA ticker baru (bukan seluruh universe); yang tidak mengembalikan harga ditolak sementara."""
+        now = time.time()
+        with self._extra_lock:
+            self.rejected = {t: at for t, at in self.rejected.items() if now - at <= REJECT_TTL_SECONDS}
+            new = {t for t in tickers if t not in self.rejected}
+        if not new: return
+        try: prices = self._download(new)
+        except Exception as e:
+            print(f"Error fetching new tickers {sorted(new)}: {e}")
+            return
+        with self._extra_lock:
+            for t in new - prices.keys(): self.rejected[t] = now
+            for t in prices: self.extras[t] = now
+            # Batas jumlah: buang yang paling lama tidak diminta
+            for t in sorted(self.extras, key=self.extras.get)[:max(len(self.extras) - MAX_EXTRA_TICKERS, 0)]:
+                del self.extras[t]
+        self.prices = {**self.prices, **prices}
+
+    def get(self, tickers):
+        """Harga terakhir untuk ticker yang diminta. Ticker baru di luar universe ditarik sendiri lalu ikut refresh latar belakang."""
+        now = time.time()
+        with self._extra_lock:
+            for t in tickers:
+                if t in self.extras: self.extras[t] = now
+            missing = {t for t in tickers if t not in self.tickers and t not in self.extras}
+        if missing: self._add_extras(missing)
+        if self.age() > self.max_age: self.refresh()
+        prices = self.prices
+        return {t: prices[t] for t in tickers if t in prices}
@@ -0,0 +1,677 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# =====================================================================
+# PENYEDIA DATA & PENYIMPANAN YANG BISA DITUKAR (DIPAKAI app.py, fetcher.py & seed_history.py)
+# Harga/fundamental (yfinance), broker summary (GoAPI) dan database (Supabase) dipanggil lewat
+# antarmuka tipis di sini, sehingga backend bisa diganti lewat konfigurasi:
+#   PRICE_PROVIDER   = yahoo | replay      (replay: baca fixture OHLCV dari FIXTURE_DIR)
+#   BROKER_PROVIDER  = goapi | replay
+#   STORAGE_BACKEND  = supabase | sqlite   (sqlite: file LOCAL_DB_PATH, tanpa server)
+#   CASSETTE_MODE    = off | record | replay (rekam/putar ulang harga, broker & RSS ke CASSETTE_PATH)
+# =====================================================================
+DEFAULTS = {
+    "PRICE_PROVIDER": "yahoo",
+    "BROKER_PROVIDER": "goapi",
+    "STORAGE_BACKEND": "supabase",
+    "FIXTURE_DIR": os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fixtures"),
+    "LOCAL_DB_PATH": os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "local.db"),
+    "CASSETTE_MODE": "off",
+    "ALLOW_INSECURE_LOCAL_AUTH": "0", # "1" = login lokal tanpa password (khusus offline/dev, JANGAN di deployment)
+    "CASSETTE_PATH": os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cassettes", "default.cassette"),
+}
+
+def load_config(secrets=None):
+    """Gabungan DEFAULTS < Environment Variables < Streamlit Secrets (jika diberikan)."""
+    config = dict(DEFAULTS)
+    for key in list(DEFAULTS) + ["SUPABASE_URL", "SUPABASE_KEY", "IDX_API_KEY"]:
+        if os.getenv(key): config[key] = os.getenv(key)
+    if secrets is not None:
+        try: # st.secrets melempar error jika secrets.toml tidak ada
+            supa = secrets.get("supabase", {}) or {}
+            if supa.get("url"): config["SUPABASE_URL"] = supa["url"]
+            if supa.get("key"): config["SUPABASE_KEY"] = supa["key"]
+            for key in list(DEFAULTS) + ["IDX_API_KEY"]:
+                if secrets.get(key): config[key] = secrets[key]
+        except Exception: pass
+    return config
+
+# =====================================================================
+# 1. HARGA & FUNDAMENTAL
+# =====================================================================
+class PriceProvider(ABC):
+    """Antarmuka: bentuk hasil mengikuti yfinance agar pemanggil lama tidak berubah."""
+    @abstractmethod
+    def download(self, tickers, period=None, start=None, group_by=None, **kwargs): ...
+    @abstractmethod
+    def history(self, ticker, period="1mo"): ...
+    @abstractmethod
+    def info(self, ticker): ...
+    @abstractmethod
+    def dividends(self, ticker): ...
+
+class YahooPrices(PriceProvider):
+    def download(self, tickers, period=None, start=None, group_by=None, **kwargs):
+        import yfinance as yf
+        if group_by: kwargs['group_by'] = group_by
+        if start is not None: return yf.download(tickers, start=start, **kwargs)
+        return yf.download(tickers, period=period or "1mo", **kwargs)
+
+    def history(self, ticker, period="1mo"):
+        import yfinance as yf
+        return yf.Ticker(ticker).history(period=period)
+
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+    def dividends(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).dividends
+
+_PERIOD_RE = re.compile(r"^(\d+)(d|wk|mo|y)$")
+
+def period_start(period, end):
+    """'5d' / '3mo' / '10y' / 'max' -> tanggal awal relatif terhadap bar terakhir fixture (deterministik)."""
+    if not period or period == "max": return None
+    m = _PERIOD_RE.match(period)
+    if not m: return None
+    n, unit = int(m.group(1)), m.group(2)
+    offset = {"d": pd.DateOffset(days=n), "wk": pd.DateOffset(weeks=n), "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}[unit]
+    return end - offset
+
+class ReplayPrices(PriceProvider):
+    """
+    Fixture lokal di FIXTURE_DIR:
+      prices/{TICKER}.parquet|.csv   (index Date, kolom Open/High/Low/Close/Volume)
+      info/{TICKER}.json             (dict seperti yf.Ticker.info)
+      dividends/{TICKER}.csv         (Date, Dividends)
+    Ticker tanpa fixture dianggap tidak ada (hasil kosong), sama seperti yfinance untuk kode salah.
+    """
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _path(self, kind, ticker, exts):
+        for ext in exts:
+            path = os.path.join(self.fixture_dir, kind, f"{ticker}{ext}")
+            if os.path.exists(path): return path
+        return None
+
+    def _frame(self, ticker):
+        with self._lock:
+            if ticker not in self._frames:
+                path = self._path("prices", ticker, (".parquet", ".csv"))
+                if path is None: df = pd.DataFrame()
+                elif path.endswith(".parquet"): df = pd.read_parquet(path)
+                else: df = pd.read_csv(path, index_col=0, parse_dates=True)
+                if not df.empty:
+                    df.index = pd.to_datetime(df.index).tz_localize(None)
+                    df.index.name = "Date"
+                self._frames[ticker] = df.sort_index()
+            return self._frames[ticker]
+
+    def _slice(self, df, period, start):
+        if df.empty: return df
+        if start is not None: return df[df.index >= pd.Timestamp(start)]
+        begin = period_start(period, df.index[-1])
+        return df if begin is None else df[df.index > begin]
+
+    def download(self, tickers, period=None, start=None, group_by=None, **kwargs):
+        single = isinstance(tickers, str)
+        names = [tickers] if single else list(tickers)
+        frames = {t: self._slice(self._frame(t), period or "1mo", start) for t in names}
+        frames = {t: f for t, f in frames.items() if not f.empty}
+        if not frames: return pd.DataFrame()
+        if single and not group_by: return frames[tickers].copy()
+        panel = pd.concat(frames, axis=1, names=["Ticker", "Price"])
+        # Tanpa group_by yfinance mengelompokkan per kolom harga: (Price, Ticker)
+        return panel if group_by == "ticker" else panel.swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+    def history(self, ticker, period="1mo"):
+        return self._slice(self._frame(ticker), period, None).copy()
+
+    def info(self, ticker):
+        path = self._path("info", ticker, (".json",))
+        if path is None: return {}
+        with open(path, encoding="utf-8") as f: return json.load(f)
+
+    def dividends(self, ticker):
+        path = self._path("dividends", ticker, (".csv",))
+        if path is None: return pd.Series(dtype=float, name="Dividends")
+        return pd.read_csv(path, index_col=0, parse_dates=True).iloc[:, 0].rename("Dividends")
+
+def save_price_fixtures(provider, tickers, fixture_dir, period="10y"):
+    """Bekukan data live (mis. YahooPrices) menjadi fixture ReplayPrices: harga, info & dividen per ticker."""
+    for kind in ("prices", "info", "dividends"): os.makedirs(os.path.join(fixture_dir, kind), exist_ok=True)
+    saved = []
+    for t in tickers:
+        try:
+            df = provider.download(t, period=period, auto_adjust=True, progress=False)
+            if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
+            if df.empty: continue
+            df.to_csv(os.path.join(fixture_dir, "prices", f"{t}.csv"))
+            with open(os.path.join(fixture_dir, "info", f"{t}.json"), "w", encoding="utf-8") as f:
+                json.dump(provider.info(t), f, default=str)
+            provider.dividends(t).to_csv(os.path.join(fixture_dir, "dividends", f"{t}.csv"))
+            saved.append(t)
+        except Exception as e:
+            print(f"⚠️ Fixture {t} gagal disimpan: {e}")
+    return saved
+
+# =====================================================================
+# 2. BROKER SUMMARY (DATA ASING IDX)
+# =====================================================================
+class BrokerProvider(ABC):
+    @abstractmethod
+    def broker_summary(self, symbol, target_date, investor="FOREIGN"):
+        """Daftar baris {'side', 'value', 'lot', ...}. Melempar error jika sumber gagal dihubungi."""
+
+class GoApiBroker(BrokerProvider):
+    BASE_URL = "https://api.goapi.io/stock/idx"
+
+    def __init__(self, api_key, timeout=10):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def broker_summary(self, symbol, target_date, investor="FOREIGN"):
+        import requests
+        url = f"{self.BASE_URL}/{symbol}/broker_summary?date={target_date}&investor={investor}"
+        res = requests.get(url, headers={'accept': 'application/json', 'X-API-KEY': self.api_key, 'User-Agent': 'Mozilla/5.0'}, timeout=self.timeout)
+        if res.status_code != 200: return []
+        body = res.json()
+        if body.get('status') not in (None, 'success'): return []
+        return body.get('data', {}).get('results', []) or []
+
+class ReplayBroker(BrokerProvider):
+    """Fixture broker/{SYMBOL}_{YYYY-MM-DD}.json (isi: daftar baris results). Tanpa fixture = tidak ada transaksi asing."""
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def broker_summary(self, symbol, target_date, investor="FOREIGN"):
+        path = os.path.join(self.fixture_dir, "broker", f"{symbol}_{target_date}.json")
+        if not os.path.exists(path): return []
+        with open(path, encoding="utf-8") as f: return json.load(f)
+
+# =====================================================================
+# 3. PENYIMPANAN LOKAL (SQLite) DENGAN API FLUENT ALA SUPABASE
+# Mendukung subset yang dipakai aplikasi: select/insert/upsert/update/delete, filter
+# eq/neq/gt/gte/lt/lte/in_/like/ilike/is_/or_, order, limit, range, count='exact'.
+# Tabel & kolom dibuat otomatis saat pertama kali ditulis. View di LOCAL_VIEWS dan setiap RPC yang dipanggil
+# aplikasi (consume_quota, record_transaction, reconcile_open_lots) punya padanan lokal; RPC lain via register_rpc.
+# =====================================================================
+PRIMARY_KEYS = {
+    "historical_prices": "symbol,date",
+    "backtest_cache": "cache_key",
+    "seasonality_stats": "symbol,market",
+    "news": "symbol,link",
+    "news_sentiment_daily": "symbol,date",
+    "news_feed_state": "symbol",
+    "dividend_calendar": "symbol,market",
+    "dividend_history": "symbol,market,ex_date",
+    "user_portfolios": "user_id,symbol",
+    "user_open_lots": "txn_id",
+    "user_pnl_summary": "user_id",
+    "ledger_totals": "id",
+    "api_registry": "key",
+    "profiles": "id",
+}
+
+# Padanan SQLite untuk view di supabase_schema.sql (dibuat saat pertama kali dibaca)
+LOCAL_VIEWS = {
+    "dividend_history_latest": "SELECT symbol, market, MAX(ex_date) AS last_ex_date, MAX(created_at) AS last_created_at FROM dividend_history GROUP BY symbol, market",
+    "profile_role_counts": "SELECT COALESCE(role, 'free') AS role, COUNT(*) AS n_users FROM profiles GROUP BY COALESCE(role, 'free')",
+    "profile_quota_summary": ("SELECT COUNT(*) AS n_users, SUM(COALESCE(daily_quota, 0)) AS total_daily_quota, "
+                              "COALESCE(SUM(CASE WHEN last_reset_date = date('now', '+7 hours') THEN used_quota END), 0) AS total_used_quota, "
+                              "SUM(role <> 'admin' AND COALESCE(daily_quota, 0) <= "
+                              "CASE WHEN last_reset_date = date('now', '+7 hours') THEN COALESCE(used_quota, 0) ELSE 0 END) AS n_exhausted FROM profiles"),
+}
+
+_OPS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _to_sql_value(v):
+    if isinstance(v, (dict, list)): return json.dumps(v, default=str)
+    if isinstance(v, (datetime, date, pd.Timestamp)): return v.isoformat()
+    if isinstance(v, np.generic): return v.item()
+    if isinstance(v, float) and np.isnan(v): return None
+    return v
+
+def _quote(cols):
+    return ",".join(f'"{c}"' for c in cols)
+
+def _split_top(expr):
+    """Pisah 'a.eq.1,and(b.eq.2,c.lt.3)' pada koma level teratas (menghormati kurung & kutip)."""
+    parts, depth, quoted, buf = [], 0, False, ""
+    for ch in expr:
+        if ch == '"': quoted = not quoted
+        elif not quoted and ch == "(": depth += 1
+        elif not quoted and ch == ")": depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append(buf); buf = ""
+        else: buf += ch
+    if buf: parts.append(buf)
+    return parts
+
+def _parse_logic(expr, joiner):
+    """Sintaks filter PostgREST (dipakai .or_) -> potongan SQL + parameter."""
+    sqls, params = [], []
+    for part in _split_top(expr):
+        part = part.strip()
+        m = re.match(r"^(and|or)\((.*)\)$", part)
+        if m:
+            sql, p = _parse_logic(m.group(2), " AND " if m.group(1) == "and" else " OR ")
+        else:
+            col, op, value = part.split(".", 2)
+            value = value[1:-1] if value.startswith('"') and value.endswith('"') else value
+            if op == "is": sql, p = f'"{col}" IS NULL' if value == "null" else f'"{col}" IS NOT NULL', []
+            elif op in ("like", "ilike"): sql, p = f'"{col}" LIKE ?', [value.replace("*", "%")]
+            else: sql, p = f'"{col}" {_OPS[op]} ?', [value]
+        sqls.append(f"({sql})"); params.extend(p)
+    return joiner.join(sqls), params
+
+class LocalQuery:
+    def __init__(self, storage, table):
+        self.storage = storage
+        self.table_name = table
+        self.action = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.count_mode = None
+        self.where, self.params = [], []
+        self.order_by = []
+        self.limit_n, self.offset_n = None, None
+
+    # --- Aksi ---
+    def select(self, columns="*", count=None):
+        self.action, self.columns, self.count_mode = "select", columns, count
+        return self
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.action, self.payload = "upsert", rows
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- Filter ---
+    def _cmp(self, col, op, value):
+        self.where.append(f'"{col}" {op} ?'); self.params.append(_to_sql_value(value))
+        return self
+    def eq(self, col, value): return self._cmp(col, "=", value)
+    def neq(self, col, value): return self._cmp(col, "<>", value)
+    def gt(self, col, value): return self._cmp(col, ">", value)
+    def gte(self, col, value): return self._cmp(col, ">=", value)
+    def lt(self, col, value): return self._cmp(col, "<", value)
+    def lte(self, col, value): return self._cmp(col, "<=", value)
+    def like(self, col, pattern): return self._cmp(col, "LIKE", pattern)
+    def ilike(self, col, pattern): return self._cmp(col, "LIKE", pattern) # LIKE SQLite sudah case-insensitive (ASCII)
+    def is_(self, col, value):
+        self.where.append(f'"{col}" IS NULL' if value in (None, "null") else f'"{col}" IS NOT NULL')
+        return self
+    def in_(self, col, values):
+        values = list(values)
+        if not values: self.where.append("0")
+        else:
+            self.where.append(f'"{col}" IN ({",".join("?" * len(values))})')
+            self.params.extend(_to_sql_value(v) for v in values)
+        return self
+    def or_(self, expr):
+        sql, params = _parse_logic(expr, " OR ")
+        self.where.append(f"({sql})"); self.params.extend(params)
+        return self
+
+    # --- Urutan & halaman ---
+    def order(self, col, desc=False):
+        self.order_by.append(f'"{col}" {"DESC" if desc else "ASC"}')
+        return self
+    def limit(self, n):
+        self.limit_n = n
+        return self
+    def range(self, start, end):
+        self.offset_n, self.limit_n = start, end - start + 1
+        return self
+
+    def execute(self):
+        return self.storage._execute(self)
+
+class LocalRpc:
+    def __init__(self, storage, name, params):
+        self.storage, self.name, self.params = storage, name, params or {}
+
+    def execute(self):
+        func = self.storage._rpcs.get(self.name)
+        if func is None: raise NotImplementedError(f"RPC '{self.name}' tidak tersedia di penyimpanan lokal")
+        return LocalResponse(func(self.storage, **self.params))
+
+class LocalAuth:
+    """
+    Login lokal: email apa pun yang punya baris di tabel profiles (password TIDAK diperiksa, khusus offline/dev).
+    Hanya aktif jika ALLOW_INSECURE_LOCAL_AUTH=1; tanpa itu semua login ditolak.
+    """
+    class _Session:
+        def __init__(self, profile):
+            self.user = type("LocalUser", (), {"id": profile["id"], "email": profile.get("email")})()
+
+    def __init__(self, storage, enabled=False):
+        self.storage = storage
+        self.enabled = enabled
+
+    def sign_in_with_password(self, credentials):
+        if not self.enabled:
+            raise PermissionError("Login lokal tanpa password dinonaktifkan; set ALLOW_INSECURE_LOCAL_AUTH=1 (khusus offline/dev)")
+        rows = self.storage.table("profiles").select("*").eq("email", credentials.get("email")).limit(1).execute().data
+        if not rows: raise ValueError("Invalid login credentials")
+        return self._Session(rows[0])
+
+    def sign_out(self):
+        return None
+
+class LocalStorage:
+    def __init__(self, path, primary_keys=None, allow_insecure_auth=False):
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.primary_keys = {**PRIMARY_KEYS, **(primary_keys or {})}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for view in LOCAL_VIEWS: self._conn.execute(f'DROP VIEW IF EXISTS "{view}"') # Dibuat ulang dari definisi terbaru saat dibaca
+        self._lock = threading.RLock()
+        self._columns = {}  # tabel -> {kolom: tipe}
+        self._rpcs = {"consume_quota": _local_consume_quota, "record_transaction": _local_record_transaction,
+                      "reconcile_open_lots": _local_reconcile_open_lots}
+        self.auth = LocalAuth(self, enabled=allow_insecure_auth)
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return LocalRpc(self, name, params)
+
+    def register_rpc(self, name, func):
+        """func(storage, **params) -> data."""
+        self._rpcs[name] = func
+
+    # --- Skema otomatis ---
+    def _table_columns(self, table):
+        if table not in self._columns:
+            rows = self._conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+            if not rows and table in LOCAL_VIEWS:
+                try:
+                    self._conn.execute(f'CREATE VIEW "{table}" AS {LOCAL_VIEWS[table]}')
+                    rows = self._conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+                except sqlite3.OperationalError:
+                    self._conn.execute(f'DROP VIEW IF EXISTS "{table}"') # Tabel dasarnya belum ada
+                    return {}
+            self._columns[table] = {r["name"]: r["type"] for r in rows}
+        return self._columns[table]
+
+    def _ensure_table(self, table, rows):
+        cols = self._table_columns(table)
+        if not cols:
+            # id otomatis (seperti bigserial), kecuali id diberikan sendiri oleh pemanggil (mis. uuid profiles)
+            text_id = self.primary_keys.get(table) == "id" or any(not isinstance(r.get("id", 0), (int, np.integer)) for r in rows)
+            self._conn.execute(f'CREATE TABLE "{table}" ("id" {"" if text_id else "INTEGER"} PRIMARY KEY, "created_at" TEXT DEFAULT CURRENT_TIMESTAMP)')
+            cols.update({"id": "" if text_id else "INTEGER", "created_at": "TEXT"})
+            keys = self.primary_keys.get(table)
+            if keys:
+                keys = keys.split(",")
+                for k in keys:
+                    if k not in cols: self._add_column(table, k, None)
+                self._conn.execute(f'CREATE UNIQUE INDEX "ux_{table}_{"_".join(keys)}" ON "{table}" ({_quote(keys)})')
+        for row in rows:
+            for k, v in row.items():
+                if k not in cols: self._add_column(table, k, v)
+
+    def _add_column(self, table, col, sample):
+        kind = "JSON" if isinstance(sample, (dict, list)) else ""
+        self._conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}" {kind}')
+        self._columns[table][col] = kind
+
+    def _decode(self, table, rows):
+        json_cols = [c for c, t in self._table_columns(table).items() if t == "JSON"]
+        out = []
+        for r in rows:
+            d = dict(r)
+            for c in json_cols:
+                if isinstance(d.get(c), str): d[c] = json.loads(d[c])
+            out.append(d)
+        return out
+
+    # --- Eksekusi ---
+    def _execute(self, q):
+        with self._lock:
+            table = q.table_name
+            where = f" WHERE {' AND '.join(q.where)}" if q.where else ""
+
+            if q.action in ("insert", "upsert"):
+                rows = q.payload if isinstance(q.payload, list) else [q.payload]
+                if not rows: return LocalResponse([])
+                self._ensure_table(table, rows)
+                keys = (q.on_conflict or self.primary_keys.get(table) or "").split(",") if q.action == "upsert" else []
+                keys = [k.strip() for k in keys if k.strip()]
+                if keys:
+                    self._conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{table}_{"_".join(keys)}" ON "{table}" ({_quote(keys)})')
+                out = []
+                self._conn.execute("BEGIN")
+                try:
+                    for row in rows:
+                        cols = list(row)
+                        sql = f'INSERT INTO "{table}" ({_quote(cols)}) VALUES ({",".join("?" * len(cols))})'
+                        if keys:
+                            target = _quote(keys)
+                            updates = [c for c in cols if c not in keys]
+                            if q.ignore_duplicates or not updates: sql += f" ON CONFLICT ({target}) DO NOTHING"
+                            else: sql += f" ON CONFLICT ({target}) DO UPDATE SET " + ",".join(f'"{c}"=excluded."{c}"' for c in updates)
+                        out.extend(self._conn.execute(sql + " RETURNING *", [_to_sql_value(row[c]) for c in cols]).fetchall())
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                return LocalResponse(self._decode(table, out))
+
+            if not self._table_columns(table):
+                return LocalResponse([], 0 if q.count_mode else None) # Tabel belum pernah ditulis = kosong
+
+            if q.action == "update":
+                self._ensure_table(table, [q.payload])
+                cols = list(q.payload)
+                sets = ",".join(f'"{c}"=?' for c in cols)
+                sql = f'UPDATE "{table}" SET {sets}{where} RETURNING *'
+                return LocalResponse(self._decode(table, self._conn.execute(sql, [_to_sql_value(q.payload[c]) for c in cols] + q.params).fetchall()))
+
+            if q.action == "delete":
+                rows = self._conn.execute(f'DELETE FROM "{table}"{where} RETURNING *', q.params).fetchall()
+                return LocalResponse(self._decode(table, rows))
+
+            known = self._table_columns(table)
+            cols = [c.strip() for c in q.columns.split(",")] if q.columns and q.columns != "*" else ["*"]
+            cols = ["*"] if cols == ["*"] else [c for c in cols if c in known]
+            select = "*" if cols == ["*"] else _quote(cols) or '"id"'
+            sql = f'SELECT {select} FROM "{table}"{where}'
+            if q.order_by: sql += " ORDER BY " + ",".join(q.order_by)
+            if q.limit_n is not None: sql += f" LIMIT {int(q.limit_n)}"
+            if q.offset_n: sql += f" OFFSET {int(q.offset_n)}"
+            try:
+                data = self._decode(table, self._conn.execute(sql, q.params).fetchall())
+                count = self._conn.execute(f'SELECT COUNT(*) FROM "{table}"{where}', q.params).fetchone()[0] if q.count_mode else None
+            except sqlite3.OperationalError as e:
+                if "no such column" not in str(e): raise
+                data, count = [], 0 if q.count_mode else None # Kolom belum pernah ditulis = tidak ada yang cocok
+            return LocalResponse(data, count)
+
+def _wib_today():
+    return (pd.Timestamp.now(tz="UTC") + pd.Timedelta(hours=7)).strftime('%Y-%m-%d')
+
+def _local_consume_quota(storage, p_user_id):
+    """Padanan lokal RPC consume_quota (supabase_schema.sql): reset harian WIB + potong 1 kuota jika masih tersisa."""
+    with storage._lock:
+        rows = storage.table("profiles").select("*").eq("id", p_user_id).execute().data
+        if not rows: raise ValueError("profile not found")
+        p, today = rows[0], _wib_today()
+        daily = int(p.get("daily_quota") or 0)
+        used = 0 if p.get("last_reset_date") != today else int(p.get("used_quota") or 0)
+        allowed = used < daily # used sudah 0 di hari baru; kuota harian 0 tetap ditolak
+        if allowed:
+            used += 1
+            storage.table("profiles").update({"used_quota": used, "last_reset_date": today}).eq("id", p_user_id).execute()
+        return {"allowed": allowed, "daily_quota": daily, "used_quota": used, "remaining": max(daily - used, 0)}
+
+def _first(storage, table, **filters):
+    q = storage.table(table).select("*")
+    for col, value in filters.items(): q = q.eq(col, value)
+    rows = q.limit(1).execute().data
+    return rows[0] if rows else {}
+
+def _local_record_transaction(storage, p_user_id, p_symbol, p_side, p_price, p_lots, p_cost_hint=None):
+    """
+    Padanan lokal RPC record_transaction: FIFO lot terbuka, user_portfolios, user_pnl_summary & ledger_totals.
+    Tanpa transaksi database bersarang, semua validasi dilakukan sebelum menulis apa pun (pengganti rollback).
+    """
+    symbol, side, lots, price = str(p_symbol).upper(), str(p_side).upper(), int(p_lots), float(p_price)
+    now = pd.Timestamp.now(tz="UTC").isoformat()
+    with storage._lock:
+        open_lots = storage.table("user_open_lots").select("*").eq("user_id", p_user_id).eq("symbol", symbol) \
+            .order("created_at").order("txn_id").execute().data if side == "SELL" else []
+        left, realized, takes = (lots if side == "SELL" else 0), 0.0, []
+        for lot in open_lots:
+            if left == 0: break
+            take = min(left, int(lot["lots_remaining"]))
+            realized += (price - float(lot["price"])) * take * 100
+            left -= take
+            takes.append((lot, take))
+        if left > 0 and p_cost_hint is None: raise ValueError(f"UNMATCHED_LOTS:{left}")
+        if left > 0: realized += (price - float(p_cost_hint)) * left * 100
+
+        txn = storage.table("user_transactions").insert({"user_id": p_user_id, "symbol": symbol, "side": side, "price": price,
+                                                         "lots": lots, "realized_pnl": realized, "created_at": now}).execute().data[0]
+        pos = _first(storage, "user_portfolios", user_id=p_user_id, symbol=symbol)
+        summary = _first(storage, "user_pnl_summary", user_id=p_user_id)
+        totals = _first(storage, "ledger_totals", id=1)
+        old_lot, old_price = int(pos.get("total_lot") or 0), float(pos.get("avg_price") or 0)
+        count = lambda row, col, inc: int(row.get(col) or 0) + inc
+
+        if side == "BUY":
+            storage.table("user_open_lots").insert({"txn_id": txn["id"], "user_id": p_user_id, "symbol": symbol, "price": price,
+                                                    "lots_remaining": lots, "created_at": now}).execute()
+            storage.table("user_portfolios").upsert({"user_id": p_user_id, "symbol": symbol, "total_lot": old_lot + lots,
+                                                     "avg_price": (old_price * old_lot + price * lots) / (old_lot + lots)}).execute()
+            summary = {"n_buys": count(summary, "n_buys", 1)}
+            totals = {"n_buys": count(totals, "n_buys", 1)}
+        else:
+            for lot, take in takes:
+                q = storage.table("user_open_lots")
+                if take == int(lot["lots_remaining"]): q.delete().eq("txn_id", lot["txn_id"]).execute()
+                else: q.update({"lots_remaining": int(lot["lots_remaining"]) - take}).eq("txn_id", lot["txn_id"]).execute()
+            if pos:
+                q = storage.table("user_portfolios")
+                q = q.update({"total_lot": old_lot - lots}) if old_lot > lots else q.delete()
+                q.eq("user_id", p_user_id).eq("symbol", symbol).execute()
+            summary = {"realized_pnl": float(summary.get("realized_pnl") or 0) + realized,
+                       "gross_profit": float(summary.get("gross_profit") or 0) + max(realized, 0),
+                       "gross_loss": float(summary.get("gross_loss") or 0) + min(realized, 0),
+                       "n_sells": count(summary, "n_sells", 1), "n_wins": count(summary, "n_wins", int(realized > 0))}
+            totals = {"realized_pnl": float(totals.get("realized_pnl") or 0) + realized, "n_sells": count(totals, "n_sells", 1)}
+
+        storage.table("user_pnl_summary").upsert({"user_id": p_user_id, **summary, "updated_at": now}).execute()
+        storage.table("ledger_totals").upsert({"id": 1, **totals, "updated_at": now}).execute()
+        pos = _first(storage, "user_portfolios", user_id=p_user_id, symbol=symbol)
+        return {"txn_id": txn["id"], "realized_pnl": realized, "lots": int(pos.get("total_lot") or 0),
+                "avg_cost": float(pos.get("avg_price") or 0), "unmatched_lots": left}
+
+def _local_reconcile_open_lots(storage, p_user_id):
+    """Padanan lokal RPC reconcile_open_lots: pangkas lot terbuka (terbaru dulu) yang melebihi total_lot di user_portfolios."""
+    with storage._lock:
+        held = {r["symbol"]: int(r.get("total_lot") or 0)
+                for r in storage.table("user_portfolios").select("symbol, total_lot").eq("user_id", p_user_id).execute().data}
+        lots = storage.table("user_open_lots").select("*").eq("user_id", p_user_id) \
+            .order("created_at", desc=True).order("txn_id", desc=True).execute().data
+        excess = {}
+        for lot in lots: excess[lot["symbol"]] = excess.get(lot["symbol"], 0) + int(lot["lots_remaining"])
+        excess = {sym: n - held.get(sym, 0) for sym, n in excess.items() if n > held.get(sym, 0)}
+        trimmed = sum(excess.values())
+        for lot in lots:
+            e, remaining = excess.get(lot["symbol"], 0), int(lot["lots_remaining"])
+            if e == 0: continue
+            q = storage.table("user_open_lots")
+            if remaining <= e: q.delete().eq("txn_id", lot["txn_id"]).execute()
+            else: q.update({"lots_remaining": remaining - e}).eq("txn_id", lot["txn_id"]).execute()
+            excess[lot["symbol"]] = max(e - remaining, 0)
+        return trimmed
+
+# =====================================================================
+# 4. PABRIK BERDASARKAN KONFIGURASI
+# =====================================================================
+def get_cassette(config):
+    """Kaset aktif (record/replay) atau None jika CASSETTE_MODE=off."""
+    mode = config.get("CASSETTE_MODE", "off")
+    if mode in ("", "off"): return None
+    from cassette import open_cassette
+    return open_cassette(config["CASSETTE_PATH"], mode)
+
+def get_price_provider(config):
+    name = config.get("PRICE_PROVIDER", "yahoo")
+    if name == "yahoo": provider = YahooPrices()
+    elif name == "replay": provider = ReplayPrices(config["FIXTURE_DIR"])
+    else: raise ValueError(f"PRICE_PROVIDER tidak dikenal: {name}")
+    cassette = get_cassette(config)
+    if cassette is None: return provider
+    from cassette import Recorded
+    return Recorded(provider, cassette, "prices")
+
+def get_broker_provider(config):
+    name = config.get("BROKER_PROVIDER", "goapi")
+    if name == "goapi": provider = GoApiBroker(config.get("IDX_API_KEY", ""))
+    elif name == "replay": provider = ReplayBroker(config["FIXTURE_DIR"])
+    else: raise ValueError(f"BROKER_PROVIDER tidak dikenal: {name}")
+    cassette = get_cassette(config)
+    if cassette is None: return provider
+    from cassette import Recorded
+    return Recorded(provider, cassette, "broker")
+
+def get_feed_parser(config):
+    """feedparser.parse, atau versi berkaset. etag/modified tidak ikut kunci (berubah tiap malam)."""
+    import feedparser
+    cassette = get_cassette(config)
+    if cassette is None: return feedparser.parse
+    return cassette.wrap("feedparser.parse", feedparser.parse, ignore=("etag", "modified"))
+
+def get_storage(config):
+    """Client Supabase asli, atau LocalStorage (SQLite) dengan API fluent yang sama."""
+    name = config.get("STORAGE_BACKEND", "supabase")
+    if name == "supabase":
+        from supabase import create_client
+        if not config.get("SUPABASE_URL") or not config.get("SUPABASE_KEY"):
+            raise ValueError("SUPABASE_URL / SUPABASE_KEY belum diatur")
+        return create_client(config["SUPABASE_URL"], config["SUPABASE_KEY"])
+    if name == "sqlite":
+        return LocalStorage(config["LOCAL_DB_PATH"], allow_insecure_auth=str(config.get("ALLOW_INSECURE_LOCAL_AUTH", "0")) == "1")
+    raise ValueError(f"STORAGE_BACKEND tidak dikenal: {name}")
+
+def new_local_profile(storage, email, role="free", daily_quota=10):
+    """Buat akun lokal (LocalStorage) agar bisa login offline."""
+    row = {"id": str(uuid.uuid5(uuid.NAMESPACE_URL, email)), "email": email, "role": role,
+           "daily_quota": daily_quota, "used_quota": 0, "last_reset_date": _wib_today()}
+    return storage.table("profiles").upsert(row).execute().data[0]
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# =====================================================================
+# MESIN MUSIMAN (SEASONALITY) - DIPAKAI BERSAMA OLEH fetcher.py & app.py
+# =====================================================================
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+HARI_INDO = ['Senin', 'Selasa', 'Rabu', 'Kamis', 'Jumat']
+MIN_TRADING_DAYS = 250 * 5 # Kurang lebih 5 tahun trading days
+
+def _to_json_list(values):
+    # NaN tidak valid di JSON Supabase, ganti dengan None
+    return [None if pd.isna(v) else round(float(v), 4) for v in values]
+
+def compute_seasonality_table(df):
+    """
+    Meringkas histori harian menjadi tabel musiman yang ringkas:
+    12 bulan x (win rate, rata-rata, terburuk), win rate 5 hari bursa, dan pivot tahun x bulan.
+    Mengembalikan None jika histori terlalu pendek.
+    """
+    close_data = df['Close'].squeeze().dropna()
+    if len(close_data) < MIN_TRADING_DAYS: return None
+
+    # --- PENGOLAHAN DATA BULANAN ---
+    try:
+        df_monthly = close_data.resample('ME').last()
+    except:
+        df_monthly = close_data.resample('M').last()
+
+    returns = df_monthly.pct_change() * 100
+    df_ret = returns.to_frame(name='Return').dropna()
+    df_ret['Year'] = df_ret.index.year
+    df_ret['Month'] = df_ret.index.month
+
+    pivot = df_ret.pivot(index='Year', columns='Month', values='Return').reindex(columns=range(1, 13))
+
+    win_rate = ((pivot > 0).sum() / pivot.notna().sum() * 100).fillna(0)
+    avg_return = pivot.mean().fillna(0)
+    min_returns = pivot.min()
+
+    # --- EFEK HARI PERDAGANGAN ---
+    daily_df = df.loc[close_data.index]
+    if 'Open' in daily_df.columns:
+        is_up = daily_df['Close'] > daily_df['Open']
+    else:
+        is_up = daily_df['Close'] > daily_df['Close'].shift(1)
+    day_stats = (is_up.groupby(daily_df.index.dayofweek).mean() * 100).reindex(range(5))
+
+    return {
+        "last_date": close_data.index[-1].strftime('%Y-%m-%d'),
+        "n_years": int(pivot.shape[0]),
+        "month_win_rate": _to_json_list(win_rate.values),
+        "month_avg": _to_json_list(avg_return.values),
+        "month_min": _to_json_list(min_returns.values),
+        "weekday_win_rate": _to_json_list(day_stats.values),
+        "pivot": {str(year): _to_json_list(row) for year, row in zip(pivot.index, pivot.values)},
+    }
+
+def table_to_frames(table):
+    """Membuka kembali baris tabel musiman menjadi objek pandas siap gambar."""
+    months = list(range(1, 13))
+    pivot = pd.DataFrame(
+        [[np.nan if v is None else v for v in row] for row in table['pivot'].values()],
+        index=[int(y) for y in table['pivot'].keys()], columns=months, dtype=float
+    ).sort_index()
+    win_rate = pd.Series(table['month_win_rate'], index=months, dtype=float)
+    avg_return = pd.Series(table['month_avg'], index=months, dtype=float)
+    min_returns = pd.Series(table['month_min'], index=months, dtype=float)
+    day_stats = pd.Series(table['weekday_win_rate'], index=HARI_INDO, dtype=float).dropna()
+    return pivot, win_rate, avg_return, min_returns, day_stats
+
+# =====================================================================
+# EVENT STUDY: EFEK RAMADAN, LEBARAN & EX-DIVIDEN
+# =====================================================================
+HIJRI_EVENTS = {
+    "🌙 Awal Ramadan": (9, 1),
+    "🕌 Idul Fitri (Lebaran)": (10, 1),
+}
+
+def hijri_to_gregorian(year, month, day):
+    """
+    Konversi kalender Hijriah tabular (aritmatika) ke Masehi.
+    Bisa meleset 1-2 hari dari hasil rukyat/sidang isbat, cukup untuk jendela event harian.
+    """
+    jd = day + np.ceil(29.5 * (month - 1)) + (year - 1) * 354 + (3 + 11 * year) // 30 + 1948439.5 - 1
+    return (pd.Timestamp(0) + pd.to_timedelta(jd - 2440587.5, unit='D')).normalize()
+
+def hijri_event_dates(month, day, start, end):
+    """Semua tanggal Masehi untuk (bulan, hari) Hijriah di antara start dan end."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    first_h = int((start.year - 622) * 33 / 32) - 1
+    last_h = int((end.year - 622) * 33 / 32) + 2
+    dates = [hijri_to_gregorian(y, month, day) for y in range(first_h, last_h + 1)]
+    return pd.DatetimeIndex([d for d in dates if start <= d <= end])
+
+def _event_windows(index, dates, pre, post):
+    # Petakan tanggal event ke hari bursa pertama pada/sesudahnya, lalu bentuk matriks indeks jendela (E x W)
+    pos = np.unique(index.searchsorted(pd.DatetimeIndex(dates)))
+    win = pos[:, None] + np.arange(-pre, post + 1)[None, :]
+    valid = (win[:, 0] >= 1) & (win[:, -1] < len(index))
+    return win[valid]
+
+def event_study(close_panel, bench_close, events, pre=10, post=10):
+    """
+    Rata-rata Cumulative Abnormal Return (CAR, %) di sekitar tanggal event untuk semua saham sekaligus.
+    close_panel: DataFrame harga (tanggal x saham). bench_close: Series indeks acuan (mis. ^JKSE).
+    events: daftar tanggal yang sama untuk semua saham, atau dict {saham: daftar tanggal} (mis. ex-date).
+    Abnormal return = log return saham - log return indeks (market-adjusted model).
+    Mengembalikan (kurva CAR hari -pre..+post x saham, ringkasan per saham).
+    """
+    close_panel = close_panel.sort_index()
+    bench = bench_close.reindex(close_panel.index).ffill()
+    log_ret = np.log(close_panel).diff()
+    abnormal = log_ret.sub(np.log(bench).diff(), axis=0).to_numpy()
+    offsets = np.arange(-pre, post + 1)
+
+    def _car(win, ar):
+        # ar: (T x N) -> jendela (E x W x N) -> CAR per event
+        car = np.nancumsum(ar[win], axis=1)
+        has_data = ~np.all(np.isnan(ar[win]), axis=1)
+        return np.where(has_data[:, None, :], car, np.nan)
+
+    if isinstance(events, dict):
+        curves, finals = {}, {}
+        for j, sym in enumerate(close_panel.columns):
+            if not len(events.get(sym, [])): continue
+            win = _event_windows(close_panel.index, events[sym], pre, post)
+            if not len(win): continue
+            car = _car(win, abnormal[:, [j]])[:, :, 0]
+            curves[sym], finals[sym] = np.nanmean(car, axis=0), car[:, -1]
+        curve = pd.DataFrame(curves, index=offsets)
+    else:
+        win = _event_windows(close_panel.index, events, pre, post)
+        if not len(win): return pd.DataFrame(index=offsets), pd.DataFrame()
+        car = _car(win, abnormal)
+        curve = pd.DataFrame(np.nanmean(car, axis=0), index=offsets, columns=close_panel.columns)
+        finals = {sym: car[:, -1, j] for j, sym in enumerate(close_panel.columns)}
+
+    curve = (np.exp(curve) - 1) * 100
+    summary = pd.DataFrame({
+        "Kode": list(finals.keys()),
+        "CAR (%)": [(np.exp(np.nanmean(f)) - 1) * 100 for f in finals.values()],
+        "Win Rate (%)": [np.mean(f[~np.isnan(f)] > 0) * 100 if np.any(~np.isnan(f)) else np.nan for f in finals.values()],
+        "Jumlah Event": [int(np.sum(~np.isnan(f))) for f in finals.values()],
+    })
+    summary = summary[summary["Jumlah Event"] > 0].sort_values("CAR (%)", ascending=False)
+    return curve.dropna(axis=1, how='all'), summary
@@ -1,13 +1,12 @@
-import os
-import yfinance as yf
 import pandas as pd
-from supabase import create_client, Client
+from providers import load_config, get_storage, get_price_provider
 
 # --- 1. SETUP & KUNCI RAHASIA ---
-# Pastikan Anda sudah mengatur variable environment, atau ganti langsung dengan string "url_anda" dan "key_anda" untuk sementara
-SUPABASE_URL = os.getenv("SUPABASE_URL", "MASUKKAN_URL_SUPABASE_ANDA_DI_SINI")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY", "MASUKKAN_KEY_SUPABASE_ANDA_DI_SINI")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Pastikan Anda sudah mengatur variable environment SUPABASE_URL & SUPABASE_KEY
+# (atau STORAGE_BACKEND=sqlite / PRICE_PROVIDER=replay untuk seeding database lokal dari fixture)
+CONFIG = load_config()
+supabase = get_storage(CONFIG)
+prices = get_price_provider(CONFIG)
 
 # DAFTAR SAHAM (Sama seperti di fetcher)
 SHARIA_STOCKS = ["ADRO", "AKRA", "ANTM", "BRIS", "BRPT", "CPIN", "EXCL", "HRUM", "ICBP", "INCO", "INDF", "INKP", "INTP", "ITMG", "KLBF", "MAPI", "MBMA", "MDKA", "MEDC", "PGAS", "PGEO", "PTBA", "SMGR", "TLKM", "UNTR", "UNVR", "ACES", "AMRT", "ASII", "TPIA"]
@@ -20,7 +19,7 @@ def fetch_and_seed_10_years(stock_list, is_indonesia=True):
         
         try:
             # Tarik data 10 tahun
-            df = yf.download(symbol, period="10y", auto_adjust=True, progress=False)
+            df = prices.download(symbol, period="10y", auto_adjust=True, progress=False)
             
             if df.empty:
                 print(f"⚠️ Data kosong untuk {symbol}. Lewati.")
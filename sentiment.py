@@ -0,0 +1,59 @@
+import json
+import os
+import re
+from bisect import bisect_right
+
+# =====================================================================
+# MESIN SENTIMEN BERITA (KAMUS BAHASA INDONESIA)
+# =====================================================================
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sentiment_lexicon.json")
+
+def sentiment_label(score):
+    if score > 0: return "🟢 POSITIF"
+    elif score < 0: return "🔴 NEGATIF"
+    else: return "⚪ NETRAL"
+
+class SentimentScorer:
+    """
+    Skor sentimen berbasis kamus berbobot. Seluruh kata positif & negatif dikompilasi SEKALI
+    menjadi satu regex alternasi, lalu satu batch judul berita dipindai dalam satu kali jalan.
+    Kata yang diawali negasi ("tidak naik") dibalik bobotnya.
+    """
+
+    def __init__(self, positive, negative, negators=()):
+        self.weights = {kata.lower(): abs(float(bobot)) for kata, bobot in positive.items()}
+        self.weights.update({kata.lower(): -abs(float(bobot)) for kata, bobot in negative.items()})
+
+        # Kata terpanjang didahulukan agar frasa multi-kata menang atas kata tunggal
+        terms = "|".join(re.escape(t) for t in sorted(self.weights, key=len, reverse=True))
+        negs = "|".join(re.escape(n.lower()) for n in sorted(negators, key=len, reverse=True))
+        neg_part = rf"(?:\b(?P<neg>{negs})[ \t]+)?" if negs else ""
+        self.pattern = re.compile(rf"{neg_part}\b(?P<term>{terms})\b")
+
+    @classmethod
+    def from_file(cls, path=LEXICON_PATH):
+        with open(path, encoding="utf-8") as f:
+            lexicon = json.load(f)
+        return cls(lexicon.get("positif", {}), lexicon.get("negatif", {}), lexicon.get("negasi", []))
+
+    def score_many(self, texts):
+        """Skor untuk banyak teks sekaligus. Setiap kata dihitung sekali per judul."""
+        texts = [str(t).lower().replace("\n", " ") for t in texts]
+        starts, pos = [], 0
+        for t in texts:
+            starts.append(pos); pos += len(t) + 1
+
+        scores = [0.0] * len(texts)
+        seen = set()
+        for m in self.pattern.finditer("\n".join(texts)):
+            i = bisect_right(starts, m.start()) - 1
+            negated = m.groupdict().get('neg') is not None
+            key = (i, m.group('term'), negated)
+            if key in seen: continue
+            seen.add(key)
+            bobot = self.weights[m.group('term')]
+            scores[i] += -bobot if negated else bobot
+        return scores
+
+    def score(self, text):
+        return self.score_many([text])[0]
@@ -0,0 +1,367 @@
+-- =====================================================================
+-- SKEMA TAMBAHAN SUPABASE
+-- Jalankan sekali di SQL Editor Supabase. Semua perintah aman diulang (IF NOT EXISTS).
+-- Tabel lama (profiles, audit_logs, historical_prices, user_portfolios, jii30_daily_data,
+-- us_daily_data) dibuat lewat dashboard dan tidak diulang di sini.
+-- =====================================================================
+
+-- --- CACHE HASIL BACKTEST (Mesin Backtesting) ---
+-- Kunci: symbol|strategy|params|last_bar_date. Bar baru = kunci baru, baris lama dibuang oleh app.
+create table if not exists backtest_cache (
+    cache_key     text primary key,
+    symbol        text not null,
+    strategy      text not null,
+    params        jsonb not null,
+    last_bar_date date not null,
+    result        jsonb not null,
+    created_at    timestamptz not null default now()
+);
+create index if not exists backtest_cache_symbol_idx on backtest_cache (symbol, strategy, last_bar_date);
+-- Pasar ikut kunci cache (kode yang sama bisa ada di IDX & US); baris lama tanpa pasar tidak lagi cocok dengan kunci baru
+alter table backtest_cache add column if not exists market text not null default 'IDX';
+create index if not exists backtest_cache_symbol_market_idx on backtest_cache (symbol, market, strategy, last_bar_date);
+
+-- --- TABEL MUSIMAN PRA-HITUNG (Peta Musiman) ---
+-- Diisi fetcher.py tiap malam, 1 baris per (saham, pasar): kode yang sama bisa ada di IDX & US (mis. PGEO).
+-- Array bulan berurutan Jan..Des, hari Senin..Jumat.
+create table if not exists seasonality_stats (
+    symbol           text not null,
+    market           text not null,            -- 'IDX' / 'US'
+    last_date        date,
+    n_years          int,
+    month_win_rate   jsonb not null,           -- 12 angka (%)
+    month_avg        jsonb not null,           -- 12 angka (%)
+    month_min        jsonb not null,           -- 12 angka (%), return bulanan terburuk
+    weekday_win_rate jsonb not null,           -- 5 angka (%)
+    pivot            jsonb not null,           -- {"2016": [12 angka/null], ...}
+    updated_at       timestamptz not null default now(),
+    primary key (symbol, market)
+);
+create index if not exists seasonality_stats_market_idx on seasonality_stats (market);
+
+-- Migrasi dari versi lama (primary key hanya symbol)
+do $$ begin
+    if (select count(*) from pg_index i join pg_attribute a on a.attrelid = i.indrelid and a.attnum = any(i.indkey)
+        where i.indrelid = 'seasonality_stats'::regclass and i.indisprimary) = 1 then
+        alter table seasonality_stats drop constraint seasonality_stats_pkey;
+        alter table seasonality_stats add primary key (symbol, market);
+    end if;
+end $$;
+
+-- --- RADAR BERITA: HASIL INGEST RSS BERKALA (news_ingest.py) ---
+create table if not exists news (
+    id             bigserial primary key,
+    symbol         text not null,
+    link           text not null,
+    title          text not null,
+    publisher      text,
+    published_at   timestamptz not null,
+    published_date date not null,              -- tanggal WIB
+    score          real not null default 0,
+    sentiment      text,
+    created_at     timestamptz not null default now(),
+    unique (symbol, link)
+);
+create index if not exists news_symbol_published_idx on news (symbol, published_at desc);
+
+-- Deret waktu sentimen harian per saham (diupdate inkremental oleh job ingest)
+create table if not exists news_sentiment_daily (
+    symbol    text not null,
+    date      date not null,
+    n_news    int not null default 0,
+    sum_score real not null default 0,
+    n_pos     int not null default 0,
+    n_neg     int not null default 0,
+    avg_score real not null default 0,
+    primary key (symbol, date)
+);
+
+-- ETag / Last-Modified terakhir per feed (conditional GET)
+create table if not exists news_feed_state (
+    symbol     text primary key,
+    etag       text,
+    modified   text,
+    checked_at timestamptz
+);
+
+-- Klaster berita sindikasi (MinHash/LSH). Skor harian dibobot jumlah media berbeda per klaster.
+alter table news add column if not exists cluster_id text;
+alter table news_sentiment_daily add column if not exists n_clusters int not null default 0;
+alter table news_sentiment_daily add column if not exists sum_weight real not null default 0;
+-- Backfill baris lama (sebelum klaster): tiap berita = 1 klaster berbobot 1, jadi sum_score lama sudah
+-- "tertimbang" dengan bobot 1. Tanpa ini avg_score mencampur angka tertimbang & tidak tertimbang.
+-- n_clusters = 0 hanya ada di baris lama (ingest baru selalu >= 1), jadi aman dijalankan ulang.
+update news_sentiment_daily
+set sum_weight = n_news, n_clusters = n_news, avg_score = sum_score / n_news
+where n_clusters = 0 and sum_weight = 0 and n_news > 0;
+
+-- --- KALENDER DIVIDEN (Dividend Hunter) ---
+-- Diisi fetcher.py tiap malam secara paralel. Hanya saham dengan yield valid (0 < yield <= 40%).
+create table if not exists dividend_calendar (
+    symbol           text not null,
+    market           text not null,            -- 'IDX' / 'US'
+    price            real,
+    dividend_rate    real,
+    yield_pct        real not null,
+    ex_date          date,
+    low_52w          real,
+    recent_dividends jsonb not null default '[]', -- [{"date": "2024-05-10", "amount": 123.4}, ...]
+    updated_at       timestamptz not null default now(),
+    primary key (symbol, market)
+);
+create index if not exists dividend_calendar_market_yield_idx on dividend_calendar (market, yield_pct desc);
+
+-- --- HISTORI DIVIDEN (append-only, diupdate inkremental oleh fetcher.py) ---
+-- created_at dipakai app sebagai versi cache: analitik dihitung ulang hanya jika ada baris baru.
+create table if not exists dividend_history (
+    symbol     text not null,
+    market     text not null,                  -- 'IDX' / 'US'
+    ex_date    date not null,
+    amount     real not null,                  -- dividen per lembar
+    created_at timestamptz not null default now(),
+    primary key (symbol, market, ex_date)
+);
+create index if not exists dividend_history_created_idx on dividend_history (market, created_at desc);
+
+-- Ex-date & waktu input terakhir per saham (titik awal update inkremental & versi cache app)
+create or replace view dividend_history_latest as
+select symbol, market, max(ex_date) as last_ex_date, max(created_at) as last_created_at
+from dividend_history
+group by symbol, market;
+
+-- --- PORTOFOLIO: SIMPAN BERBASIS SELISIH (upsert on_conflict user_id,symbol) ---
+-- Jika constraint gagal dibuat, bersihkan dulu baris ganda (user_id, symbol) yang tersisa dari versi lama.
+do $$ begin
+    if not exists (select 1 from pg_constraint where conname = 'user_portfolios_user_symbol_key') then
+        alter table user_portfolios add constraint user_portfolios_user_symbol_key unique (user_id, symbol);
+    end if;
+end $$;
+
+-- --- BUKU BESAR TRANSAKSI (LEDGER) + AGREGAT PnL INKREMENTAL ---
+-- Semua transaksi dicatat lewat RPC record_transaction: pencocokan lot FIFO dan agregat
+-- (posisi di user_portfolios, PnL terealisasi per user, total global) diperbarui dalam satu transaksi database.
+create table if not exists user_transactions (
+    id           bigserial primary key,
+    user_id      uuid not null,
+    symbol       text not null,
+    side         text not null check (side in ('BUY', 'SELL')),
+    price        numeric not null check (price > 0),
+    lots         int not null check (lots > 0),
+    realized_pnl numeric not null default 0,   -- hanya SELL
+    created_at   timestamptz not null default now()
+);
+create index if not exists user_transactions_user_idx on user_transactions (user_id, created_at desc);
+
+-- Sisa lot BUY yang belum terjual (antrian FIFO per user & saham)
+create table if not exists user_open_lots (
+    txn_id         bigint primary key references user_transactions (id) on delete cascade,
+    user_id        uuid not null,
+    symbol         text not null,
+    price          numeric not null,
+    lots_remaining int not null,
+    created_at     timestamptz not null
+);
+create index if not exists user_open_lots_fifo_idx on user_open_lots (user_id, symbol, created_at, txn_id);
+
+-- Posisi per user & saham = user_portfolios (satu-satunya sumber posisi yang dibaca app),
+-- diperbarui record_transaction dalam transaksi yang sama dengan buku besar. Tabel agregat lama tidak dipakai lagi.
+drop table if exists user_positions;
+
+-- Ringkasan PnL terealisasi per user (dibaca tab portofolio tanpa memutar ulang histori)
+create table if not exists user_pnl_summary (
+    user_id      uuid primary key,
+    realized_pnl numeric not null default 0,
+    gross_profit numeric not null default 0,
+    gross_loss   numeric not null default 0,
+    n_sells      int not null default 0,
+    n_wins       int not null default 0,
+    n_buys       int not null default 0,
+    updated_at   timestamptz not null default now()
+);
+
+-- Total global satu baris (dibaca Admin Dashboard)
+create table if not exists ledger_totals (
+    id           int primary key default 1 check (id = 1),
+    realized_pnl numeric not null default 0,
+    n_sells      int not null default 0,
+    n_buys       int not null default 0,
+    updated_at   timestamptz not null default now()
+);
+insert into ledger_totals (id) values (1) on conflict do nothing;
+
+-- p_cost_hint: harga beli untuk lot yang dijual tetapi tidak ada di ledger (posisi lama sebelum ledger ada)
+create or replace function record_transaction(
+    p_user_id uuid, p_symbol text, p_side text, p_price numeric, p_lots int, p_cost_hint numeric default null
+) returns json language plpgsql as $$
+declare
+    v_txn_id   bigint;
+    v_left     int := p_lots;
+    v_take     int;
+    v_realized numeric := 0;
+    v_lot      record;
+    v_pos      user_portfolios%rowtype;
+begin
+    insert into user_transactions (user_id, symbol, side, price, lots)
+    values (p_user_id, upper(p_symbol), upper(p_side), p_price, p_lots)
+    returning id into v_txn_id;
+
+    if upper(p_side) = 'BUY' then
+        v_left := 0;
+        insert into user_open_lots (txn_id, user_id, symbol, price, lots_remaining, created_at)
+        values (v_txn_id, p_user_id, upper(p_symbol), p_price, p_lots, now());
+
+        -- Harga rata-rata tertimbang dihitung dari baris database saat ini (bukan salinan sesi yang bisa basi)
+        insert into user_portfolios as p (user_id, symbol, avg_price, total_lot)
+        values (p_user_id, upper(p_symbol), p_price, p_lots)
+        on conflict (user_id, symbol) do update set
+            avg_price = (p.avg_price * p.total_lot + excluded.avg_price * excluded.total_lot) / (p.total_lot + excluded.total_lot),
+            total_lot = p.total_lot + excluded.total_lot;
+
+        insert into user_pnl_summary as s (user_id, n_buys) values (p_user_id, 1)
+        on conflict (user_id) do update set n_buys = s.n_buys + 1, updated_at = now();
+        update ledger_totals set n_buys = n_buys + 1, updated_at = now() where id = 1;
+    else
+        -- FIFO: habiskan lot terbuka paling lama lebih dulu
+        for v_lot in
+            select * from user_open_lots
+            where user_id = p_user_id and symbol = upper(p_symbol)
+            order by created_at, txn_id
+            for update
+        loop
+            exit when v_left = 0;
+            v_take := least(v_left, v_lot.lots_remaining);
+            v_realized := v_realized + (p_price - v_lot.price) * v_take * 100;
+            v_left := v_left - v_take;
+            if v_take = v_lot.lots_remaining then
+                delete from user_open_lots where txn_id = v_lot.txn_id;
+            else
+                update user_open_lots set lots_remaining = lots_remaining - v_take where txn_id = v_lot.txn_id;
+            end if;
+        end loop;
+
+        -- Lot yang tidak ada di buku besar (posisi lama) butuh harga beli; tanpa itu seluruh transaksi dibatalkan
+        if v_left > 0 and p_cost_hint is null then
+            raise exception 'UNMATCHED_LOTS:%', v_left;
+        end if;
+        if v_left > 0 then
+            v_realized := v_realized + (p_price - p_cost_hint) * v_left * 100;
+        end if;
+
+        update user_portfolios set total_lot = total_lot - p_lots
+        where user_id = p_user_id and symbol = upper(p_symbol);
+        delete from user_portfolios where user_id = p_user_id and symbol = upper(p_symbol) and total_lot <= 0;
+
+        update user_transactions set realized_pnl = v_realized where id = v_txn_id;
+
+        insert into user_pnl_summary as s (user_id, realized_pnl, gross_profit, gross_loss, n_sells, n_wins)
+        values (p_user_id, v_realized, greatest(v_realized, 0), least(v_realized, 0), 1, (v_realized > 0)::int)
+        on conflict (user_id) do update set
+            realized_pnl = s.realized_pnl + excluded.realized_pnl,
+            gross_profit = s.gross_profit + excluded.gross_profit,
+            gross_loss = s.gross_loss + excluded.gross_loss,
+            n_sells = s.n_sells + 1,
+            n_wins = s.n_wins + excluded.n_wins,
+            updated_at = now();
+        update ledger_totals set realized_pnl = realized_pnl + v_realized, n_sells = n_sells + 1, updated_at = now() where id = 1;
+    end if;
+
+    select * into v_pos from user_portfolios where user_id = p_user_id and symbol = upper(p_symbol);
+    return json_build_object(
+        'txn_id', v_txn_id, 'realized_pnl', v_realized,
+        'lots', coalesce(v_pos.total_lot, 0), 'avg_cost', coalesce(v_pos.avg_price, 0),
+        'unmatched_lots', v_left
+    );
+end $$;
+
+-- Koreksi manual portofolio (editor Tab 1 / hapus emiten) tidak tercatat sebagai transaksi.
+-- Setelahnya, lot terbuka di buku besar dipangkas (yang terbaru lebih dulu) agar tidak melebihi total_lot,
+-- sehingga penjualan berikutnya tidak mencocokkan FIFO ke lot yang sudah tidak dimiliki.
+create or replace function reconcile_open_lots(p_user_id uuid) returns int language plpgsql as $$
+declare
+    v_sym     record;
+    v_lot     record;
+    v_excess  int;
+    v_trimmed int := 0;
+begin
+    for v_sym in
+        select o.symbol, sum(o.lots_remaining) - coalesce(max(p.total_lot), 0) as excess
+        from user_open_lots o
+        left join user_portfolios p on p.user_id = o.user_id and p.symbol = o.symbol
+        where o.user_id = p_user_id
+        group by o.symbol
+        having sum(o.lots_remaining) > coalesce(max(p.total_lot), 0)
+    loop
+        v_excess := v_sym.excess;
+        v_trimmed := v_trimmed + v_excess;
+        for v_lot in
+            select * from user_open_lots
+            where user_id = p_user_id and symbol = v_sym.symbol
+            order by created_at desc, txn_id desc
+            for update
+        loop
+            exit when v_excess = 0;
+            if v_lot.lots_remaining <= v_excess then
+                delete from user_open_lots where txn_id = v_lot.txn_id;
+                v_excess := v_excess - v_lot.lots_remaining;
+            else
+                update user_open_lots set lots_remaining = lots_remaining - v_excess where txn_id = v_lot.txn_id;
+                v_excess := 0;
+            end if;
+        end loop;
+    end loop;
+    return v_trimmed;
+end $$;
+
+-- --- KUOTA API: CEK & POTONG ATOMIK (1 round trip, aman untuk banyak tab) ---
+-- Reset harian (tanggal WIB) ikut ditangani di sini, sehingga tidak ada kuota yang hilang/ganda.
+create or replace function consume_quota(p_user_id uuid) returns json language plpgsql as $$
+declare
+    v_today date := (now() at time zone 'Asia/Jakarta')::date;
+    v_row   profiles%rowtype;
+    v_ok    boolean := true;
+begin
+    update profiles set
+        used_quota = case when last_reset_date is distinct from v_today then 1 else used_quota + 1 end,
+        last_reset_date = v_today
+    where id = p_user_id
+      and ((last_reset_date is distinct from v_today and coalesce(daily_quota, 0) > 0) or used_quota < daily_quota)
+    returning * into v_row;
+
+    if not found then
+        v_ok := false;
+        select * into v_row from profiles where id = p_user_id;
+    end if;
+
+    return json_build_object(
+        'allowed', v_ok,
+        'daily_quota', coalesce(v_row.daily_quota, 0),
+        'used_quota', coalesce(v_row.used_quota, 0),
+        'remaining', greatest(coalesce(v_row.daily_quota, 0) - coalesce(v_row.used_quota, 0), 0)
+    );
+end $$;
+
+-- --- BUKU TAMU API (data broker yang sudah dibayar, dibagi semua proses/replika) ---
+create table if not exists api_registry (
+    key        text primary key,               -- {symbol}_{tanggal}
+    expires_at timestamptz not null,
+    created_at timestamptz not null default now()
+);
+create index if not exists api_registry_expires_idx on api_registry (expires_at);
+
+-- --- ADMIN DASHBOARD: AGREGAT DI SQL + INDEKS UNTUK KEYSET PAGINATION ---
+create or replace view profile_role_counts as
+select coalesce(role, 'free') as role, count(*) as n_users
+from profiles
+group by coalesce(role, 'free');
+
+create or replace view profile_quota_summary as
+select count(*) as n_users,
+       sum(coalesce(daily_quota, 0)) as total_daily_quota,
+       coalesce(sum(used_quota) filter (where last_reset_date = (now() at time zone 'Asia/Jakarta')::date), 0) as total_used_quota,
+       count(*) filter (where role <> 'admin' and coalesce(daily_quota, 0) <=
+                        case when last_reset_date = (now() at time zone 'Asia/Jakarta')::date then coalesce(used_quota, 0) else 0 end) as n_exhausted
+from profiles;
+-- used_quota dari hari sebelumnya belum di-reset (reset terjadi saat user login/konsumsi), jadi dianggap 0
+
+create index if not exists profiles_email_idx on profiles (email);
+create index if not exists audit_logs_action_created_idx on audit_logs (action, created_at desc, id desc);
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+from perf import timed, timer
+
+# =====================================================================
+# INTI NUMERIK ANALISIS TEKNIKAL (DIPAKAI app.py, fetcher.py & benchmarks/)
+# Fungsi murni di atas DataFrame OHLCV: tanpa Streamlit, tanpa jaringan, tanpa database.
+# =====================================================================
+KNN_NEIGHBORS = 5
+KNN_MIN_ROWS = 100
+KNN_FEATURES = ['Rsi', 'CMF', 'Ret_1']
+
+def fix_dataframe(df):
+    if df.empty: return df
+    if isinstance(df.columns, pd.MultiIndex):
+        try: df.columns = df.columns.get_level_values(0)
+        except: pass
+    df.columns = [str(c).capitalize() for c in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
+    return df
+
+# --- 1. POLA CANDLESTICK & INDIKATOR ---
+@timed()
+def check_candlestick_patterns(curr, prev):
+    score = 0; patterns = []
+    try:
+        body = abs(curr['Close'] - curr['Open'])
+        upper = curr['High'] - max(curr['Close'], curr['Open'])
+        lower = min(curr['Close'], curr['Open']) - curr['Low']
+        rsi = curr.get('Rsi', 50)
+        lower_bb = curr.get('BBL_20_2.0', 0)
+        is_valid_support = (rsi < 40) or (curr['Low'] <= lower_bb * 1.01)
+
+        if (lower > 2 * body) and (upper < body):
+            if is_valid_support: score += 1; patterns.append("🔨 Hammer")
+        if (prev['Close'] < prev['Open']) and (curr['Close'] > curr['Open']):
+            if (curr['Open'] < prev['Close']) and (curr['Close'] > prev['Open']):
+                if is_valid_support: score += 1.5; patterns.append("🦁 Engulfing")
+    except: pass
+    return score, patterns
+
+@timed()
+def calculate_metrics(df, ihsg_df=None):
+    df = fix_dataframe(df)
+    for col in ['SMA20', 'SMA50', 'SMA100', 'EMA200', 'ATR', 'CMF', 'Rsi']:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    try:
+        df['Rsi'] = df.ta.rsi(length=14)
+        df = pd.concat([df, df.ta.macd(fast=12, slow=26, signal=9), df.ta.bbands(length=20, std=2)], axis=1)
+        df['SMA20'] = df.ta.sma(length=20)
+        df['SMA50'] = df.ta.sma(length=50)
+        df['SMA100'] = df.ta.sma(length=100)
+        df['EMA200'] = df.ta.ema(length=200)
+        df['ATR'] = df.ta.atr(length=14)
+
+        donchian = df.ta.donchian(lower_length=20, upper_length=20)
+        if donchian is not None: df = pd.concat([df, donchian], axis=1)
+        df['Ret_1'] = df['Close'].pct_change()
+
+        high_low_diff = df['High'] - df['Low']
+        high_low_diff = high_low_diff.replace(0, 0.0001)
+        ad = ((2 * df['Close'] - df['High'] - df['Low']) / high_low_diff) * df['Volume']
+        df['CMF'] = ad.fillna(0).rolling(window=20).sum() / df['Volume'].rolling(window=20).sum()
+
+        if ihsg_df is not None and not ihsg_df.empty:
+            df = df.join(ihsg_df, how='left')
+            df['IHSG_Close'] = df['IHSG_Close'].ffill()
+            df['Stock_Ret_20'] = (df['Close'] - df['Close'].shift(20)) / df['Close'].shift(20)
+            df['IHSG_Ret_20'] = (df['IHSG_Close'] - df['IHSG_Close'].shift(20)) / df['IHSG_Close'].shift(20)
+    except: pass
+    return df
+
+@timed()
+def advanced_analysis(df):
+    if len(df) < 15: return "N/A", "-"
+    curr = df.iloc[-1]
+
+    close = curr.get('Close', 0)
+    ma20 = curr.get('SMA20', close) if pd.notna(curr.get('SMA20')) else close
+    ma50 = curr.get('SMA50', close) if pd.notna(curr.get('SMA50')) else close
+
+    phase = "Sideways"
+    if close > ma50: phase = "🔵 Markup" if close > ma20 else "🔴 Distribution"
+    else: phase = "🟠 Markdown" if close < ma20 else "🟢 Accumulation"
+
+    divergence = "-"
+    if len(df) > 10 and 'CMF' in df.columns:
+        try:
+            if (curr['Close'] - df['Close'].iloc[-10] < 0) and (curr['CMF'] - df['CMF'].iloc[-10] > 0.15):
+                divergence = "🟢 BULLISH DIV"
+        except: pass
+    return phase, divergence
+
+@timed()
+def score_analysis(df, fund_data):
+    if df.empty or len(df)<2: return 0, 0, 0, 0, ["Data Kurang"], df.iloc[-1]
+    curr, prev = df.iloc[-1], df.iloc[-2]
+    score_tech, score_fund, score_bandar, score_candle = 0, 0, 0, 0; reasons = []
+
+    if not pd.isna(curr.get('SMA100')) and not pd.isna(curr.get('EMA200')):
+        if curr['Close'] > curr['SMA20'] and curr['Close'] > curr['SMA50'] and curr['Close'] > curr['SMA100'] and curr['Close'] > curr['EMA200']:
+            score_tech += 2; reasons.append("🔥 MA")
+        elif not pd.isna(curr.get('EMA200')) and curr['Close'] > curr['EMA200']:
+            score_tech += 1; reasons.append("📈 Uptrend")
+
+    dcu = curr.get('DCU_20_20', 0)
+    if pd.notna(dcu) and dcu > 0 and curr['Close'] >= (dcu * 0.99):
+        score_tech += 1.5; reasons.append("🚀 Breakout DC")
+
+    if 'Stock_Ret_20' in df.columns and 'IHSG_Ret_20' in df.columns:
+        if not pd.isna(curr['Stock_Ret_20']) and curr['Stock_Ret_20'] > curr['IHSG_Ret_20'] and curr['Stock_Ret_20'] > 0:
+            score_tech += 1.5; reasons.append("🌟 Market Beat")
+
+    cmf = curr.get('CMF', 0)
+    if pd.notna(cmf) and cmf > 0.1: score_bandar = 2; reasons.append("🐳 CMF")
+
+    rsi = curr.get('Rsi', 50)
+    if pd.notna(rsi) and rsi < 35: score_tech += 2; reasons.append("💎 RSI")
+
+    if fund_data and fund_data.get('EPS_Growth') and fund_data.get('EPS_Growth') > 0.10:
+        score_fund += 2; reasons.append("🚀 EPS")
+
+    s_candle, patterns = check_candlestick_patterns(curr, prev)
+    score_candle += s_candle
+    if patterns: reasons.append("🕯️ Pola")
+
+    return score_tech, score_fund, score_bandar, score_candle, reasons, curr
+
+# --- 2. PREDIKTOR AI (KNN) ---
+@timed()
+def knn_probability_up(df):
+    """Peluang harga naik besok dari pola Rsi/CMF/Ret_1 historis. 0.5 (netral) jika data kurang atau gagal."""
+    prob_up = 0.5
+    try:
+        target = (df['Close'].shift(-1) > df['Close']).astype(int).rename('Target_Besok')
+        ml_df = pd.concat([df[KNN_FEATURES], target], axis=1).dropna()
+        if len(ml_df) > KNN_MIN_ROWS:
+            X = ml_df[KNN_FEATURES]
+            y = ml_df['Target_Besok']
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            knn = KNeighborsClassifier(n_neighbors=KNN_NEIGHBORS)
+            with timer("knn_fit"):
+                knn.fit(X_scaled, y)
+
+            today_features = pd.DataFrame({c: [df[c].iloc[-1]] for c in KNN_FEATURES})
+            today_scaled = scaler.transform(today_features)
+            prob_up = knn.predict_proba(today_scaled)[0][1]
+    except: pass
+    return prob_up
+
+# --- 3. MESIN BACKTESTING ---
+@timed()
+def compute_backtest(df, entry_sma=50, exit_sma=20):
+    """
+    Simulasi strategi AI Trend Follower secara vectorized.
+    Equity dinormalisasi ke modal 1 agar hasilnya bisa dipakai ulang oleh semua user (tinggal dikali modal awal).
+    """
+    df = df[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
+
+    # --- STRATEGI ALGORITMA (AI Trend Follower) ---
+    # Aturan Beli: Harga menembus MA 50 ke atas (Uptrend Reversal)
+    # Aturan Jual: Harga jatuh ke bawah MA 20 (Momentum Hilang)
+    df['SMA_Exit'] = df.ta.sma(length=exit_sma)
+    df['SMA_Entry'] = df.ta.sma(length=entry_sma)
+
+    # Simulasi Keputusan (Vectorized - Super Cepat)
+    df['Signal'] = 0
+    df.loc[df['Close'] > df['SMA_Entry'], 'Signal'] = 1  # Mode Beli/Hold
+    df.loc[df['Close'] < df['SMA_Exit'], 'Signal'] = 0  # Mode Jual/Cash
+
+    df['Position'] = df['Signal'].ffill().fillna(0)
+
+    # Hitung Keuntungan Harian
+    df['Daily_Return'] = df['Close'].pct_change()
+    df['Strategy_Return'] = df['Position'].shift(1) * df['Daily_Return']
+
+    # Pertumbuhan Modal Berbunga (Compound Interest)
+    df['Equity'] = (1 + df['Strategy_Return']).cumprod()
+    df['Buy_Hold_Equity'] = (1 + df['Daily_Return']).cumprod()
+
+    # --- KALKULASI METRIK PERFORMA ---
+    df = df.dropna()
+    if df.empty: return None
+
+    # Menghitung Risiko (Max Drawdown / Penurunan Terdalam)
+    rolling_max = df['Equity'].cummax()
+    drawdown = (df['Equity'] - rolling_max) / rolling_max
+
+    return {
+        "dates": df.index.strftime('%Y-%m-%d').tolist(),
+        "equity": df['Equity'].round(6).tolist(),
+        "bnh": df['Buy_Hold_Equity'].round(6).tolist(),
+        "n_days": len(df),
+        "total_return": float((df['Equity'].iloc[-1] - 1) * 100),
+        "bnh_return": float((df['Buy_Hold_Equity'].iloc[-1] - 1) * 100),
+        "max_drawdown": float(drawdown.min() * 100),
+    }
+
+# --- 4. RANKING CROSS-SECTIONAL (SCREENER MALAM) ---
+@timed()
+def cross_sectional_rank(df_quant):
+    """Peringkat persentil momentum, volatilitas rendah, value (B/P) & mean-reversion relatif sektor."""
+    df_quant = df_quant.copy()
+    df_quant['mom_rank'] = df_quant['mom_6m'].rank(pct=True)
+    df_quant['vol_rank'] = df_quant['vol_6m'].rank(ascending=False, pct=True)
+    df_quant['bp_rank'] = df_quant['bp_ratio'].rank(pct=True)
+    df_quant['sector_mean_ret'] = df_quant.groupby('sector')['ret_20'].transform('mean')
+    df_quant['sector_diff'] = df_quant['ret_20'] - df_quant['sector_mean_ret']
+    df_quant['mr_rank'] = df_quant['sector_diff'].rank(ascending=True, pct=True)
+    return df_quant